@@ -3,15 +3,15 @@ import os
 import signal
 import sys
 import time
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
 
 import pigpio
 
-from espyresso import config, shot_logger
+from espyresso import config, metrics, shot_logger, telemetry
 from espyresso.bluetooth import BluetoothScale
 from espyresso.boiler import Boiler
 from espyresso.buttons import Buttons
-from espyresso.display import Display
+from espyresso.display_process import DisplayProcess
 from espyresso.flow import Flow
 from espyresso.pump import Pump
 from espyresso.ranger import Ranger
@@ -19,6 +19,9 @@ from espyresso.temperature import Temperature
 from espyresso.timer import BrewingTimer
 from espyresso.utils import WaveQueue
 
+if TYPE_CHECKING:
+    from espyresso.display import Display
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,7 +58,22 @@ class Espyresso:
         logger.debug("STARTING ESPYRESSO")
 
         if config.LOG_SHOT:
-            shot_logger.init(config.LOG_SHOT_DIR)
+            shot_logger.init(
+                config.LOG_SHOT_DIR,
+                config.LOG_SHOT_FORMAT,
+                queue_size=config.LOG_SHOT_QUEUE_SIZE,
+                flush_interval=config.LOG_SHOT_FLUSH_SECONDS,
+                fsync=config.LOG_SHOT_FSYNC,
+                shot_db=config.SHOT_DB_FILE,
+            )
+
+        # before the producers, which publish into it as they change
+        telemetry.init()
+        telemetry.update(started_time=self.started_time)
+
+        self.status_server: Optional[metrics.StatusServer] = None
+        if config.METRICS_SOCKET:
+            self.status_server = metrics.StatusServer(config.METRICS_SOCKET)
 
         if not pigpio_pi:
             self.pigpio_pi = pigpio.pi()
@@ -131,7 +149,7 @@ class Espyresso:
         )
 
         # self.pump.pulse_pump_steam()
-        self.display = Display(
+        display_args: Dict[str, Any] = dict(
             get_started_time=self.get_started_time,
             bluetooth_scale=self.bluetooth_scale,
             boiler=self.boiler,
@@ -146,9 +164,23 @@ class Espyresso:
                 "boiler": self.boiler_queue,
             },
         )
+        self.display: Union["Display", DisplayProcess]
+        if config.DISPLAY_PROCESS:
+            self.display = DisplayProcess(
+                buttons=self.buttons, wave_queues=display_args["wave_queues"]
+            )
+        else:
+            # pygame is only needed in the process that renders
+            from espyresso import display
+
+            self.display = display.Display(
+                controller_state=self.temperature.pcontroller.state,
+                **display_args,
+            )
 
     def reset_started_time(self) -> None:
         self.started_time = time.perf_counter()
+        telemetry.update(started_time=self.started_time)
 
     def get_started_time(self) -> float:
         return self.started_time
@@ -156,6 +188,8 @@ class Espyresso:
     def start(self) -> None:
         self.reset_started_time()
 
+        if self.status_server is not None:
+            self.status_server.start()
         logger.info("starting temperature thread")
         self.temperature.start()
         logger.info("starting ranger thread")
@@ -181,8 +215,15 @@ class Espyresso:
         self.ranger.stop()
         self.temperature.stop()
         self.display.stop()
+        telemetry.shutdown()
+        if self.status_server is not None:
+            self.status_server.stop()
+        latencies = metrics.snapshot()
+        logger.info("latency: %s", latencies)
         sl = shot_logger.get()
         if sl is not None:
+            for name, summary in latencies.items():
+                sl.log_event("latency", name=name, **summary)
             sl.close()
 
     def exit(self) -> None:
@@ -210,6 +251,12 @@ def handler(signum: int, *args: Any) -> None:
 
 def run() -> None:
     _configure_logging()
+    # before the controller reads the model constants
+    calibrated = config.load_mpc_profile()
+    if calibrated:
+        logger.info(
+            "calibrated constants from %s: %s", config.MPC_PROFILE_FILE, calibrated
+        )
     logger.info("constructing Espyresso")
     try:
         if not config.DEBUG:
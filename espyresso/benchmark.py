@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Scored control scenarios for comparing controller changes.
+
+Each scenario drives a ``Simulation`` (real controller, plant model,
+simulated clock) through a canned session, while a ``Scorecard`` samples
+it every control period and keeps the scores:
+
+    warm_up_s       seconds from cold until the water is within
+                    WARM_UP_BAND of the setpoint
+    overshoot_c     highest water temperature above the brew setpoint
+                    after warm-up
+    iae_cs          integral of |water - setpoint| after warm-up (°C·s)
+    clip_s          seconds after warm-up with the heater at full power
+    droop_c         largest drop below the setpoint during a shot
+    update_us       mean CPU time of PController.update
+    update_p99_us   its 99th percentile
+
+Lower is better for all of them; ``compare`` flags the ones that got
+worse than a baseline by more than ``TOLERANCES``. Steam periods are left
+out of the temperature scores: the setpoint isn't the brew one then. Nor
+does the way back count: after steam, overshoot, IAE and clipping are
+only scored again once the water is within WARM_UP_BAND and the heater is
+on again, when the steam heat is gone and the controller is back in
+charge.
+Runner: ``tools/bench_scenarios.py``.
+"""
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from espyresso import config
+from espyresso.metrics import Histogram
+from espyresso.simulation import Simulation
+
+WARM_UP_BAND = 0.5
+SCORES = (
+    "warm_up_s",
+    "overshoot_c",
+    "iae_cs",
+    "clip_s",
+    "droop_c",
+    "update_us",
+    "update_p99_us",
+)
+# (absolute, relative) slack before a higher score counts as a regression.
+# The simulation is deterministic, so the temperature scores only move
+# when the controller does; CPU time varies from run to run.
+TOLERANCES: Dict[str, Tuple[float, float]] = {
+    "warm_up_s": (1.0, 0.02),
+    "overshoot_c": (0.1, 0.05),
+    "iae_cs": (1.0, 0.05),
+    "clip_s": (1.0, 0.05),
+    "droop_c": (0.1, 0.05),
+    "update_us": (2.0, 0.25),
+    "update_p99_us": (5.0, 0.5),
+}
+
+
+class Scorecard:
+    """Samples ``sim`` every control period and keeps the scores above."""
+
+    def __init__(self, sim: Simulation) -> None:
+        self.sim = sim
+        self.period = config.CONTROL_PERIOD
+        self.warm_up_s = math.nan
+        self.overshoot_c = 0.0
+        self.iae_cs = 0.0
+        self.clip_s = 0.0
+        self.droop_c = 0.0
+        self.shots = 0
+        self._pumping = False
+        # back from another setpoint and not yet within WARM_UP_BAND
+        self._settling = False
+        self.update_time = Histogram("pcontroller_update", highest=1.0)
+
+        controller = sim.temperature.pcontroller
+        update = controller.update
+        timer = time.thread_time
+
+        def timed_update(**kwargs: Any) -> float:
+            started = timer()
+            try:
+                return update(**kwargs)
+            finally:
+                self.update_time.record(timer() - started)
+
+        controller.update = timed_update  # type: ignore[method-assign]
+        sim.clock.call_every(self.period, self.sample)
+
+    def sample(self) -> None:
+        sim = self.sim
+        water = sim.plant.water_temp
+        setpoint = sim.temperature.pcontroller.temp_setpoint
+        if setpoint != config.TARGET_TEMP:
+            self._settling = True
+            return
+        error = water - setpoint
+
+        if math.isnan(self.warm_up_s):
+            if sim.boiler.get_boiling() and abs(error) < WARM_UP_BAND:
+                self.warm_up_s = sim.clock.now()
+            return
+
+        heater = sim.temperature.pcontroller.state.heater
+        if self._settling:
+            # the boiler sheds its steam heat with the heater off; the
+            # controller is back in charge once it heats again
+            self._settling = abs(error) >= WARM_UP_BAND or heater <= 0.0
+        if not self._settling:
+            self.overshoot_c = max(self.overshoot_c, error)
+            self.iae_cs += abs(error) * self.period
+            if heater >= 0.999:
+                self.clip_s += self.period
+
+        pumping = sim.pumping
+        if pumping and not self._pumping:
+            self.shots += 1
+        if pumping:
+            self.droop_c = max(self.droop_c, -error)
+        self._pumping = pumping
+
+    def scores(self) -> Dict[str, float]:
+        return {
+            "warm_up_s": self.warm_up_s,
+            "overshoot_c": self.overshoot_c,
+            "iae_cs": self.iae_cs,
+            "clip_s": self.clip_s,
+            "droop_c": self.droop_c,
+            "update_us": self.update_time.snapshot()["mean_ms"] * 1000.0,
+            "update_p99_us": self.update_time.percentile(99) * 1e6,
+        }
+
+
+def cold_start(sim: Simulation) -> None:
+    sim.warm_up()
+    sim.run_for(600 - sim.now)
+
+
+def back_to_back(sim: Simulation) -> None:
+    sim.warm_up()
+    sim.run_for(240)
+    for _ in range(3):
+        sim.brew()
+        sim.run_for(30)
+    sim.run_for(120)
+
+
+def steam_then_brew(sim: Simulation) -> None:
+    sim.warm_up()
+    sim.run_for(240)
+    sim.steam(40)
+    sim.run_for(60)
+    sim.brew()
+    sim.run_for(120)
+
+
+def sensor_dropout(sim: Simulation) -> None:
+    sim.warm_up()
+    sim.run_for(240)
+    sim.tsic.dropout = True
+    sim.run_for(5)
+    sim.tsic.dropout = False
+    sim.run_for(60)
+    sim.brew()
+    sim.tsic.dropout = True
+    sim.run_for(3)
+    sim.tsic.dropout = False
+    sim.run_for(120)
+
+
+SCENARIOS: Dict[str, Callable[[Simulation], None]] = {
+    "cold_start": cold_start,
+    "back_to_back": back_to_back,
+    "steam_then_brew": steam_then_brew,
+    "sensor_dropout": sensor_dropout,
+}
+
+
+def run_scenario(
+    name: str, sim_factory: Callable[[], Simulation] = Simulation
+) -> Dict[str, float]:
+    """Scores of one scenario, plus its simulated and wall-clock seconds
+    and the number of shots pulled."""
+    sim = sim_factory()
+    card = Scorecard(sim)
+    started = time.perf_counter()
+    SCENARIOS[name](sim)
+    result = card.scores()
+    result["shots"] = card.shots
+    result["sim_s"] = sim.now
+    result["wall_s"] = time.perf_counter() - started
+    return result
+
+
+def compare(
+    current: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerances: Optional[Dict[str, Tuple[float, float]]] = None,
+) -> List[str]:
+    """Scores in ``current`` that are worse than in ``baseline`` by more
+    than their tolerance, as readable lines."""
+    tolerances = TOLERANCES if tolerances is None else tolerances
+    regressions = []
+    for name, (absolute, relative) in tolerances.items():
+        base = baseline.get(name)
+        value = current.get(name)
+        if base is None or value is None or math.isnan(base):
+            continue
+        limit = base + max(absolute, relative * abs(base))
+        if math.isnan(value) or value > limit:
+            regressions.append(f"{name}: {value:.3f} (was {base:.3f})")
+    return regressions
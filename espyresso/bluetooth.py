@@ -3,7 +3,7 @@ import threading
 import time
 from typing import TYPE_CHECKING, Optional
 
-from espyresso import config, shot_logger
+from espyresso import config, shot_logger, telemetry
 
 if TYPE_CHECKING:
     from asyncio import Event
@@ -86,6 +86,7 @@ class BluetoothScale:
         v_int = int.from_bytes(data[7:9], "little")
         self.current_weight = v_int
         self.current_weight_timestamp = time.perf_counter()
+        telemetry.update(scale_g=v_int / 10, scale_time=self.current_weight_timestamp)
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event("scale", grams=v_int / 10)
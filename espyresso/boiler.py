@@ -1,7 +1,7 @@
 import logging
 from typing import TYPE_CHECKING, Callable, Optional, Tuple
 
-from espyresso import config, shot_logger
+from espyresso import config, shot_logger, telemetry
 from espyresso.pwm import PWM
 
 logger = logging.getLogger(__name__)
@@ -31,12 +31,16 @@ class Boiler:
         if self.boiling and not config.DEBUG:
             # Start boiling initially
             self.pwm.set_value(1.0)
+        self._publish()
 
         logger.debug("Boiler READY")
 
     def get_boiling(self) -> bool:
         return self.boiling
 
+    def _publish(self) -> None:
+        telemetry.update(boiling=self.boiling, boiler_pwm=self.pwm.value)
+
     def turn_off_boiler(self) -> None:
         logger.debug("Boiler stopping")
         self.boiling = False
@@ -50,6 +54,7 @@ class Boiler:
     def turn_on_boiler(self) -> None:
         self.boiling = True
         self.reset_started_time()
+        self._publish()
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event("boiler", state="on")
@@ -60,6 +65,7 @@ class Boiler:
             self.pwm.set_value(0)
         else:
             self.reset_started_time()
+        self._publish()
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event(
@@ -73,6 +79,7 @@ class Boiler:
             self.pwm.set_value(self.pwm_override)
         else:
             self.pwm.set_value(0)
+        self._publish()
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event("boiler_override", value=value)
@@ -90,4 +97,5 @@ class Boiler:
             value = 1.0
 
         self.pwm.set_value(value)
+        self._publish()
         self.add_to_queue(tuple((round(value * 100, 1),)))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Time source for the controller, pump, flow meter and timers.
+
+Components take a ``clock`` keyword (default ``SYSTEM_CLOCK``) and use
+``clock.now()``, ``clock.sleep()`` and ``clock.start_thread()`` instead of
+``time.perf_counter``, ``time.sleep`` and ``threading.Thread``.
+
+``SimulatedClock`` replaces all three for simulations
+(``espyresso.simulation``): time only moves when the driver calls
+``run_until``, and it jumps straight to the next thing that is due, so
+minutes of machine time take milliseconds.
+
+Threads started through the simulated clock (the pump routines) run in
+lock-step with the driver: while they run the driver waits, and their
+``sleep`` hands control back until simulated time reaches the wake-up.
+Periodic work that is a thread on the real machine (control loop,
+brewing timer) is scheduled with ``call_every`` instead and runs on the
+driver's thread. Together that makes runs deterministic.
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+
+class SystemClock:
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def start_thread(self, target: Callable[[], Any], name: str) -> threading.Thread:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        return thread
+
+
+SYSTEM_CLOCK = SystemClock()
+
+# Clock is the type components annotate with; both implementations
+# provide now / sleep / start_thread.
+Clock = SystemClock
+
+
+class SimulationStalled(RuntimeError):
+    """A simulated thread neither slept nor finished in time."""
+
+
+class SimulatedClock(SystemClock):
+    def __init__(self, start: float = 0.0, stall_timeout: float = 10.0) -> None:
+        self._now = start
+        self.stall_timeout = stall_timeout
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        # (time, seq, callback, period) of scheduled driver-side calls
+        self._timers: List[Tuple[float, int, Callable[[], Any], float]] = []
+        # (wake time, seq, wake event) of sleeping simulated threads
+        self._sleepers: List[Tuple[float, int, threading.Event]] = []
+        self._running = 0
+        self._workers: Set[int] = set()
+        self._error: Optional[BaseException] = None
+
+    def now(self) -> float:
+        return self._now
+
+    def call_at(self, when: float, callback: Callable[[], Any]) -> None:
+        heapq.heappush(self._timers, (when, next(self._seq), callback, 0.0))
+
+    def call_every(
+        self, period: float, callback: Callable[[], Any], first: Optional[float] = None
+    ) -> None:
+        when = self._now + period if first is None else first
+        heapq.heappush(self._timers, (when, next(self._seq), callback, period))
+
+    def start_thread(self, target: Callable[[], Any], name: str) -> threading.Thread:
+        def run() -> None:
+            self._workers.add(threading.get_ident())
+            try:
+                target()
+            except BaseException as e:  # surfaced by run_until
+                self._error = e
+            finally:
+                self._workers.discard(threading.get_ident())
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify_all()
+
+        with self._cond:
+            self._running += 1
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        self._wait_idle()
+        return thread
+
+    def sleep(self, seconds: float) -> None:
+        if threading.get_ident() not in self._workers:
+            # the driver would wait for itself
+            raise RuntimeError("sleep outside a thread from start_thread")
+        wake = threading.Event()
+        with self._cond:
+            heapq.heappush(
+                self._sleepers, (self._now + max(seconds, 0.0), next(self._seq), wake)
+            )
+            self._running -= 1
+            self._cond.notify_all()
+        wake.wait()
+
+    def _wait_idle(self) -> None:
+        # Only the driver wakes or starts threads, so once nothing runs
+        # nothing can start behind its back: skip the lock then.
+        if self._running:
+            self._wait_for_threads()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _wait_for_threads(self) -> None:
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._running == 0, timeout=self.stall_timeout
+            ):
+                raise SimulationStalled(
+                    f"simulated thread still running after {self.stall_timeout} s"
+                )
+
+    def run_until(self, end: float) -> None:
+        """Advance to ``end``, running every timer and waking every sleeper
+        that falls due on the way, in time order."""
+        while True:
+            self._wait_idle()
+            due = min(
+                self._timers[0][0] if self._timers else end,
+                self._sleepers[0][0] if self._sleepers else end,
+                end,
+            )
+            self._now = max(self._now, due)
+            while self._timers and self._timers[0][0] <= self._now:
+                when, _, callback, period = heapq.heappop(self._timers)
+                if period:
+                    heapq.heappush(
+                        self._timers, (when + period, next(self._seq), callback, period)
+                    )
+                callback()
+                self._wait_idle()
+            woke = False
+            # nothing runs here either, so only take the lock to wake
+            if self._sleepers and self._sleepers[0][0] <= self._now:
+                with self._cond:
+                    while self._sleepers and self._sleepers[0][0] <= self._now:
+                        _, _, wake = heapq.heappop(self._sleepers)
+                        self._running += 1
+                        wake.set()
+                        woke = True
+            if not woke and due >= end:
+                self._wait_idle()
+                return
+
+    def advance(self, seconds: float) -> None:
+        self.run_until(self._now + seconds)
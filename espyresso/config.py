@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
+import json
+import logging
+import os
 from sys import platform
+from typing import List, Optional
 
 # DEBUG if Mac
 PLATFORM = platform
@@ -17,10 +21,26 @@ LOG_POWER = False
 LOG_POWER_FILE = "log/power.log"
 SHOT_STAT_FILE = "shot_stat.txt"
 
-# Structured CSV logging of every controller tick + lifecycle events.
-# Writes log/shot-<ts>-tick.csv and log/shot-<ts>-event.csv.
+# Structured logging of every controller tick + lifecycle events.
+# Writes log/shot-<ts>-tick.bin (or .csv) and log/shot-<ts>-event.csv.
 LOG_SHOT = True
 LOG_SHOT_DIR = "log"
+# "binary": packed records (espyresso.tick_log), "csv": one text row per tick
+LOG_SHOT_FORMAT = "binary"
+# The shot log is written by a background thread every LOG_SHOT_FLUSH_SECONDS.
+# Up to LOG_SHOT_QUEUE_SIZE ticks/events wait in memory; beyond that they are
+# dropped (and counted) rather than stalling the control loop.
+LOG_SHOT_QUEUE_SIZE = 4096
+LOG_SHOT_FLUSH_SECONDS = 1.0
+# fsync after: "never", "event" (batches holding an event) or "batch"
+LOG_SHOT_FSYNC = "event"
+# SQLite database with one row per shot plus its ticks (espyresso.shot_db),
+# filled as shots finish. None disables it.
+SHOT_DB_FILE = "log/shots.sqlite3"
+
+# Unix socket answering with the latency histograms (espyresso.metrics) as
+# JSON, e.g. ``nc -U /tmp/espyresso-metrics.sock``. None disables it.
+METRICS_SOCKET = "/tmp/espyresso-metrics.sock"
 
 TSIC_GPIO = 24
 BOILER_PWM_GPIO = 12
@@ -50,6 +70,13 @@ IMAX = 1.0
 
 TURN_OFF_SECONDS = 600.0
 
+# Control loop. The TSIC callback only hands each reading to the control
+# thread, which runs the controller every CONTROL_PERIOD seconds on the
+# newest reading (the TSIC 306 sends about 10 per second).
+CONTROL_PERIOD = 0.1
+# s without a new reading before the control step stops driving the heater
+TSIC_STALE_SECONDS = 1.0
+
 WIDTH = 320
 HEIGHT = 240
 
@@ -57,9 +84,30 @@ HEIGHT = 240
 # the TSIC temperature callback shares the GIL with the display thread. A
 # lower FPS means the display releases the GIL more, giving the temperature
 # control loop more room to run.
+# The rate adapts: the display sleeps until something it shows changes, up
+# to DISPLAY_FPS times a second while a pump routine (brew, steam) runs and
+# DISPLAY_IDLE_FPS otherwise. Idle frames still come DISPLAY_IDLE_FPS times
+# a second, for the countdowns in the header.
 DISPLAY_FPS = 4
+DISPLAY_IDLE_FPS = 1
+# Run the display in its own process, fed through shared memory
+# (espyresso.display_process). Rendering then no longer competes with the
+# control loop for the GIL, so it can run at a proper frame rate.
+DISPLAY_PROCESS = not DEBUG
+DISPLAY_PROCESS_FPS = 20
+# "sdl" flushes frames through pygame.display; "framebuffer" renders
+# off-screen and copies the changed rects straight into FRAMEBUFFER_DEVICE
+# (espyresso.framebuffer); "headless" only renders off-screen, for CI and
+# tools/render_shot.py.
+DISPLAY_BACKEND = "sdl"
+FRAMEBUFFER_DEVICE = "/dev/fb1"
 
 AXIS_WIDTH = 28
+# A wave's y axis grows as soon as a sample falls outside it, but only
+# shrinks back once the evicted extreme frees at least this fraction of
+# its span; smaller moves would re-scale (and repaint) the whole zone for
+# a degree or two.
+AXIS_HYSTERESIS = 0.1
 
 # Display layout (320 x 240). All rects are (x, y, w, h) in screen coords.
 # Header (320x30): hero current temp + status info.
@@ -99,6 +147,9 @@ ZOOM = 2
 FLOW_METER_DEBOUNCE_TIME = 0.02
 # any state change within 20ms of the last is considered a bounce error (from pump vibration)
 
+FLOW_START_GAP = 2.0
+# s without pulses after which the next pulse is published as a new "flow_start"
+
 # characteristics of the temperature controller
 
 MAX_BOILER_POWER = 1350.0
@@ -186,6 +237,23 @@ SENSOR_XFER_COEFF = (
 MPC_STEADY_STATE = 0.5
 MPC_SMOOTHING = 0.5
 
+# Receding-horizon mode: predict the water temperature MPC_HORIZON_STEPS
+# steps of MPC_HORIZON_STEP_SECONDS ahead for a set of candidate heater
+# trajectories and apply the first move of the best one that keeps the
+# element and shell under their limits. 0 keeps the single-step power
+# law of heater_step.
+MPC_HORIZON_STEPS = 0
+MPC_HORIZON_STEP_SECONDS = 1.0
+# model sub-steps per horizon step when building the prediction matrices
+MPC_HORIZON_SUBSTEPS = 10
+# steps the heater level is held for in each block; the last block runs to
+# the end of the horizon
+MPC_HORIZON_BLOCKS = (3,)
+# normalized heater levels tried in each block
+MPC_HORIZON_LEVELS = (0.0, 0.02, 0.05, 0.1, 0.2, 0.4, 0.7, 1.0)
+# ml/s flow rates the prediction matrices are built for; the nearest is used
+MPC_HORIZON_FLOW_BINS = (0.0, 0.5, 1.0, 1.5, 2.0)
+
 """
 # Calculate best SENSOR_XFER_COEFF
 
@@ -212,6 +280,29 @@ self.prev_temp = temperature
 # SENSOR_XFER_COEFF = 0.0340
 SENSOR_XFER_COEFF = 0.02656
 
+# Learned and calibrated JSON profiles live in the package directory, not
+# the working directory, so they are found however the app is started.
+PROFILE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Feed-forward heater power for the start of a shot: one value (W) per
+# second after brew start, learned from the waterToFlowPower of previous
+# shots and added before the flow shows up in the model.
+# FEED_FORWARD_GAIN = 0 disables it.
+FEED_FORWARD_SECONDS = 10
+FEED_FORWARD_GAIN = 1.0
+# s the profile is applied ahead of time, to cover the element -> shell ->
+# water lag
+FEED_FORWARD_LEAD = 3
+# share of each complete shot blended into the learned profile
+FEED_FORWARD_LEARNING_RATE = 0.3
+FEED_FORWARD_PROFILE_FILE = os.path.join(PROFILE_DIR, "feed_forward.json")
+
+# Calibrated thermal constants written by tools/calibrate_mpc.py. Once
+# load_mpc_profile() has run (app start-up does), any model constant
+# present in this JSON file overrides the hand-measured value above;
+# delete the file to go back to the defaults.
+MPC_PROFILE_FILE = os.path.join(PROFILE_DIR, "mpc_profile.json")
+
 # BLUETOOTH SCALE
 # Set False to skip the bluetooth notify loop entirely. The scale is optional;
 # when disabled, get_scale_weight() returns 0 and the display loop is not
@@ -223,3 +314,31 @@ BLUETOOTH_SCALE_ADDRESS = (
     if platform == "darwin"
     else "B8:CA:04:28:79:84"
 )
+
+
+def load_mpc_profile(path: Optional[str] = None) -> List[str]:
+    """Apply the calibrated constants in ``path`` (``MPC_PROFILE_FILE`` by
+    default) to this module; returns the names it set.
+
+    Only the model constants (``pcontroller.MODEL_PARAMS``) are taken;
+    any other setting in the file is skipped with a warning."""
+    from espyresso.pcontroller import MODEL_PARAMS
+
+    path = path or MPC_PROFILE_FILE
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        profile = json.load(f)
+    loaded = []
+    for key, value in profile.items():
+        if key.startswith("_"):
+            # "_meta" etc. are informational
+            continue
+        if key not in MODEL_PARAMS:
+            logging.getLogger(__name__).warning(
+                "%s: ignoring %s, not a model constant", path, key
+            )
+            continue
+        globals()[key] = value
+        loaded.append(key)
+    return loaded
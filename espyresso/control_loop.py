@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Fixed-rate control thread fed by the TSIC decoder.
+
+The TSIC decoder runs in a pigpio callback thread and must get back to
+decoding edges quickly, so it only drops each measurement into a
+``Mailbox``. ``ControlLoop`` wakes every ``period`` seconds on absolute
+deadlines, takes the newest measurement and runs the control step
+(model update, boiler PWM, shot log, wave queue) in its own thread.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from espyresso import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Mailbox(Generic[T]):
+    """Single-slot, lock-free mailbox for one producer and one consumer.
+
+    ``put`` replaces the slot with a ``(sequence, value)`` tuple in one
+    attribute store, which is atomic under the GIL, so neither side ever
+    blocks. The consumer uses the sequence number to tell a new value
+    from one it already took, and how many were overwritten unseen."""
+
+    def __init__(self) -> None:
+        self._slot: Tuple[int, Optional[T]] = (0, None)
+        self._taken = 0
+        self.missed = 0
+
+    def put(self, value: T) -> None:
+        self._slot = (self._slot[0] + 1, value)
+
+    def peek(self) -> Optional[T]:
+        """Newest value, whether or not it was taken already."""
+        return self._slot[1]
+
+    def take(self) -> Optional[T]:
+        """Newest value if it wasn't taken yet, else None."""
+        seq, value = self._slot
+        if seq == self._taken:
+            return None
+        self.missed += seq - self._taken - 1
+        self._taken = seq
+        return value
+
+
+class ControlLoop(threading.Thread):
+    """Calls ``step(value, fresh)`` every ``period`` seconds with the newest
+    mailbox value (``fresh`` is False when no new one arrived since the
+    last tick). Nothing is called until the first value arrives.
+
+    Deadlines are absolute (start + n * period), so the period doesn't
+    drift with the step's run time. A step that overruns its slot skips the
+    missed deadlines instead of running them back to back."""
+
+    def __init__(
+        self,
+        mailbox: Mailbox[T],
+        step: Callable[[T, bool], Any],
+        period: float,
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        kwargs.setdefault("name", "control-loop")
+        kwargs.setdefault("daemon", True)
+        super().__init__(*args, **kwargs)
+        self._stop_event = threading.Event()
+        self.mailbox = mailbox
+        self.step = step
+        self.period = period
+
+        self.ticks = 0
+        self.stale_ticks = 0
+        self.overruns = 0
+        self.late_max = 0.0
+        self.late_total = 0.0
+        self.step_max = 0.0
+        self.step_total = 0.0
+        self.jitter = metrics.histogram("control_jitter")
+        self.step_time = metrics.histogram("control_step")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def stats(self) -> Dict[str, float]:
+        """Tick count and jitter so far; times in milliseconds."""
+        ticks = max(self.ticks, 1)
+        return {
+            "ticks": self.ticks,
+            "stale_ticks": self.stale_ticks,
+            "missed_samples": self.mailbox.missed,
+            "overruns": self.overruns,
+            "late_mean_ms": self.late_total / ticks * 1000.0,
+            "late_max_ms": self.late_max * 1000.0,
+            "step_mean_ms": self.step_total / ticks * 1000.0,
+            "step_max_ms": self.step_max * 1000.0,
+        }
+
+    def run(self) -> None:
+        deadline = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.poll(late=time.perf_counter() - deadline)
+
+            deadline += self.period
+            now = time.perf_counter()
+            if now > deadline:
+                self.overruns += 1
+                deadline += (now - deadline) // self.period * self.period
+                deadline += self.period
+            self._stop_event.wait(deadline - now)
+
+    def poll(self, late: float = 0.0) -> None:
+        """One tick without the thread: simulations call this on their own
+        clock instead of starting the loop."""
+        value = self.mailbox.take()
+        fresh = value is not None
+        if value is None:
+            value = self.mailbox.peek()
+        if value is not None:
+            self._tick(value, fresh, late)
+
+    def _tick(self, value: T, fresh: bool, late: float) -> None:
+        started = time.perf_counter()
+        try:
+            self.step(value, fresh)
+        except Exception:
+            logger.exception("control step failed")
+        took = time.perf_counter() - started
+
+        self.ticks += 1
+        if not fresh:
+            self.stale_ticks += 1
+        self.late_total += late
+        self.late_max = max(self.late_max, late)
+        self.step_total += took
+        self.step_max = max(self.step_max, took)
+        self.jitter.record(late)
+        self.step_time.record(took)
@@ -1,4 +1,5 @@
 import logging
+import math
 import os
 import sys
 import threading
@@ -9,13 +10,21 @@ from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
 import pygame
 
-from espyresso import config
+from espyresso import config, metrics, telemetry
 
 # Cap on cached rendered-text surfaces. Each entry is a tiny SDL surface
 # (a few KB at most for the fonts used here). 512 entries covers all
 # static labels plus a wide range of dynamic values (timer ticks, etc.)
 # with comfortable headroom; LRU eviction handles overflow.
 _RENDER_CACHE_MAX = 512
+# Cap on cached axis layers (axis, grid and target line of one wave zone
+# for one y range). Each is a zone-sized surface of about 50 KB; the
+# ranges seen in a session settle down quickly thanks to the axis
+# hysteresis, so a handful per zone is plenty.
+_AXIS_CACHE_MAX = 16
+# While waiting for the next frame, check for touches this often so a tap
+# isn't held back by a slow idle frame rate.
+_INPUT_POLL_SECONDS = 0.05
 
 if TYPE_CHECKING:
     from espyresso.boiler import Boiler
@@ -25,8 +34,11 @@ if TYPE_CHECKING:
     from espyresso.timer import BrewingTimer
     from espyresso.bluetooth import BluetoothScale
     from espyresso.buttons import Buttons
+    from espyresso.pcontroller import ControllerState
 
+from espyresso.framebuffer import Framebuffer
 from espyresso.utils import WaveQueue, linear_transform
+from espyresso.waveform import ScrollingWave
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +68,24 @@ class Display:
         flow: "Flow",
         get_started_time: Callable[[], float],
         wave_queues: Dict[str, WaveQueue],
+        controller_state: Optional["ControllerState"] = None,
+        fps: Optional[float] = None,
+        changed: Optional[threading.Event] = None,
         **kwargs: Any,
     ) -> None:
-        os.environ["SDL_FBDEV"] = "/dev/fb1"
+        self.fps = config.DISPLAY_FPS if fps is None else fps
+        self.idle_fps = min(self.fps, config.DISPLAY_IDLE_FPS)
+        # Set by the producers when there is something new to show
+        self.changed = telemetry.changed if changed is None else changed
+        os.environ["SDL_FBDEV"] = config.FRAMEBUFFER_DEVICE
+        self.framebuffer: Optional[Framebuffer] = None
+        self.headless = config.DISPLAY_BACKEND in ("framebuffer", "headless")
+        if self.headless:
+            # SDL only provides the surface; frames go to the device
+            # directly, or nowhere (self.screen is all there is)
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        if config.DISPLAY_BACKEND == "framebuffer":
+            self.framebuffer = Framebuffer.open(config.FRAMEBUFFER_DEVICE)
         # Uncomment if you have a touch panel and find the X value for your device
         # os.environ["SDL_MOUSEDRV"] = "TSLIB"
         # os.environ["SDL_MOUSEDEV"] = "/dev/input/eventX"
@@ -68,11 +95,17 @@ class Display:
         pygame.font.init()
 
         pygame.event.set_allowed(None)
-        if not config.DEBUG:
+        depth = 0
+        if self.headless:
+            # surfarray needs 24 or 32 bit pixels
+            flags, depth = 0, 32
+        elif not config.DEBUG:
             flags = pygame.FULLSCREEN | pygame.HWSURFACE | pygame.DOUBLEBUF
         else:
             flags = pygame.HWSURFACE | pygame.DOUBLEBUF
-        self.screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT), flags)
+        self.screen = pygame.display.set_mode(
+            (config.WIDTH, config.HEIGHT), flags, depth
+        )
 
         font = str(Path(__file__).parent / "nk57-monospace-cd-rg.ttf")
         self.big_font = pygame.font.Font(font, 28)
@@ -93,8 +126,12 @@ class Display:
         # Pre-rendered translucent horizontal grid line, keyed by width.
         self._hline_cache: Dict[int, pygame.Surface] = {}
 
+        # Axis layer per (zone, low, high, steps, target_y), LRU like the
+        # render cache: a wave repaint is one blit of it plus the lines.
+        self._axis_cache: "OrderedDict[Tuple[Any, ...], pygame.Surface]" = OrderedDict()
+
         # Series colors for the temp waveform (one per thermal mass, in
-        # the order PController.update returns).
+        # the order of ControllerState.masses()).
         self.colors = [
             self.GREEN,
             self.ORANGE,
@@ -122,10 +159,10 @@ class Display:
         self._last_brew: Optional[str] = None
         self._last_legend: Optional[Tuple[Any, ...]] = None
         self._last_flow_header: Optional[str] = None
-        self._last_flow_wave_token: Any = None
         self._last_boiler_header: Optional[str] = None
-        self._last_boiler_wave_token: Any = None
-        self._last_temp_wave_token: Any = None
+        self._last_wave_tokens: Dict[str, Any] = {}
+        # Off-screen scrolling plot per wave zone, made on first draw
+        self._waves: Dict[str, ScrollingWave] = {}
 
         self.boiler = boiler
         self.buttons = buttons
@@ -138,6 +175,12 @@ class Display:
 
         self._stop_event = threading.Event()
         self.wave_queues = wave_queues
+        # Live controller state; header and legend read its fields
+        # directly instead of unpacking the newest wave-queue tuple.
+        self.controller_state = controller_state
+
+        self.frame_time = metrics.histogram("display_frame")
+        self.frame_interval = metrics.histogram("display_interval")
 
     # ------------------------------------------------------------------ #
     #  Caching helpers
@@ -173,40 +216,6 @@ class Display:
     #  Waveform primitives (unchanged math, just cleaner names)
     # ------------------------------------------------------------------ #
 
-    @staticmethod
-    def generate_coordinate(
-        *,
-        index: int,
-        value: float,
-        low: int,
-        high: int,
-        Y_MIN: int,
-        Y_MAX: int,
-    ) -> Tuple[int, float]:
-        return (index, round(linear_transform(value, low, high, Y_MAX, Y_MIN)))
-
-    def generate_coordinates(
-        self,
-        values: Any,
-        X_MIN: int,
-        X_MAX: int,
-        Y_MIN: int,
-        Y_MAX: int,
-        low: int,
-        high: int,
-    ) -> List[Tuple[int, float]]:
-        return [
-            self.generate_coordinate(
-                index=X_MIN + index * config.ZOOM,
-                value=value,
-                low=low,
-                high=high,
-                Y_MIN=Y_MIN,
-                Y_MAX=Y_MAX,
-            )
-            for index, value in enumerate(values)
-        ]
-
     def draw_y_axis(
         self,
         X_MIN: int,
@@ -216,9 +225,11 @@ class Display:
         low: int,
         high: int,
         number_of_steps: int,
+        surface: Optional[pygame.Surface] = None,
     ) -> None:
-        pygame.draw.line(self.screen, self.WHITE, (X_MIN, Y_MAX), (X_MIN, Y_MIN))
-        pygame.draw.line(self.screen, self.WHITE, (X_MIN, Y_MAX), (X_MAX, Y_MAX))
+        surface = self.screen if surface is None else surface
+        pygame.draw.line(surface, self.WHITE, (X_MIN, Y_MAX), (X_MIN, Y_MIN))
+        pygame.draw.line(surface, self.WHITE, (X_MIN, Y_MAX), (X_MAX, Y_MAX))
 
         range_steps = int(high - low) or 1
         steps: List[Tuple[float, int]] = []
@@ -237,8 +248,8 @@ class Display:
             if rounded:
                 step = round(step)
             label = self._render(str(step), 12, self.WHITE)
-            self.screen.blit(label, (X_MIN - 24, y_val - 8))
-            self.screen.blit(hline, (X_MIN, y_val))
+            surface.blit(label, (X_MIN - 24, y_val - 8))
+            surface.blit(hline, (X_MIN, y_val))
 
     def draw_target_line(
         self,
@@ -249,9 +260,11 @@ class Display:
         Y_MAX: int,
         low: int,
         high: int,
+        surface: Optional[pygame.Surface] = None,
     ) -> None:
+        surface = self.screen if surface is None else surface
         target_y = round(linear_transform(target, low, high, Y_MAX, Y_MIN))
-        pygame.draw.line(self.screen, self.RED, (X_MIN, target_y), (X_MAX, target_y))
+        pygame.draw.line(surface, self.RED, (X_MIN, target_y), (X_MAX, target_y))
 
     def draw_coordinates(
         self,
@@ -263,13 +276,9 @@ class Display:
         low: int,
         high: int,
     ) -> None:
-        queue_list = list(queue)
-        if not queue_list:
-            return
-        for i, series in enumerate(zip(*queue_list)):
-            points = self.generate_coordinates(
-                list(series), X_MIN, X_MAX, Y_MIN, Y_MAX, low, high
-            )
+        # One vectorized transform for every series; each row is already
+        # the int point list pygame.draw.lines takes.
+        for i, points in enumerate(queue.screen_points(low, high)):
             if len(points) < 2:
                 continue
             pygame.draw.lines(self.screen, self.colors[i], False, points)
@@ -291,6 +300,39 @@ class Display:
         self.draw_y_axis(X_MIN, X_MAX, Y_MIN, Y_MAX, queue.low, queue.high, steps)
         self.draw_coordinates(queue, X_MIN, X_MAX, Y_MIN, Y_MAX, queue.low, queue.high)
 
+    def _axis_layer(
+        self, name: str, rect: pygame.Rect, queue: WaveQueue, low: int, high: int
+    ) -> Any:
+        """The zone's background, axis, grid and target line for the
+        y range ``low``..``high``, composed once per range."""
+        key = (name, low, high, queue.steps, queue.target_y)
+        cached = self._axis_cache.get(key)
+        if cached is not None:
+            self._axis_cache.move_to_end(key)
+            return cached
+
+        layer = pygame.Surface(rect.size)
+        layer.fill(self.BLACK)
+        # same drawing as draw_waveform, moved to the layer's origin
+        x_min, x_max = queue.X_MIN - rect.x, queue.X_MAX - rect.x
+        y_min, y_max = queue.Y_MIN - rect.y, queue.Y_MAX - rect.y
+        if queue.target_y:
+            self.draw_target_line(
+                queue.target_y,
+                x_min,
+                x_max,
+                y_min,
+                y_max,
+                low,
+                high,
+                surface=layer,
+            )
+        self.draw_y_axis(x_min, x_max, y_min, y_max, low, high, queue.steps, layer)
+        self._axis_cache[key] = layer
+        if len(self._axis_cache) > _AXIS_CACHE_MAX:
+            self._axis_cache.popitem(last=False)
+        return layer
+
     # ------------------------------------------------------------------ #
     #  Zone redraws — each returns the rect it touched, or None if it
     #  decided the zone was unchanged since last frame.
@@ -299,7 +341,10 @@ class Display:
     def _redraw_header(self, dirty: List[pygame.Rect]) -> None:
         """Hero current temp + setpoint + boil state + water % + countdown."""
         temp_queue = self.wave_queues.get("temp")
-        if temp_queue and len(temp_queue) > 0:
+        state = self.controller_state
+        if state is not None and not math.isnan(state.raw_temp):
+            raw_temp = state.raw_temp
+        elif temp_queue and len(temp_queue) > 0:
             raw_temp = temp_queue[-1][-1]  # last tuple, last entry = raw TSIC reading
         else:
             raw_temp = 0.0
@@ -371,9 +416,12 @@ class Display:
             dirty.append(self.rect_temp_legend)
             return
 
-        latest = queue[-1]
         labels = queue.queue_labels[:6]
-        values = latest[:6]
+        state = self.controller_state
+        if state is not None:
+            values = state.masses()[:6]
+        else:
+            values = queue[-1][:6]
 
         token = (tuple(labels), tuple(round(v, 1) for v in values))
         if token == self._last_legend:
@@ -397,24 +445,7 @@ class Display:
         dirty.append(self.rect_temp_legend)
 
     def _redraw_temp_wave(self, dirty: List[pygame.Rect]) -> None:
-        queue = self.wave_queues.get("temp")
-        token = self._wave_token(queue)
-        if token == self._last_temp_wave_token:
-            return
-        self._last_temp_wave_token = token
-
-        self.screen.fill(self.BLACK, self.rect_temp_wave)
-        if queue is not None:
-            self.draw_waveform(
-                queue=queue,
-                X_MIN=queue.X_MIN,
-                X_MAX=queue.X_MAX,
-                Y_MIN=queue.Y_MIN,
-                Y_MAX=queue.Y_MAX,
-                steps=queue.steps,
-                target_y=queue.target_y,
-            )
-        dirty.append(self.rect_temp_wave)
+        self._redraw_wave("temp", self.rect_temp_wave, dirty)
 
     def _redraw_flow_header(self, dirty: List[pygame.Rect]) -> None:
         flow_rate = self.flow.get_flow_rate() or 0.0
@@ -428,24 +459,7 @@ class Display:
         dirty.append(self.rect_flow_header)
 
     def _redraw_flow_wave(self, dirty: List[pygame.Rect]) -> None:
-        queue = self.wave_queues.get("flow")
-        token = self._wave_token(queue)
-        if token == self._last_flow_wave_token:
-            return
-        self._last_flow_wave_token = token
-
-        self.screen.fill(self.BLACK, self.rect_flow_wave)
-        if queue is not None:
-            self.draw_waveform(
-                queue=queue,
-                X_MIN=queue.X_MIN,
-                X_MAX=queue.X_MAX,
-                Y_MIN=queue.Y_MIN,
-                Y_MAX=queue.Y_MAX,
-                steps=queue.steps,
-                target_y=queue.target_y,
-            )
-        dirty.append(self.rect_flow_wave)
+        self._redraw_wave("flow", self.rect_flow_wave, dirty)
 
     def _redraw_boiler_header(self, dirty: List[pygame.Rect]) -> None:
         pwm_pct = self.boiler.pwm.get_display_value()
@@ -459,34 +473,38 @@ class Display:
         dirty.append(self.rect_boiler_header)
 
     def _redraw_boiler_wave(self, dirty: List[pygame.Rect]) -> None:
-        queue = self.wave_queues.get("boiler")
+        self._redraw_wave("boiler", self.rect_boiler_wave, dirty)
+
+    def _redraw_wave(
+        self, name: str, rect: pygame.Rect, dirty: List[pygame.Rect]
+    ) -> None:
+        queue = self.wave_queues.get(name)
         token = self._wave_token(queue)
-        if token == self._last_boiler_wave_token:
+        if token == self._last_wave_tokens.get(name):
             return
-        self._last_boiler_wave_token = token
-
-        self.screen.fill(self.BLACK, self.rect_boiler_wave)
-        if queue is not None:
-            self.draw_waveform(
-                queue=queue,
-                X_MIN=queue.X_MIN,
-                X_MAX=queue.X_MAX,
-                Y_MIN=queue.Y_MIN,
-                Y_MAX=queue.Y_MAX,
-                steps=queue.steps,
-                target_y=queue.target_y,
-            )
-        dirty.append(self.rect_boiler_wave)
+        self._last_wave_tokens[name] = token
+
+        if queue is None:
+            self.screen.fill(self.BLACK, rect)
+        else:
+            wave = self._waves.get(name)
+            if wave is None or wave.queue is not queue:
+                wave = self._waves[name] = ScrollingWave(queue, rect, self.colors)
+            # The axis follows the range the lines were drawn for; the
+            # queue's may already have moved on.
+            wave.update()
+            low, high = wave.value_range
+            self.screen.blit(self._axis_layer(name, rect, queue, low, high), rect)
+            self.screen.blit(wave.surface, rect)
+        dirty.append(rect)
 
     @staticmethod
     def _wave_token(queue: Optional[WaveQueue]) -> Any:
-        """Cheap "has the queue changed?" token. Length plus the id() of
-        the most recent tuple (which is a fresh object on every
-        add_to_queue call) is enough to detect new data without
-        comparing values."""
-        if queue is None or len(queue) == 0:
-            return (0, None)
-        return (len(queue), id(queue[-1]))
+        """Cheap "has the queue changed?" token: the queue's version goes
+        up on every add and clear, so no values are compared."""
+        if queue is None:
+            return None
+        return queue.version
 
     # ------------------------------------------------------------------ #
     #  Frame composition + main loop
@@ -508,21 +526,56 @@ class Display:
         self._redraw_boiler_wave(dirty)
         return dirty
 
+    def _flush(self, rects: List[pygame.Rect]) -> None:
+        """Put ``rects`` of the screen on the display."""
+        if self.framebuffer is not None:
+            self.framebuffer.blit(self.screen, rects)
+        elif not self.headless:
+            pygame.display.update(rects)
+
+    def _wait_for_next_frame(self, frame_started: float) -> None:
+        """Sleep until there is something to draw: a change signalled by the
+        producers, or a touch. Frames come at most ``fps`` times a second
+        while a pump routine runs and ``idle_fps`` otherwise, and at least
+        ``idle_fps`` times a second for the countdowns in the header."""
+        active = self.pump.is_active()
+        earliest = frame_started + 1.0 / (self.fps if active else self.idle_fps)
+        latest = frame_started + 1.0 / self.idle_fps
+        touches = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+        while not self._stop_event.is_set():
+            now = time.perf_counter()
+            if now >= latest or pygame.event.peek(touches):
+                break
+            if now < earliest:
+                time.sleep(min(_INPUT_POLL_SECONDS, earliest - now))
+            elif self.changed.wait(min(_INPUT_POLL_SECONDS, latest - now)):
+                break
+        # whatever changes from here on is for the next frame
+        self.changed.clear()
+
     def stop(self) -> None:
         self._stop_event.set()
+        self.changed.set()
 
     def start(self) -> None:
-        logger.info("display loop starting at %s fps", config.DISPLAY_FPS)
+        logger.info(
+            "display loop starting at up to %s fps (%s idle)", self.fps, self.idle_fps
+        )
         # First frame: clear the whole screen so any garbage from boot
         # is gone before partial updates start touching individual zones.
         self.screen.fill(self.BLACK)
-        pygame.display.update()
+        self._flush([self.screen.get_rect()])
 
-        clock = pygame.time.Clock()
         frame = 0
+        frame_started = 0.0
         try:
             while not self._stop_event.is_set():
                 try:
+                    now = time.perf_counter()
+                    if frame_started:
+                        self.frame_interval.record(now - frame_started)
+                    frame_started = now
+
                     for event in pygame.event.get():
                         x, _ = pygame.mouse.get_pos()
                         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -542,18 +595,21 @@ class Display:
                         # get flushed to the framebuffer. When nothing
                         # changed (rare with live data) we skip the
                         # flush entirely.
-                        pygame.display.update(dirty)
+                        self._flush(dirty)
+                    self.frame_time.record(time.perf_counter() - frame_started)
 
                     frame += 1
                     if frame == 1 or frame % 240 == 0:
                         logger.info("display heartbeat: frame=%d", frame)
 
-                    clock.tick(config.DISPLAY_FPS)
+                    self._wait_for_next_frame(frame_started)
                 except Exception:
                     logger.exception("display loop iteration failed (frame=%d)", frame)
                     time.sleep(1)
         finally:
             logger.info("display loop exiting after %d frames", frame)
+            if self.framebuffer is not None:
+                self.framebuffer.close()
             pygame.display.quit()
             pygame.quit()
 
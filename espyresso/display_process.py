@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""Display in its own process, fed through shared memory.
+
+Rendering in the control process takes the GIL away from the TSIC decoder,
+flow callbacks and control loop, which is why ``DISPLAY_FPS`` is so low.
+With ``config.DISPLAY_PROCESS`` the app runs ``DisplayProcess`` instead of
+``Display``:
+
+- The header and brew-strip values come from the process-wide
+  ``telemetry`` block, which the producers keep up to date themselves.
+- A publisher thread in the control process copies the window of every
+  ``WaveQueue`` with its range into a ``SharedSnapshot`` (a fixed-layout
+  ``multiprocessing.shared_memory`` block) whenever ``telemetry.changed``
+  is set, at most ``DISPLAY_PROCESS_FPS`` times a second, and then wakes
+  the display. That is a few kilobytes of copying and never blocks on the
+  display.
+- The display process (spawned, so it shares no threads or pigpio
+  connections) runs the unchanged ``Display`` on top of ``SnapshotView``
+  and ``WaveMirror`` stand-ins, which serve the values of the last
+  snapshots. Each frame starts with one copy of each block.
+- Touches come back over a pipe and are replayed on the real ``Buttons``.
+
+Both blocks are seqlocks (see ``espyresso.telemetry``), so the display never
+sees half a write.
+"""
+import logging
+import math
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from espyresso import config, telemetry
+from espyresso.telemetry import HEADER_SIZE, SeqlockBlock, Snapshot, Telemetry
+from espyresso.utils import WaveQueue
+
+if TYPE_CHECKING:
+    from espyresso.buttons import Buttons
+
+logger = logging.getLogger(__name__)
+
+# Per wave: its range and window, followed by capacity x MAX_SERIES values
+WAVE_HEADER = ("low", "high", "target_y", "steps", "count", "end", "width")
+MAX_SERIES = 7
+# Button callbacks the display process may trigger
+BUTTON_EVENTS = (
+    "rising_button_one",
+    "falling_button_one",
+    "rising_button_two",
+    "falling_button_two",
+)
+
+
+class WaveSpec(NamedTuple):
+    """What the display process needs to rebuild a ``WaveQueue``."""
+
+    low: int
+    high: int
+    X_MIN: int
+    X_MAX: int
+    Y_MIN: int
+    Y_MAX: int
+    steps: int
+    labels: Tuple[str, ...]
+
+    @classmethod
+    def of(cls, queue: WaveQueue) -> "WaveSpec":
+        return cls(
+            queue.min_low,
+            queue.max_high,
+            queue.X_MIN,
+            queue.X_MAX,
+            queue.Y_MIN,
+            queue.Y_MAX,
+            queue.steps,
+            tuple(queue.queue_labels),
+        )
+
+    @property
+    def capacity(self) -> int:
+        return max(1, math.ceil((self.X_MAX - self.X_MIN) / config.ZOOM))
+
+
+class SnapshotArrays(NamedTuple):
+    headers: Dict[str, "np.ndarray[Any, Any]"]
+    data: Dict[str, "np.ndarray[Any, Any]"]
+
+
+def _layout(
+    waves: Dict[str, WaveSpec], buffer: Any
+) -> Tuple[int, Optional[SnapshotArrays]]:
+    """Size of the block, and (with a ``buffer``) the arrays over it."""
+    offset = HEADER_SIZE
+    parts: Dict[str, Tuple[int, int]] = {}
+    for name, spec in waves.items():
+        parts[name] = (offset, spec.capacity)
+        offset += 8 * (len(WAVE_HEADER) + spec.capacity * MAX_SERIES)
+    if buffer is None:
+        return offset, None
+
+    f8 = np.float64
+    arrays = SnapshotArrays(
+        {
+            name: np.ndarray((len(WAVE_HEADER),), f8, buffer, at)
+            for name, (at, _) in parts.items()
+        },
+        {
+            name: np.ndarray(
+                (capacity, MAX_SERIES), f8, buffer, at + 8 * len(WAVE_HEADER)
+            )
+            for name, (at, capacity) in parts.items()
+        },
+    )
+    return offset, arrays
+
+
+class SharedSnapshot(SeqlockBlock):
+    """The wave block: created (and unlinked) by the control process,
+    attached to by name in the display process."""
+
+    def __init__(self, waves: Dict[str, WaveSpec], name: Optional[str] = None) -> None:
+        self.waves = waves
+        size, _ = _layout(waves, None)
+        super().__init__(size, name)
+        _, arrays = _layout(waves, self.shm.buf)
+        assert arrays is not None
+        self.arrays = arrays
+
+    def _release(self) -> None:
+        del self.arrays
+        super()._release()
+
+
+class Publisher(threading.Thread):
+    """Copies the wave windows into the snapshot when something changed,
+    at most ``fps`` times a second, and then sets ``ready``."""
+
+    def __init__(
+        self,
+        snapshot: SharedSnapshot,
+        *,
+        wave_queues: Dict[str, WaveQueue],
+        fps: float,
+        ready: Optional[Any] = None,
+    ) -> None:
+        super().__init__(name="display-publisher", daemon=True)
+        self.snapshot = snapshot
+        self.wave_queues = wave_queues
+        self.period = 1.0 / fps
+        self.ready = ready
+        self._stop_event = threading.Event()
+
+    def publish(self) -> None:
+        arrays = self.snapshot.arrays
+        with self.snapshot.writing():
+            for name, queue in self.wave_queues.items():
+                end, window = queue.snapshot()
+                count = len(window)
+                width = min(window.shape[1], MAX_SERIES) if count else 0
+                target = math.nan if queue.target_y is None else queue.target_y
+                header = (queue.low, queue.high, target, queue.steps)
+                arrays.headers[name][:] = header + (count, end, width)
+                arrays.data[name][:count, :width] = window[:, :width]
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            if not telemetry.changed.wait(0.5):
+                continue
+            telemetry.changed.clear()
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("display publish failed")
+            if self.ready is not None:
+                self.ready.set()
+            self._stop_event.wait(self.period)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+class WaveMirror(WaveQueue):
+    """A ``WaveQueue`` whose window and range come from the snapshot."""
+
+    def __init__(self, spec: WaveSpec) -> None:
+        super().__init__(
+            spec.low,
+            spec.high,
+            X_MIN=spec.X_MIN,
+            X_MAX=spec.X_MAX,
+            Y_MIN=spec.Y_MIN,
+            Y_MAX=spec.Y_MAX,
+            steps=spec.steps,
+        )
+        self.set_labels(list(spec.labels))
+        self._loaded: Tuple[float, ...] = ()
+
+    def load(
+        self, header: "np.ndarray[Any, Any]", data: "np.ndarray[Any, Any]"
+    ) -> None:
+        low, high, target, steps, count, end, width = header.tolist()
+        self.low, self.high, self.steps = int(low), int(high), int(steps)
+        self.target_y = None if math.isnan(target) else target
+        # a view of the local copy, which only changes on the next load
+        self._data = data[: int(count), : int(width)]
+        self._window = (0, int(count), int(end))
+        loaded = (end, count, low, high, target)
+        if loaded != self._loaded:
+            self._loaded = loaded
+            self.version += 1
+
+    def add_to_queue(self, new_value: Tuple[float, ...]) -> None:
+        raise TypeError("WaveMirror is read-only")
+
+
+class TelemetryView:
+    """Stands in for the scale, boiler, timer, pump, ranger and flow meter,
+    serving ``state``, a telemetry ``Snapshot``. Times derived from it are
+    taken at ``now()``, which must be the producers' clock."""
+
+    def __init__(
+        self,
+        state: Optional[Snapshot] = None,
+        now: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.state = Snapshot() if state is None else state
+        self.now = now
+        self.pwm = self
+
+    def get_started_time(self) -> float:
+        return self.state.started_time
+
+    def get_boiling(self) -> bool:
+        return bool(self.state.boiling)
+
+    def get_current_distance(self) -> float:
+        return self.state.water
+
+    def get_time_since_started(self) -> float:
+        return self.state.brew_seconds(self.now())
+
+    def get_time_since_started_preinfuse(self) -> float:
+        return self.state.preinfuse_seconds(self.now())
+
+    def get_millilitres(self) -> float:
+        return self.state.flow_ml
+
+    def get_flow_rate(self) -> float:
+        return self.state.current_flow_rate(self.now())
+
+    def get_scale_weight(self) -> float:
+        return self.state.scale_weight(self.now())
+
+    def is_active(self) -> bool:
+        return bool(self.state.pump_active)
+
+    def get_display_value(self) -> str:
+        # same text as PWM.get_display_value
+        return str(round(self.state.boiler_pwm * 100, 1))
+
+
+class SnapshotView(TelemetryView):
+    """``TelemetryView`` of the last snapshots in the display process. The
+    producers stamp events with SYSTEM_CLOCK, which is ``perf_counter``."""
+
+    def __init__(self, snapshot: SharedSnapshot, telemetry: Telemetry) -> None:
+        super().__init__()
+        self.snapshot = snapshot
+        self.telemetry = telemetry
+        self._local = np.zeros(snapshot.size, np.uint8)
+        _, arrays = _layout(snapshot.waves, self._local.data)
+        assert arrays is not None
+        self._arrays = arrays
+        self.waves: Dict[str, WaveQueue] = {
+            name: WaveMirror(spec) for name, spec in snapshot.waves.items()
+        }
+
+    def refresh(self) -> bool:
+        """Load both blocks; False if either kept changing under the copy,
+        in which case its previous values are kept."""
+        state = self.telemetry.read()
+        if state is not None:
+            self.state = state
+        if not self.snapshot.read_into(self._local):
+            return False
+        for name, wave in self.waves.items():
+            assert isinstance(wave, WaveMirror)
+            wave.load(self._arrays.headers[name], self._arrays.data[name])
+        return state is not None
+
+
+class ButtonRelay:
+    """Sends the display's touch events to the control process."""
+
+    def __init__(self, conn: Connection) -> None:
+        self.conn = conn
+
+    def __getattr__(self, name: str) -> Callable[[], None]:
+        if name not in BUTTON_EVENTS:
+            raise AttributeError(name)
+        return lambda: self.conn.send(name)
+
+
+def relay_buttons(
+    conn: Connection, buttons: "Buttons", stop_event: threading.Event
+) -> None:
+    """Replay touch events from the display process on ``buttons``."""
+    while not stop_event.is_set():
+        try:
+            if not conn.poll(0.5):
+                continue
+            name = conn.recv()
+        except (EOFError, OSError):
+            return
+        if name in BUTTON_EVENTS:
+            getattr(buttons, name)()
+
+
+class DisplayProcess:
+    """Drop-in for ``Display`` in the app: ``start`` runs the display in a
+    child process and blocks until it exits, ``stop`` ends it. The values
+    it shows are read from the process-wide ``telemetry`` block."""
+
+    def __init__(
+        self,
+        *,
+        buttons: "Buttons",
+        wave_queues: Dict[str, WaveQueue],
+        fps: float = config.DISPLAY_PROCESS_FPS,
+    ) -> None:
+        self.buttons = buttons
+        self.wave_queues = wave_queues
+        self.fps = fps
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        # set by the publisher after each publish; the display sleeps on it
+        self._changed = self._context.Event()
+        self._relay_stop = threading.Event()
+
+    def start(self) -> None:
+        state = telemetry.get()
+        owned = state is None
+        if state is None:
+            state = telemetry.init()
+        # Labels are set by now (Temperature sets them on construction).
+        waves = {name: WaveSpec.of(q) for name, q in self.wave_queues.items()}
+        snapshot = SharedSnapshot(waves)
+        publisher = Publisher(
+            snapshot, wave_queues=self.wave_queues, fps=self.fps, ready=self._changed
+        )
+        publisher.publish()
+        publisher.start()
+
+        receive, send = self._context.Pipe(duplex=False)
+        relay = threading.Thread(
+            target=relay_buttons,
+            args=(receive, self.buttons, self._relay_stop),
+            name="display-buttons",
+            daemon=True,
+        )
+        relay.start()
+
+        process = self._context.Process(
+            target=run_display,
+            args=(
+                snapshot.name,
+                waves,
+                state.name,
+                send,
+                self._stop,
+                self._changed,
+                self.fps,
+            ),
+            name="espyresso-display",
+        )
+        process.start()
+        logger.info("display process %s started", process.pid)
+        try:
+            process.join()
+        finally:
+            logger.info("display process exited with %s", process.exitcode)
+            publisher.stop()
+            self._relay_stop.set()
+            publisher.join(timeout=1.0)
+            snapshot.close(unlink=True)
+            if owned:
+                telemetry.shutdown()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._changed.set()
+
+
+def run_display(
+    snapshot_name: str,
+    waves: Dict[str, WaveSpec],
+    telemetry_name: str,
+    buttons: Connection,
+    stop: Any,
+    changed: Any,
+    fps: float,
+) -> None:
+    """Entry point of the display process."""
+    # Ctrl-C reaches the whole process group; the control process decides
+    # when the display stops.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.DEBUG if config.DEBUG else logging.INFO,
+        format="%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s",
+    )
+    from espyresso.display import Display
+
+    snapshot = SharedSnapshot(waves, name=snapshot_name)
+    state = Telemetry(name=telemetry_name)
+    view = SnapshotView(snapshot, state)
+    view.refresh()
+    # serves every getter the display calls on the real objects
+    remote: Any = view
+    relay: Any = ButtonRelay(buttons)
+    parent = multiprocessing.parent_process()
+
+    class SharedDisplay(Display):
+        def _render_frame(self) -> Any:
+            if stop.is_set() or (parent is not None and not parent.is_alive()):
+                self.stop()
+                return []
+            view.refresh()
+            return super()._render_frame()
+
+    display = SharedDisplay(
+        bluetooth_scale=remote,
+        boiler=remote,
+        buttons=relay,
+        brewing_timer=remote,
+        pump=remote,
+        ranger=remote,
+        flow=remote,
+        get_started_time=view.get_started_time,
+        wave_queues=view.waves,
+        fps=fps,
+        changed=changed,
+    )
+    try:
+        display.start()
+    finally:
+        snapshot.close()
+        state.close()
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 import logging
 import time
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Callable, List, Optional
 
 import pigpio
 
-from espyresso import config
+from espyresso import config, metrics, telemetry
+from espyresso.clock import SYSTEM_CLOCK, Clock
 
 if TYPE_CHECKING:
     from pigpio import pi
@@ -31,9 +32,12 @@ _PULSE_INTERVAL = (_PULSE_RATES[-1] - _PULSE_RATES[0]) / (len(_PULSE_RATES) - 1)
 
 
 class Flow:
-    def __init__(self, pigpio_pi: "pi", flow_queue: "WaveQueue"):
+    def __init__(
+        self, pigpio_pi: "pi", flow_queue: "WaveQueue", clock: Clock = SYSTEM_CLOCK
+    ):
         logger.debug("Flow initializing")
         self.pigpio_pi = pigpio_pi
+        self.clock = clock
         self.flow_in_gpio = config.FLOW_IN_GPIO
         self.pigpio_pi.set_mode(self.flow_in_gpio, pigpio.INPUT)
         self.pigpio_pi.callback(
@@ -46,7 +50,7 @@ class Flow:
 
         self.flow_queue = flow_queue
 
-        self.pulse_start: float = time.perf_counter()
+        self.pulse_start: float = self.clock.now()
 
         self.prev_pulse_time: float = 0.0
         self.prev_change_time: float = 0.0
@@ -54,6 +58,19 @@ class Flow:
         self.first_half_period: Optional[float] = None
         self.second_half_period: Optional[float] = None
 
+        # Called with "flow_start" (published here) and "brew_start" /
+        # "brew_end" (published by Pump), on the publishing thread, so they
+        # must return quickly.
+        self.listeners: List[Callable[[str], None]] = []
+        self.callback_time = metrics.histogram("flow_callback")
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        self.listeners.append(listener)
+
+    def publish(self, event: str) -> None:
+        for listener in self.listeners:
+            listener(event)
+
     def reset_pulse_count(self) -> None:
         self.total_volume = 0.0
         self.pulse_count = 0
@@ -61,13 +78,21 @@ class Flow:
         self.prev_change_time = 0.0
         self.first_half_period = None
         self.second_half_period = None
-        self.pulse_start = time.perf_counter()
+        self.pulse_start = self.clock.now()
         self.flow_queue.clear()
+        self._publish()
 
     def pulse_callback(self, gpio: int, level: int, tick: int) -> None:
-
+        started = time.perf_counter()
+        try:
+            self._pulse(self.clock.now())
+            self._publish()
+        finally:
+            # callback cost is real time, also under a simulated clock
+            self.callback_time.record(time.perf_counter() - started)
+
+    def _pulse(self, current_time: float) -> None:
         # Skip sub 20ms erratic pulses
-        current_time = time.perf_counter()
         if (
             self.prev_change_time
             and current_time - self.prev_change_time < config.FLOW_METER_DEBOUNCE_TIME
@@ -79,6 +104,11 @@ class Flow:
             return None
 
         self.pulse_count += 1
+        if (
+            not self.prev_pulse_time
+            or current_time - self.prev_pulse_time > config.FLOW_START_GAP
+        ):
+            self.publish("flow_start")
 
         self.first_half_period, self.second_half_period = (
             self.second_half_period,
@@ -108,6 +138,14 @@ class Flow:
 
         self.flow_queue.add_to_queue((flow_rate, average_rate))
 
+    def _publish(self) -> None:
+        telemetry.update(
+            flow_ml=self.total_volume,
+            flow_rate=self.get_flow_rate() or 0.0,
+            flow_pulses=self.pulse_count,
+            flow_pulse_time=self.prev_pulse_time,
+        )
+
     def get_pulse_count(self) -> int:
         return self.pulse_count
 
@@ -120,7 +158,7 @@ class Flow:
         elif not self.first_half_period:
             pulse_rate = 0.5 / self.second_half_period
         else:
-            time_since_last_pulse = time.perf_counter() - self.prev_pulse_time
+            time_since_last_pulse = self.clock.now() - self.prev_pulse_time
             pulse_rate = 1 / (
                 max(time_since_last_pulse, self.first_half_period)
                 + self.second_half_period
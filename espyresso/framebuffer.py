@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Display output straight to a Linux framebuffer device.
+
+With ``config.DISPLAY_BACKEND = "framebuffer"`` the display renders into
+SDL's off-screen "dummy" surface and ``Framebuffer.blit`` copies only the
+rects a frame changed into the memory-mapped device, converting them to
+its pixel format with a few whole-array NumPy operations. SDL's fbdev
+path tends to copy and convert the whole surface in software instead.
+
+The geometry comes from sysfs when the device has it, so a plain file of
+the right size stands in for the device in tests. SDL gets no input
+device this way; the GPIO buttons still work.
+"""
+import mmap
+import os
+from typing import Any, Iterable, Optional, Tuple
+
+import numpy as np
+import pygame
+
+from espyresso import config
+
+SYSFS = "/sys/class/graphics"
+
+
+def rgb565(rgb: "np.ndarray[Any, Any]") -> "np.ndarray[Any, Any]":
+    """Pack ``(..., 3)`` 8-bit RGB into 16-bit RGB565."""
+    r = rgb[..., 0].astype(np.uint16)
+    g = rgb[..., 1].astype(np.uint16)
+    b = rgb[..., 2].astype(np.uint16)
+    packed: "np.ndarray[Any, Any]" = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+    return packed
+
+
+def xrgb8888(rgb: "np.ndarray[Any, Any]") -> "np.ndarray[Any, Any]":
+    """Pack ``(..., 3)`` 8-bit RGB into 32-bit XRGB8888."""
+    r = rgb[..., 0].astype(np.uint32)
+    g = rgb[..., 1].astype(np.uint32)
+    b = rgb[..., 2].astype(np.uint32)
+    packed: "np.ndarray[Any, Any]" = (r << 16) | (g << 8) | b
+    return packed
+
+
+FORMATS = {16: (np.uint16, rgb565), 32: (np.uint32, xrgb8888)}
+
+
+def _sysfs(device: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(SYSFS, os.path.basename(device), name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class Framebuffer:
+    def __init__(
+        self,
+        path: str,
+        size: Tuple[int, int] = (config.WIDTH, config.HEIGHT),
+        bits_per_pixel: int = 16,
+        stride: Optional[int] = None,
+    ) -> None:
+        if bits_per_pixel not in FORMATS:
+            raise ValueError(f"unsupported framebuffer depth {bits_per_pixel}")
+        dtype, self.pack = FORMATS[bits_per_pixel]
+        width, height = size
+        pixel_bytes = bits_per_pixel // 8
+        # bytes per row, which the driver may pad
+        self.stride = stride or width * pixel_bytes
+        self.size = size
+
+        self._file = open(path, "r+b")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), self.stride * height)
+        except Exception:
+            self._file.close()
+            raise
+        rows: "np.ndarray[Any, Any]" = np.ndarray(
+            (height, self.stride // pixel_bytes), dtype, self._map
+        )
+        # (height, width), like the screen
+        self.pixels: "np.ndarray[Any, Any]" = rows[:, :width]
+
+    @classmethod
+    def open(cls, device: str) -> "Framebuffer":
+        """Map ``device`` with the geometry the kernel reports for it,
+        falling back to the configured screen size in RGB565."""
+        size = (config.WIDTH, config.HEIGHT)
+        virtual_size = _sysfs(device, "virtual_size")
+        if virtual_size:
+            width, height = virtual_size.split(",")
+            size = (int(width), int(height))
+        bits_per_pixel = int(_sysfs(device, "bits_per_pixel") or 16)
+        stride = int(_sysfs(device, "stride") or 0) or None
+        return cls(device, size, bits_per_pixel, stride)
+
+    def write(self, x: int, y: int, rgb: "np.ndarray[Any, Any]") -> None:
+        """Write ``rgb``, a ``(width, height, 3)`` block in surfarray order,
+        with its top left corner at ``(x, y)``; what falls outside the
+        framebuffer is dropped."""
+        height, width = self.pixels.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + rgb.shape[0], width), min(y + rgb.shape[1], height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        block = rgb[x0 - x : x1 - x, y0 - y : y1 - y]
+        self.pixels[y0:y1, x0:x1] = self.pack(block).T
+
+    def blit(self, surface: pygame.Surface, rects: Iterable[Any]) -> None:
+        """Copy ``rects`` of ``surface`` to the same place on the device."""
+        # a view of the surface, which stays locked while it exists
+        pixels = pygame.surfarray.pixels3d(surface)
+        try:
+            for rect in rects:
+                x, y, w, h = rect
+                x0, y0 = max(x, 0), max(y, 0)
+                self.write(x0, y0, pixels[x0 : x + w, y0 : y + h])
+        finally:
+            del pixels
+
+    def close(self) -> None:
+        # the pixel view must go before the map
+        del self.pixels
+        self._map.close()
+        self._file.close()
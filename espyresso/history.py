@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Long-range history of a wave, downsampled into tiers of time buckets.
+
+A ``WaveQueue`` only holds the samples that fit on screen, about a minute
+of the temperature wave. ``History`` keeps the rest at lower resolution:
+every sample goes into the finest tier's open bucket (min, max and sum per
+series), and when a bucket closes it is folded into the next tier's, so
+a sample costs one small array update and the coarse tiers only see one
+fold per finer bucket. Each tier is a fixed ring of buckets, so memory is
+bounded by ``TIERS`` no matter how long the machine is on:
+
+    1 s buckets   for the last 10 minutes
+    10 s buckets  for the last hour
+    60 s buckets  for the last 6 hours
+
+``window(seconds)`` returns the buckets of the finest tier that reaches
+that far back, so the display can zoom out to the warm-up or the last
+hour without keeping every sample or re-reading the shot logs.
+
+Like ``WaveQueue``, a tier writes the next bucket into a free slot and
+then publishes its window, so the display thread reads without a lock.
+"""
+import math
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from espyresso.clock import SYSTEM_CLOCK, Clock
+
+# (bucket seconds, buckets kept), finest first
+TIERS: Tuple[Tuple[float, int], ...] = ((1.0, 600), (10.0, 360), (60.0, 360))
+
+
+class Buckets(NamedTuple):
+    """Buckets oldest first: start times, and per bucket and series the
+    lowest, highest and mean value (arrays of shape (buckets, series))."""
+
+    times: "np.ndarray[Any, Any]"
+    low: "np.ndarray[Any, Any]"
+    high: "np.ndarray[Any, Any]"
+    mean: "np.ndarray[Any, Any]"
+
+
+class _Tier:
+    def __init__(self, seconds: float, capacity: int, width: int) -> None:
+        self.seconds = seconds
+        self.capacity = capacity
+        self._ring = capacity + 1
+        self._times = np.zeros(self._ring)
+        self._low = np.zeros((self._ring, width))
+        self._high = np.zeros((self._ring, width))
+        self._mean = np.zeros((self._ring, width))
+        self._window = (0, 0)
+
+        # the open bucket
+        self.index: Optional[int] = None
+        self.low = np.full(width, math.inf)
+        self.high = np.full(width, -math.inf)
+        self.sum = np.zeros(width)
+        self.count = 0
+
+    def fold(
+        self,
+        t: float,
+        low: "np.ndarray[Any, Any]",
+        high: "np.ndarray[Any, Any]",
+        total: "np.ndarray[Any, Any]",
+        count: int,
+    ) -> Optional[Tuple[float, Any, Any, Any, int]]:
+        """Add ``count`` samples summarised as low/high/total at time
+        ``t``; returns the bucket this closed, if any."""
+        index = math.floor(t / self.seconds)
+        closed = None
+        if index != self.index:
+            closed = self.close()
+            self.index = index
+        np.minimum(self.low, low, out=self.low)
+        np.maximum(self.high, high, out=self.high)
+        self.sum += total
+        self.count += count
+        return closed
+
+    def close(self) -> Optional[Tuple[float, Any, Any, Any, int]]:
+        if self.index is None or not self.count:
+            return None
+        start, count = self._window
+        if count >= self.capacity:
+            start = (start + 1) % self._ring
+            count -= 1
+        slot = (start + count) % self._ring
+        t = self.index * self.seconds
+        self._times[slot] = t
+        self._low[slot] = self.low
+        self._high[slot] = self.high
+        self._mean[slot] = self.sum / self.count
+        self._window = (start, count + 1)
+
+        closed = (t, self.low.copy(), self.high.copy(), self.sum.copy(), self.count)
+        self.low.fill(math.inf)
+        self.high.fill(-math.inf)
+        self.sum.fill(0.0)
+        self.count = 0
+        return closed
+
+    def buckets(self, since: float) -> Buckets:
+        start, count = self._window
+        slots = (start + np.arange(count)) % self._ring
+        times = self._times[slots]
+        keep = slots[times + self.seconds > since]
+        buckets = Buckets(
+            self._times[keep], self._low[keep], self._high[keep], self._mean[keep]
+        )
+        if self.count and self.index is not None:
+            # the open bucket too, so the newest data shows up right away
+            buckets = Buckets(
+                np.append(buckets.times, self.index * self.seconds),
+                np.vstack((buckets.low, self.low)),
+                np.vstack((buckets.high, self.high)),
+                np.vstack((buckets.mean, self.sum / self.count)),
+            )
+        return buckets
+
+
+class History:
+    """Tiered min/max/mean history of samples with ``width`` series.
+
+    ``WaveQueue`` feeds it from ``add_to_queue`` when given one; the width
+    is taken from the first sample if not given. The app's queues don't
+    carry one until the display has a zoomed-out view to read it."""
+
+    def __init__(
+        self,
+        width: Optional[int] = None,
+        *,
+        tiers: Sequence[Tuple[float, int]] = TIERS,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.tier_specs = tuple(tiers)
+        self.tiers: List[_Tier] = []
+        if width is not None:
+            self._allocate(width)
+
+    def _allocate(self, width: int) -> None:
+        self.tiers = [
+            _Tier(seconds, capacity, width) for seconds, capacity in self.tier_specs
+        ]
+
+    @property
+    def width(self) -> Optional[int]:
+        return len(self.tiers[0].sum) if self.tiers else None
+
+    def add(self, sample: Sequence[float], t: Optional[float] = None) -> None:
+        """Record one sample, at ``t`` or now."""
+        if not self.tiers:
+            self._allocate(len(sample))
+        t = self.clock.now() if t is None else t
+        values = np.asarray(sample, dtype=float)
+        if len(values) != self.width:
+            raise ValueError(f"History holds {self.width} series, got {len(values)}")
+
+        closed = self.tiers[0].fold(t, values, values, values, 1)
+        for tier in self.tiers[1:]:
+            if closed is None:
+                break
+            closed = tier.fold(*closed)
+
+    def tier_for(self, seconds: float) -> int:
+        """Index of the finest tier that covers the last ``seconds``."""
+        for i, (bucket, capacity) in enumerate(self.tier_specs):
+            if bucket * capacity >= seconds:
+                return i
+        return len(self.tier_specs) - 1
+
+    def window(self, seconds: float, now: Optional[float] = None) -> Buckets:
+        """Buckets of the last ``seconds``, from the finest tier that
+        reaches back that far (or the coarsest one)."""
+        if not self.tiers:
+            empty = np.empty((0, 0))
+            return Buckets(np.empty(0), empty, empty, empty)
+        now = self.clock.now() if now is None else now
+        return self.tiers[self.tier_for(seconds)].buckets(now - seconds)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Latency histograms for the real-time paths, and a status socket.
+
+Every histogram has a fixed set of log-linear buckets (HDR-style: 16
+linear sub-buckets per power of two of microseconds, so each value is
+kept to within about 6 %). ``record`` only bumps a preallocated array
+slot, so it can run in the TSIC, flow and control threads at any rate
+without the memory growing.
+
+Histograms are process-wide, like the shot logger, so components just do
+``metrics.histogram("flow_callback").record(seconds)``:
+
+- ``tsic_queue``     TSIC packet received -> control step picks it up
+- ``tsic_to_pwm``    TSIC packet received -> heater PWM written
+- ``control_jitter`` how late each control tick woke up
+- ``control_step``   run time of one control step
+- ``display_frame``  one display frame: input events, render and flush
+- ``display_interval`` time between frame starts (stalls show as the tail)
+- ``flow_callback``  run time of one flow-meter pulse callback
+
+``StatusServer`` answers every connection on a Unix socket with a JSON
+snapshot of all of them, e.g. ``nc -U /tmp/espyresso-metrics.sock``.
+"""
+import json
+import logging
+import os
+import socketserver
+import threading
+from array import array
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 2**SUB_BITS linear buckets below 2**SUB_BITS µs, then half as many per
+# power of two above.
+SUB_BITS = 5
+_SUB_COUNT = 1 << SUB_BITS
+_HALF = _SUB_COUNT >> 1
+
+
+def _bucket(us: int) -> int:
+    if us < _SUB_COUNT:
+        return us
+    shift = us.bit_length() - SUB_BITS
+    return _SUB_COUNT + (shift - 1) * _HALF + (us >> shift) - _HALF
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """[low, high) in µs of the values counted in bucket ``index``."""
+    if index < _SUB_COUNT:
+        return index, index + 1
+    shift, offset = divmod(index - _SUB_COUNT, _HALF)
+    shift += 1
+    low = (offset + _HALF) << shift
+    return low, low + (1 << shift)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations, recorded in seconds.
+
+    Values above ``highest`` seconds land in the last bucket. Meant for
+    one writer thread; a reader may see a snapshot that is one sample
+    behind on some fields, which is fine for monitoring."""
+
+    def __init__(self, name: str, highest: float = 10.0) -> None:
+        self.name = name
+        self.highest_us = int(highest * 1e6)
+        self.counts = array("q", bytes(8 * (_bucket(self.highest_us) + 1)))
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, seconds: float) -> None:
+        us = int(seconds * 1e6)
+        if us < 0:
+            us = 0
+        elif us > self.highest_us:
+            us = self.highest_us
+        self.counts[_bucket(us)] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, q: float) -> float:
+        """Upper bound in seconds of the bucket holding the q-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q / 100.0 * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_bounds(index)[1], self.max_us + 1) / 1e6
+        return self.max_us / 1e6
+
+    def reset(self) -> None:
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Count and summary in milliseconds."""
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": self.total_us / max(count, 1) / 1000.0,
+            "p50_ms": self.percentile(50) * 1000.0,
+            "p90_ms": self.percentile(90) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0,
+            "max_ms": self.max_us / 1000.0,
+        }
+
+
+_HISTOGRAMS: Dict[str, Histogram] = {}
+_LOCK = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    """The process-wide histogram called ``name``, created on first use."""
+    h = _HISTOGRAMS.get(name)
+    if h is None:
+        with _LOCK:
+            h = _HISTOGRAMS.setdefault(name, Histogram(name))
+    return h
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    return {name: h.snapshot() for name, h in sorted(_HISTOGRAMS.items())}
+
+
+def reset() -> None:
+    for h in list(_HISTOGRAMS.values()):
+        h.reset()
+
+
+class _StatusHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        self.request.sendall(json.dumps(snapshot(), indent=1).encode() + b"\n")
+
+
+class StatusServer(threading.Thread):
+    """Serves ``snapshot()`` as JSON to anyone connecting to ``path``."""
+
+    def __init__(self, path: str, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("name", "metrics-status")
+        kwargs.setdefault("daemon", True)
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._server: Optional[socketserver.UnixStreamServer] = None
+        self._ready = threading.Event()
+
+    def run(self) -> None:
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = socketserver.UnixStreamServer(self.path, _StatusHandler)
+        except OSError:
+            logger.exception("metrics status socket %s unavailable", self.path)
+            return
+        finally:
+            self._ready.set()
+        logger.info("metrics status on %s", self.path)
+        self._server.serve_forever(poll_interval=0.5)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self) -> None:
+        server = self._server
+        if server is None:
+            return
+        server.shutdown()
+        server.server_close()
+        self._server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 
+import json
 import logging
 import math
-import time
-from typing import TYPE_CHECKING, Any, Dict, Tuple
+import os
+from array import array
+from collections import deque
+from itertools import product
+from operator import le, mul
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Deque, List, Optional, Sequence, Tuple
 
 from espyresso import config
+from espyresso.clock import SYSTEM_CLOCK, Clock
 
 if TYPE_CHECKING:
     from espyresso.flow import Flow
@@ -13,372 +20,872 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
-class PController:
-    def __init__(self, initial_temperature: float, flow: "Flow") -> None:
-
-        self.temp_setpoint = config.TARGET_TEMP
-
-        self.elementTemp = initial_temperature
-        self.shellTemp = initial_temperature
-
-        self.ambientTemp = min(self.shellTemp, config.AMBIENT_TEMPERATURE)
-
-        self.waterTemp = initial_temperature
-        self.modeledSensorTemp = initial_temperature
-
-        # based on heat transfer coefficients to and from brewhead, we can caluculate its steady state temp - use that
-        self.brewHeadTemp = (
-            self.ambientTemp * config.BREWHEAD_AMBIENT_XFER_COEFF
-            + self.shellTemp * config.BOILER_BREWHEAD_XFER_COEFF
-        ) / (config.BREWHEAD_AMBIENT_XFER_COEFF + config.BOILER_BREWHEAD_XFER_COEFF)
-
-        self.bodyTemp = self.shellTemp
-
-        self.pumpPowerRate = 0.0
-        self.heaterPower = 0.0
-        self.lastBoilerPidTime: float = time.perf_counter()
-        self.flow = flow
-        # Populated every update() so callers can introspect intermediate
-        # power terms, error, safety bounds, etc. without re-computing them.
-        self.diagnostics: Dict[str, Any] = {}
-
-    def set_target_temp(self, temperature: float) -> None:
-        self.temp_setpoint = temperature
-
-    def update(
-        self, *, temperature: float, boiling: bool
-    ) -> Tuple[float, Tuple[float, ...]]:
-
-        logger.debug("\n")
-        current_time = time.perf_counter()
-        logger.debug("CURRENT_TIME: %s", current_time)
-        deltaTime = current_time - self.lastBoilerPidTime
-        logger.debug("deltaTime: %s", deltaTime)
-        self.lastBoilerPidTime = current_time
-        logger.debug("lastBoilerPidTime: %s", self.lastBoilerPidTime)
-
-        flow_rate = self.flow.get_flow_rate() or 0
-        logger.debug("FLOWRATE %s", flow_rate)
-        # Max flow rate
-        flow_rate = flow_rate if flow_rate < 2.0 else 2.0
-
-        # TODO: verify flow
-        waterToFlowPower = (
-            flow_rate
-            * (self.waterTemp - config.RESERVOIR_TEMPERATURE)
-            * config.SPEC_HEAT_WATER_100
-        )
-        logger.debug("waterToFlowPower: %s", waterToFlowPower)
-
-        # How much power is lost to the atmosphere from the brew head?
-        brewHeadToAmbientPower = (
-            self.brewHeadTemp - self.ambientTemp
-        ) * config.BREWHEAD_AMBIENT_XFER_COEFF
-        logger.debug("brewHeadToAmbientPower: %s", brewHeadToAmbientPower)
-
-        # How much power is transferred from the boiler to the water?
-        shellToWaterPower = (
-            (self.shellTemp - self.waterTemp)
-            * config.BOILER_WATER_XFER_COEFF_NOFLOW
-            / 2.0
-        )
-        logger.debug("shellToWaterPower: %s", shellToWaterPower)
-        elementToWaterPower = (
-            (self.elementTemp - self.waterTemp)
-            * config.BOILER_WATER_XFER_COEFF_NOFLOW
-            / 2.0
-        )
-        logger.debug("elementToWaterPower: %s", elementToWaterPower)
-
-        # How much power is transferred from the boiler to the brew head?
-        shellToBrewHeadPower = (
-            (self.shellTemp - self.brewHeadTemp)
-            * config.BOILER_BREWHEAD_XFER_COEFF
-            / 2.0
-        )
-        logger.debug("shellToBrewHeadPower: %s", shellToBrewHeadPower)
-        elementToBrewHeadPower = (
-            (self.elementTemp - self.brewHeadTemp)
-            * config.BOILER_BREWHEAD_XFER_COEFF
-            / 2.0
-        )
-        logger.debug("elementToBrewHeadPower: %s", elementToBrewHeadPower)
-        # TODO: FLOW POWER?
-        waterFlowToBrewHeadPower = (
-            (self.waterTemp - self.brewHeadTemp)
-            * flow_rate
-            * config.SPEC_HEAT_WATER_100
+class ScalarOps:
+    """Scalar stand-ins for the few numpy functions the model uses.
+
+    The step functions below are written once and evaluated either on plain
+    floats (``PController``, one sample at a time) or on numpy arrays
+    (``espyresso.pcontroller_batch``, many traces at once) by passing
+    ``xp=numpy``. Only element-wise arithmetic, comparisons combined with
+    ``&`` and these three helpers are allowed in the model equations."""
+
+    minimum = staticmethod(min)
+    maximum = staticmethod(max)
+
+    @staticmethod
+    def where(cond: Any, a: Any, b: Any) -> Any:
+        return a if cond else b
+
+
+SCALAR_OPS = ScalarOps()
+
+# Thermal masses, in the order the display legend and wave queue use.
+MASS_FIELDS = (
+    "shellTemp",
+    "elementTemp",
+    "waterTemp",
+    "bodyTemp",
+    "brewHeadTemp",
+    "modeledSensorTemp",
+)
+
+# Terms model_step writes onto its ``d`` argument.
+MODEL_DIAGNOSTICS = (
+    "deltaTime",
+    "flow_rate",
+    "waterToFlowPower",
+    "brewHeadToAmbientPower",
+    "shellToWaterPower",
+    "elementToWaterPower",
+    "shellToBrewHeadPower",
+    "elementToBrewHeadPower",
+    "waterFlowToBrewHeadPower",
+    "elementToShellPower",
+    "shellToBodyPower",
+    "elementToBodyPower",
+    "elementTempDelta",
+    "delta_to_apply",
+    "steadystate",
+)
+
+# Terms heater_step writes onto its ``out`` argument, with the values
+# reported for them while the boiler is off.
+HEATER_DIAGNOSTICS = (
+    ("desiredWaterInputPower", math.nan),
+    ("desiredAverageShellTemp", math.nan),
+    ("maxStableAverageShellTemp", math.nan),
+    ("error", math.nan),
+    ("heaterPower_W", 0.0),
+    ("maxAllowableElementToShellPower", math.nan),
+    ("maxAllowableElementTemp", math.nan),
+    ("maxAllowablePowerForElement", math.nan),
+)
+
+# Constants the model equations read from ``p``. Offline tools (batch
+# replay, calibration) pass a namespace with some of them overridden
+# instead of patching the config module.
+MODEL_PARAMS = (
+    "TARGET_TEMP",
+    "MAX_BOILER_POWER",
+    "ELEMENT_MAX_TEMPERATURE",
+    "SHELL_MAX_TEMPERATURE",
+    "AMBIENT_TEMPERATURE",
+    "RESERVOIR_TEMPERATURE",
+    "SPEC_HEAT_WATER_100",
+    "SPEC_HEAT_ALUMINIUM",
+    "SPEC_HEAT_BRASS",
+    "BOILER_VOLUME",
+    "MASS_BOILER_SHELL",
+    "MASS_BREW_HEAD",
+    "MASS_PORTAFILTER",
+    "HEAT_CAPACITY_BODY",
+    "BREWHEAD_AMBIENT_XFER_COEFF",
+    "BOILER_WATER_XFER_COEFF_NOFLOW",
+    "BOILER_BREWHEAD_XFER_COEFF",
+    "ELEMENT_SHELL_XFER_COEFF",
+    "BOILER_BODY_XFER_COEFF",
+    "SENSOR_HEAT_CAPACITY",
+    "SENSOR_XFER_COEFF",
+    "MPC_STEADY_STATE",
+    "MPC_SMOOTHING",
+)
+
+
+def model_params(**overrides: Any) -> SimpleNamespace:
+    """Snapshot of the current config model constants, with overrides."""
+    unknown = set(overrides) - set(MODEL_PARAMS)
+    if unknown:
+        raise ValueError(f"unknown model parameters: {sorted(unknown)}")
+    values = {name: getattr(config, name) for name in MODEL_PARAMS}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def init_model(
+    m: Any, initial_temperature: Any, p: Any = config, xp: Any = SCALAR_OPS
+) -> None:
+    """Seed the thermal masses on ``m`` from a single sensor reading."""
+    m.elementTemp = initial_temperature
+    m.shellTemp = initial_temperature
+
+    m.ambientTemp = xp.minimum(m.shellTemp, p.AMBIENT_TEMPERATURE)
+
+    m.waterTemp = initial_temperature
+    m.modeledSensorTemp = initial_temperature
+
+    # based on heat transfer coefficients to and from brewhead, we can caluculate its steady state temp - use that
+    m.brewHeadTemp = (
+        m.ambientTemp * p.BREWHEAD_AMBIENT_XFER_COEFF
+        + m.shellTemp * p.BOILER_BREWHEAD_XFER_COEFF
+    ) / (p.BREWHEAD_AMBIENT_XFER_COEFF + p.BOILER_BREWHEAD_XFER_COEFF)
+
+    m.bodyTemp = m.shellTemp
+
+
+def model_step(
+    m: Any,
+    d: Any,
+    *,
+    temperature: Any,
+    deltaTime: Any,
+    flow_rate: Any,
+    p: Any = config,
+    xp: Any = SCALAR_OPS,
+) -> None:
+    """Advance the thermal masses on ``m`` by ``deltaTime`` seconds.
+
+    Uses ``m.heaterPower`` from the previous step, then nudges the model
+    towards the measured ``temperature``. The intermediate power terms
+    (``MODEL_DIAGNOSTICS``) are written onto ``d``, which may be ``m``."""
+    # Max flow rate
+    flow_rate = xp.minimum(flow_rate, 2.0)
+
+    # TODO: verify flow
+    waterToFlowPower = (
+        flow_rate * (m.waterTemp - p.RESERVOIR_TEMPERATURE) * p.SPEC_HEAT_WATER_100
+    )
+
+    # How much power is lost to the atmosphere from the brew head?
+    brewHeadToAmbientPower = (
+        m.brewHeadTemp - m.ambientTemp
+    ) * p.BREWHEAD_AMBIENT_XFER_COEFF
+
+    # How much power is transferred from the boiler to the water?
+    shellToWaterPower = (
+        (m.shellTemp - m.waterTemp) * p.BOILER_WATER_XFER_COEFF_NOFLOW / 2.0
+    )
+    elementToWaterPower = (
+        (m.elementTemp - m.waterTemp) * p.BOILER_WATER_XFER_COEFF_NOFLOW / 2.0
+    )
+
+    # How much power is transferred from the boiler to the brew head?
+    shellToBrewHeadPower = (
+        (m.shellTemp - m.brewHeadTemp) * p.BOILER_BREWHEAD_XFER_COEFF / 2.0
+    )
+    elementToBrewHeadPower = (
+        (m.elementTemp - m.brewHeadTemp) * p.BOILER_BREWHEAD_XFER_COEFF / 2.0
+    )
+    # TODO: FLOW POWER?
+    waterFlowToBrewHeadPower = (
+        (m.waterTemp - m.brewHeadTemp) * flow_rate * p.SPEC_HEAT_WATER_100
+    )
+    elementToShellPower = (m.elementTemp - m.shellTemp) * p.ELEMENT_SHELL_XFER_COEFF
+    shellToBodyPower = (m.shellTemp - m.bodyTemp) * p.BOILER_BODY_XFER_COEFF / 2.0
+    elementToBodyPower = (m.elementTemp - m.bodyTemp) * p.BOILER_BODY_XFER_COEFF / 2.0
+
+    # Now work out the temperature, which comes from power that didn't go into heat loss or heating the incoming water.
+    m.brewHeadTemp += (
+        deltaTime
+        * (
+            shellToBrewHeadPower
+            + elementToBrewHeadPower
+            + waterFlowToBrewHeadPower
+            - brewHeadToAmbientPower
         )
-        logger.debug("waterFlowToBrewHeadPower: %s", waterFlowToBrewHeadPower)
-        elementToShellPower = (
-            self.elementTemp - self.shellTemp
-        ) * config.ELEMENT_SHELL_XFER_COEFF
-        logger.debug("elementToShellPower: %s", elementToShellPower)
-        shellToBodyPower = (
-            (self.shellTemp - self.bodyTemp) * config.BOILER_BODY_XFER_COEFF / 2.0
+        / (p.SPEC_HEAT_BRASS * (p.MASS_BREW_HEAD + p.MASS_PORTAFILTER))
+    )
+    m.waterTemp += (
+        deltaTime
+        * (shellToWaterPower + elementToWaterPower - waterToFlowPower)
+        / (p.SPEC_HEAT_WATER_100 * p.BOILER_VOLUME)
+    )
+    m.shellTemp += (
+        deltaTime
+        * (
+            elementToShellPower
+            - shellToBrewHeadPower
+            - shellToWaterPower
+            - shellToBodyPower
         )
-        logger.debug("shellToBodyPower: %s", shellToBodyPower)
-        elementToBodyPower = (
-            (self.elementTemp - self.bodyTemp) * config.BOILER_BODY_XFER_COEFF / 2.0
+        / (p.SPEC_HEAT_ALUMINIUM * p.MASS_BOILER_SHELL / 2.0)
+    )
+    elementTempDelta = (
+        deltaTime
+        * (
+            m.heaterPower
+            - elementToShellPower
+            - elementToBrewHeadPower
+            - elementToWaterPower
+            - elementToBodyPower
         )
-        logger.debug("elementToBodyPower: %s", elementToBodyPower)
-
-        # Now work out the temperature, which comes from power that didn't go into heat loss or heating the incoming water.
-        logger.debug("\nTEMP:")
-        self.brewHeadTemp += (
-            deltaTime
-            * (
-                shellToBrewHeadPower
-                + elementToBrewHeadPower
-                + waterFlowToBrewHeadPower
-                - brewHeadToAmbientPower
+        / (p.SPEC_HEAT_ALUMINIUM * p.MASS_BOILER_SHELL / 2.0)
+    )
+    m.elementTemp += elementTempDelta
+    m.bodyTemp += (
+        deltaTime * (shellToBodyPower + elementToBodyPower) / p.HEAT_CAPACITY_BODY
+    )
+
+    m.modeledSensorTemp += (
+        deltaTime
+        * ((m.elementTemp - m.modeledSensorTemp) * p.SENSOR_XFER_COEFF)
+        / p.SENSOR_HEAT_CAPACITY
+    )
+
+    # Any delta between modeledSensorTemp and temperature is either model error diverging slowly or (fast) noise.
+    # Slowly correct towards this temperature and noise will average out.
+    delta_to_apply = (temperature - m.modeledSensorTemp) * (deltaTime * p.MPC_SMOOTHING)
+
+    # Add delta to all thermal masses
+    m.modeledSensorTemp += delta_to_apply
+    m.elementTemp += delta_to_apply
+
+    # only correct other masses when close to steady state otherwise it can diverge
+    # wildly due to modelling errors
+    steadystate = (
+        (m.waterTemp > 94)
+        & (m.waterTemp < 96)
+        & (abs(elementTempDelta + delta_to_apply) < deltaTime * p.MPC_STEADY_STATE)
+    )
+    steady_delta = xp.where(steadystate, delta_to_apply, 0.0)
+    m.shellTemp += steady_delta
+    m.waterTemp += steady_delta
+    m.bodyTemp += steady_delta
+    m.brewHeadTemp += steady_delta
+
+    d.deltaTime = deltaTime
+    d.flow_rate = flow_rate
+    d.waterToFlowPower = waterToFlowPower
+    d.brewHeadToAmbientPower = brewHeadToAmbientPower
+    d.shellToWaterPower = shellToWaterPower
+    d.elementToWaterPower = elementToWaterPower
+    d.shellToBrewHeadPower = shellToBrewHeadPower
+    d.elementToBrewHeadPower = elementToBrewHeadPower
+    d.waterFlowToBrewHeadPower = waterFlowToBrewHeadPower
+    d.elementToShellPower = elementToShellPower
+    d.shellToBodyPower = shellToBodyPower
+    d.elementToBodyPower = elementToBodyPower
+    d.elementTempDelta = elementTempDelta
+    d.delta_to_apply = delta_to_apply
+    d.steadystate = steadystate
+
+
+def heater_step(
+    m: Any,
+    d: Any,
+    out: Any,
+    p: Any = config,
+    xp: Any = SCALAR_OPS,
+    feed_forward: Any = 0.0,
+) -> Any:
+    """Compute the heater power for the state ``model_step`` left on ``m``.
+
+    ``d`` holds the power terms written by ``model_step``; the heater terms
+    (``HEATER_DIAGNOSTICS``, including ``heaterPower_W``) are written onto
+    ``out``. ``feed_forward`` is the flow power (W) expected shortly (see
+    ``FeedForward``). Returns the normalized heater power. The caller
+    decides whether to commit ``out.heaterPower_W`` to ``m.heaterPower``."""
+    # arrange heater power so that the average boiler energy will be correct in 2 seconds (if possible)
+    # the error term handles boiler shell and water - other known power sinks are added explicitly
+
+    # we want the water to reach target temperature in the next 15s so calculate the necessary average temperature of the shell
+    desiredWaterInputPower = (
+        (m.setpoint - m.waterTemp) * p.SPEC_HEAT_WATER_100 * p.BOILER_VOLUME / 15.0
+    )
+    desiredWaterInputPower += xp.maximum(d.waterToFlowPower, feed_forward)
+
+    desiredAverageShellTemp = (
+        m.waterTemp + desiredWaterInputPower / p.BOILER_WATER_XFER_COEFF_NOFLOW
+    )
+
+    # TODO: Flow 0
+    desiredAverageShellTemp = xp.where(
+        d.flow_rate > 1.0,
+        m.waterTemp + desiredWaterInputPower / 25.0,
+        desiredAverageShellTemp,
+    )
+
+    # now clip the temperature so that it won't take more than 20s to lose excess heat to ambient
+    # (or to water that is about to flow through)
+    maxStableAverageShellTemp = (
+        (d.brewHeadToAmbientPower + feed_forward) * 20.0
+        - (m.waterTemp - m.setpoint) * p.SPEC_HEAT_WATER_100 * p.BOILER_VOLUME
+    ) / p.SPEC_HEAT_ALUMINIUM / p.MASS_BOILER_SHELL + m.setpoint
+    desiredAverageShellTemp = xp.minimum(
+        desiredAverageShellTemp, maxStableAverageShellTemp
+    )
+
+    error = (
+        (m.shellTemp - desiredAverageShellTemp)
+        * p.SPEC_HEAT_ALUMINIUM
+        * p.MASS_BOILER_SHELL
+        / 2.0
+    )
+    error += (
+        (m.elementTemp - desiredAverageShellTemp)
+        * p.SPEC_HEAT_ALUMINIUM
+        * p.MASS_BOILER_SHELL
+        / 2.0
+    )
+
+    heaterPower = (
+        d.shellToBrewHeadPower
+        + d.elementToBrewHeadPower
+        + d.shellToBodyPower
+        + d.elementToBodyPower
+        + d.shellToWaterPower
+        + d.elementToWaterPower
+        - (error / 2.0)
+    )
+    # keep power level safe and sane (where it would take two seconds to get triac or elements over max temp and five seconds to get shell over max temp)
+    maxAllowableElementToShellPower = (
+        (p.SHELL_MAX_TEMPERATURE - m.shellTemp)
+        * p.SPEC_HEAT_ALUMINIUM
+        * p.MASS_BOILER_SHELL
+        / 5.0
+        + d.shellToWaterPower
+        + d.shellToBrewHeadPower
+        + d.shellToBodyPower
+    )
+    maxAllowableElementTemp = (
+        maxAllowableElementToShellPower / p.ELEMENT_SHELL_XFER_COEFF + m.shellTemp
+    )
+    maxAllowableElementTemp = xp.minimum(
+        maxAllowableElementTemp, p.ELEMENT_MAX_TEMPERATURE
+    )
+    maxAllowablePowerForElement = (
+        (maxAllowableElementTemp - m.elementTemp)
+        * p.SPEC_HEAT_ALUMINIUM
+        * p.MASS_BOILER_SHELL
+        / 2.0
+        + d.elementToShellPower
+        + d.elementToWaterPower
+        + d.elementToBrewHeadPower
+        + d.elementToBodyPower
+    )
+
+    heaterPower = xp.minimum(p.MAX_BOILER_POWER, heaterPower)
+    heaterPower = xp.minimum(maxAllowablePowerForElement, heaterPower)
+    heaterPower = xp.maximum(0.0, heaterPower)
+    normalizedHeaterPower = heaterPower / p.MAX_BOILER_POWER
+    normalizedHeaterPower = xp.maximum(normalizedHeaterPower, 0.0)
+    normalizedHeaterPower = xp.minimum(normalizedHeaterPower, 1.0)
+
+    out.desiredWaterInputPower = desiredWaterInputPower
+    out.desiredAverageShellTemp = desiredAverageShellTemp
+    out.maxStableAverageShellTemp = maxStableAverageShellTemp
+    out.error = error
+    out.heaterPower_W = heaterPower
+    out.maxAllowableElementToShellPower = maxAllowableElementToShellPower
+    out.maxAllowableElementTemp = maxAllowableElementTemp
+    out.maxAllowablePowerForElement = maxAllowablePowerForElement
+    return normalizedHeaterPower
+
+
+# Masses the horizon planner predicts, in the order of its state vector.
+# The modelled sensor lags the element and never feeds back, so it is left
+# out.
+PLAN_FIELDS = ("shellTemp", "elementTemp", "waterTemp", "bodyTemp", "brewHeadTemp")
+_SHELL, _ELEMENT, _WATER = 0, 1, 2
+
+Vector = List[float]
+Matrix = List[List[float]]
+
+
+def _matvec(a: Matrix, x: Sequence[float]) -> Vector:
+    return [sum(map(mul, row, x)) for row in a]
+
+
+def _matmul(a: Matrix, b: Matrix) -> Matrix:
+    columns = list(zip(*b))
+    return [[sum(map(mul, row, col)) for col in columns] for row in a]
+
+
+def _affine_step(
+    p: Any, deltaTime: float, flow_rate: float, ambient_temp: float
+) -> Tuple[Matrix, Vector, Vector]:
+    """``model_step`` as ``x' = A x + B heaterPower + c`` over ``PLAN_FIELDS``.
+
+    The model is affine in the masses for a fixed flow rate, so evaluating
+    it on the zero state and on unit vectors gives the exact matrices. The
+    sensor correction is switched off (MPC_SMOOTHING = 0): there is no
+    reading to correct towards in the future."""
+    q = SimpleNamespace(**{name: getattr(p, name) for name in MODEL_PARAMS})
+    q.MPC_SMOOTHING = 0.0
+
+    def step(x: Sequence[float], heater: float) -> Vector:
+        m = SimpleNamespace(**dict(zip(PLAN_FIELDS, x)))
+        m.modeledSensorTemp = 0.0
+        m.ambientTemp = ambient_temp
+        m.heaterPower = heater
+        model_step(m, m, temperature=0.0, deltaTime=deltaTime, flow_rate=flow_rate, p=q)
+        return [getattr(m, name) for name in PLAN_FIELDS]
+
+    n = len(PLAN_FIELDS)
+    c = step([0.0] * n, 0.0)
+    columns = [
+        [v - c0 for v, c0 in zip(step([float(i == j) for i in range(n)], 0.0), c)]
+        for j in range(n)
+    ]
+    a = [list(row) for row in zip(*columns)]
+    b = [v - c0 for v, c0 in zip(step([0.0] * n, 1.0), c)]
+    return a, b, c
+
+
+class _FlowBin:
+    """Prediction tables for one flow rate; everything that doesn't depend
+    on the current state is computed here, once."""
+
+    def __init__(
+        self,
+        a: Matrix,
+        b: Vector,
+        c: Vector,
+        *,
+        steps: int,
+        block_bounds: Sequence[Tuple[int, int]],
+        candidates: Sequence[Tuple[float, ...]],
+        max_power: float,
+        limits: Tuple[float, float],
+    ) -> None:
+        n = len(a)
+        identity = [[float(i == j) for j in range(n)] for i in range(n)]
+        # free response x_k = F_k x_0 + C_k for k = 1..steps
+        free: List[Matrix] = []
+        offset: List[Vector] = []
+        f, x = identity, [0.0] * n
+        for _ in range(steps):
+            f = _matmul(a, f)
+            x = [v + c_i for v, c_i in zip(_matvec(a, x), c)]
+            free.append(f)
+            offset.append(x)
+        # gains[i][k]: state at step k + 1 per unit (normalized) heater
+        # level held over block i
+        gains: List[List[Vector]] = []
+        for start, stop in block_bounds:
+            x, column = [0.0] * n, []
+            for k in range(steps):
+                x = _matvec(a, x)
+                if start <= k < stop:
+                    x = [v + b_i * max_power for v, b_i in zip(x, b)]
+                column.append(x)
+            gains.append(column)
+
+        # Water cost sum_k (w_k - setpoint)^2 with w_k = Fw_k x + Cw_k +
+        # sum_i Gw_ik u_i is quadratic in u: u'Hu + 2 h'u + const, where
+        # h_i = m_i . x + s_i - setpoint * g_i. Everything but x and the
+        # setpoint is fixed, so candidates are scored with a few products.
+        water = [[g[_WATER] for g in column] for column in gains]
+        self.water_state = [
+            [
+                sum(w_k * free[k][_WATER][j] for k, w_k in enumerate(w_i))
+                for j in range(n)
+            ]
+            for w_i in water
+        ]
+        self.water_offset = [
+            sum(w_k * offset[k][_WATER] for k, w_k in enumerate(w_i)) for w_i in water
+        ]
+        self.water_gain = [sum(w_i) for w_i in water]
+        h = [[sum(map(mul, w_i, w_j)) for w_j in water] for w_i in water]
+        self.quadratic = [sum(map(mul, u, _matvec(h, u))) for u in candidates]
+
+        # Limits: element and shell rows of the free response, and each
+        # candidate's forced response, stacked as [element..., shell...].
+        self.limit_rows = [free[k][_ELEMENT] for k in range(steps)] + [
+            free[k][_SHELL] for k in range(steps)
+        ]
+        self.limit_offsets = [limits[0] - offset[k][_ELEMENT] for k in range(steps)] + [
+            limits[1] - offset[k][_SHELL] for k in range(steps)
+        ]
+        self.forced = [
+            array(
+                "d",
+                [
+                    sum(u_i * gains[i][k][_ELEMENT] for i, u_i in enumerate(u))
+                    for k in range(steps)
+                ]
+                + [
+                    sum(u_i * gains[i][k][_SHELL] for i, u_i in enumerate(u))
+                    for k in range(steps)
+                ],
             )
-            / (
-                config.SPEC_HEAT_BRASS
-                * (config.MASS_BREW_HEAD + config.MASS_PORTAFILTER)
+            for u in candidates
+        ]
+
+
+class HorizonPlanner:
+    """Receding-horizon heater planner on a linearized thermal model.
+
+    Candidate heater trajectories are move-blocked: every combination of
+    ``levels`` held over ``blocks`` steps (the last block runs to the end
+    of the horizon). Each tick the candidates are ranked by predicted
+    squared water-temperature error over the horizon and the first one
+    whose element and shell predictions stay under their limits wins; its
+    first level is the heater power for this tick and the whole trajectory
+    is kept on ``trajectory``."""
+
+    def __init__(
+        self,
+        ambient_temp: float,
+        *,
+        steps: int,
+        step_seconds: float,
+        substeps: int,
+        blocks: Sequence[int],
+        levels: Sequence[float],
+        flow_bins: Sequence[float],
+        p: Any = config,
+    ) -> None:
+        if sum(blocks) >= steps:
+            raise ValueError(
+                f"horizon blocks {tuple(blocks)} must be shorter than {steps} steps"
             )
-        )
-        logger.debug("brewHeadTemp: %s", self.brewHeadTemp)
-        self.waterTemp += (
-            deltaTime
-            * (shellToWaterPower + elementToWaterPower - waterToFlowPower)
-            / (config.SPEC_HEAT_WATER_100 * config.BOILER_VOLUME)
-        )
-        logger.debug("waterTemp: %s", self.waterTemp)
-        self.shellTemp += (
-            deltaTime
-            * (
-                elementToShellPower
-                - shellToBrewHeadPower
-                - shellToWaterPower
-                - shellToBodyPower
+        bounds, start = [], 0
+        for length in list(blocks) + [steps - sum(blocks)]:
+            bounds.append((start, start + length))
+            start += length
+        self.candidates = list(product(levels, repeat=len(bounds)))
+        self.trajectory: Tuple[float, ...] = (0.0,) * len(bounds)
+        self.flow_bins = tuple(flow_bins)
+        self.bins = []
+        for flow_rate in self.flow_bins:
+            a, b, c = _affine_step(p, step_seconds / substeps, flow_rate, ambient_temp)
+            a_n, b_n, c_n = a, b, c
+            for _ in range(substeps - 1):
+                a_n = _matmul(a, a_n)
+                b_n = [v + b_i for v, b_i in zip(_matvec(a, b_n), b)]
+                c_n = [v + c_i for v, c_i in zip(_matvec(a, c_n), c)]
+            self.bins.append(
+                _FlowBin(
+                    a_n,
+                    b_n,
+                    c_n,
+                    steps=steps,
+                    block_bounds=bounds,
+                    candidates=self.candidates,
+                    max_power=p.MAX_BOILER_POWER,
+                    limits=(p.ELEMENT_MAX_TEMPERATURE, p.SHELL_MAX_TEMPERATURE),
+                )
             )
-            / (config.SPEC_HEAT_ALUMINIUM * config.MASS_BOILER_SHELL / 2.0)
+
+    @classmethod
+    def from_config(cls, ambient_temp: float) -> "HorizonPlanner":
+        return cls(
+            ambient_temp,
+            steps=config.MPC_HORIZON_STEPS,
+            step_seconds=config.MPC_HORIZON_STEP_SECONDS,
+            substeps=config.MPC_HORIZON_SUBSTEPS,
+            blocks=config.MPC_HORIZON_BLOCKS,
+            levels=config.MPC_HORIZON_LEVELS,
+            flow_bins=config.MPC_HORIZON_FLOW_BINS,
         )
-        logger.debug("shellTemp: %s", self.shellTemp)
-        elementTempDelta = (
-            deltaTime
-            * (
-                self.heaterPower
-                - elementToShellPower
-                - elementToBrewHeadPower
-                - elementToWaterPower
-                - elementToBodyPower
-            )
-            / (config.SPEC_HEAT_ALUMINIUM * config.MASS_BOILER_SHELL / 2.0)
+
+    def plan(self, m: Any, flow_rate: float) -> float:
+        """Normalized heater level for the state on ``m`` (0 if every
+        candidate would break a limit)."""
+        i = min(
+            range(len(self.flow_bins)), key=lambda j: abs(self.flow_bins[j] - flow_rate)
         )
-        self.elementTemp += elementTempDelta
-        logger.debug("elementTemp: %s", self.elementTemp)
-        self.bodyTemp += (
-            deltaTime
-            * (shellToBodyPower + elementToBodyPower)
-            / config.HEAT_CAPACITY_BODY
+        fb = self.bins[i]
+        x = [getattr(m, name) for name in PLAN_FIELDS]
+        h = [
+            2.0 * (sum(map(mul, m_i, x)) + s_i - m.setpoint * g_i)
+            for m_i, s_i, g_i in zip(fb.water_state, fb.water_offset, fb.water_gain)
+        ]
+        costs = [q + sum(map(mul, h, u)) for q, u in zip(fb.quadratic, self.candidates)]
+        headroom = [
+            limit - sum(map(mul, row, x))
+            for row, limit in zip(fb.limit_rows, fb.limit_offsets)
+        ]
+        for c in sorted(range(len(costs)), key=costs.__getitem__):
+            if all(map(le, fb.forced[c], headroom)):
+                self.trajectory = self.candidates[c]
+                return self.trajectory[0]
+        self.trajectory = (0.0,) * len(self.trajectory)
+        return 0.0
+
+
+class FeedForward:
+    """Expected flow power for the first seconds of a shot.
+
+    ``profile[i]`` is the waterToFlowPower (W) seen in second ``i`` after
+    brew start, averaged over previous shots. While the window is open,
+    ``power`` returns the value ``lead`` seconds ahead, which heater_step
+    treats as flow that is already running: the heater starts on the
+    brew button rather than on the cooled water a few seconds later, and
+    the shell may run hotter because the flow will carry that heat off."""
+
+    def __init__(
+        self,
+        profile: Sequence[float],
+        *,
+        gain: float,
+        lead: int,
+        learning_rate: float,
+        path: Optional[str] = None,
+    ) -> None:
+        self.profile = list(profile)
+        self.gain = gain
+        self.lead = lead
+        self.learning_rate = learning_rate
+        self.path = path
+        self.started: Optional[float] = None
+        self.learning = False
+        self._sums = [0.0] * len(self.profile)
+        self._counts = [0] * len(self.profile)
+
+    @classmethod
+    def from_config(cls) -> "FeedForward":
+        profile = [0.0] * config.FEED_FORWARD_SECONDS
+        path = config.FEED_FORWARD_PROFILE_FILE
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            profile[: len(saved)] = saved[: len(profile)]
+        return cls(
+            profile,
+            gain=config.FEED_FORWARD_GAIN,
+            lead=config.FEED_FORWARD_LEAD,
+            learning_rate=config.FEED_FORWARD_LEARNING_RATE,
+            path=path,
         )
-        logger.debug("bodyTemp: %s", self.bodyTemp)
 
-        self.modeledSensorTemp += (
-            deltaTime
-            * ((self.elementTemp - self.modeledSensorTemp) * config.SENSOR_XFER_COEFF)
-            / config.SENSOR_HEAT_CAPACITY
+    @property
+    def active(self) -> bool:
+        return self.started is not None
+
+    def start(self, now: float, learn: bool) -> None:
+        for i in range(len(self.profile)):
+            self._sums[i] = 0.0
+            self._counts[i] = 0
+        self.learning = learn
+        self.started = now
+
+    def power(self, now: float, measured: float) -> float:
+        """Expected flow power for this tick; ``measured`` is the model's
+        current waterToFlowPower, recorded for learning."""
+        started = self.started
+        if started is None:
+            return 0.0
+        i = int(now - started)
+        if i >= len(self.profile):
+            if not self.learning:
+                self.started = None
+            return 0.0
+        if self.learning:
+            self._sums[i] += measured
+            self._counts[i] += 1
+        expected = self.profile[min(i + self.lead, len(self.profile) - 1)]
+        return float(self.gain * expected)
+
+    def stop(self) -> None:
+        """Close the window. A learning window that saw every second of
+        the profile is blended into it and saved."""
+        complete = self.learning and self.started is not None and all(self._counts)
+        self.started = None
+        if not complete:
+            return
+        self.profile = [
+            p + self.learning_rate * (total / n - p)
+            for p, total, n in zip(self.profile, self._sums, self._counts)
+        ]
+        logger.info("feed-forward profile updated: %s", self.profile)
+        if self.path:
+            with open(self.path, "w") as f:
+                json.dump(self.profile, f)
+
+
+class ControllerState:
+    """Everything one controller tick produces, updated in place.
+
+    ``PController`` owns a single instance and the step functions write
+    straight into its slots, so a tick allocates no dict or tuple. The
+    shot logger and display read the fields directly; ``FIELDS`` is the
+    tick-log column order."""
+
+    FIELDS = (
+        ("raw_temp", "heater", "boiling", "pwm_override", "setpoint")
+        + MASS_FIELDS
+        + MODEL_DIAGNOSTICS
+        + ("ambientTemp",)
+        + tuple(name for name, _ in HEATER_DIAGNOSTICS)
+        + ("plannedHeater", "feedForward_W")
+    )
+
+    __slots__ = FIELDS + ("heaterPower",)
+
+    raw_temp: float
+    heater: float
+    boiling: bool
+    pwm_override: Optional[float]
+    setpoint: float
+    shellTemp: float
+    elementTemp: float
+    waterTemp: float
+    bodyTemp: float
+    brewHeadTemp: float
+    modeledSensorTemp: float
+    deltaTime: float
+    flow_rate: float
+    waterToFlowPower: float
+    brewHeadToAmbientPower: float
+    shellToWaterPower: float
+    elementToWaterPower: float
+    shellToBrewHeadPower: float
+    elementToBrewHeadPower: float
+    waterFlowToBrewHeadPower: float
+    elementToShellPower: float
+    shellToBodyPower: float
+    elementToBodyPower: float
+    elementTempDelta: float
+    delta_to_apply: float
+    steadystate: bool
+    ambientTemp: float
+    desiredWaterInputPower: float
+    desiredAverageShellTemp: float
+    maxStableAverageShellTemp: float
+    error: float
+    heaterPower_W: float
+    maxAllowableElementToShellPower: float
+    maxAllowableElementTemp: float
+    maxAllowablePowerForElement: float
+    # first move of the HorizonPlanner's trajectory, before the safety clamp
+    plannedHeater: float
+    # FeedForward.power() for this tick, as passed to heater_step
+    feedForward_W: float
+    # Heater power the next model step assumes; unlike heaterPower_W it
+    # keeps its last value while the boiler is off.
+    heaterPower: float
+
+    def __init__(self) -> None:
+        for name in self.__slots__:
+            setattr(self, name, math.nan)
+        self.heater = 0.0
+        self.heaterPower = 0.0
+        self.boiling = False
+        self.pwm_override = None
+        self.steadystate = False
+
+    def masses(self) -> Tuple[float, ...]:
+        """Thermal masses plus the raw reading, in display/legend order."""
+        return (
+            self.shellTemp,
+            self.elementTemp,
+            self.waterTemp,
+            self.bodyTemp,
+            self.brewHeadTemp,
+            self.modeledSensorTemp,
+            self.raw_temp,
         )
 
-        logger.debug("modeledSensorTemp: %s,%s", self.modeledSensorTemp, temperature)
+    def set_idle_heater(self) -> None:
+        for name, idle in HEATER_DIAGNOSTICS:
+            setattr(self, name, idle)
+        self.plannedHeater = math.nan
+        self.feedForward_W = math.nan
+        self.heater = 0.0
 
-        # Any delta between modeledSensorTemp and temperature is either model error diverging slowly or (fast) noise.
-        # Slowly correct towards this temperature and noise will average out.
-        delta_to_apply = (temperature - self.modeledSensorTemp) * (
-            deltaTime * config.MPC_SMOOTHING
-        )
-        logger.debug("diff: %s", temperature - self.modeledSensorTemp)
-        logger.debug("diffelement: %s", self.elementTemp - self.modeledSensorTemp)
-
-        # Add delta to all thermal masses
-        self.modeledSensorTemp += delta_to_apply
-        self.elementTemp += delta_to_apply
-
-        # only correct other masses when close to steady state otherwise it can diverge
-        # wildly due to modelling errors
-        steadystate = (
-            94 < self.waterTemp < 96
-            and abs(elementTempDelta + delta_to_apply)
-            < deltaTime * config.MPC_STEADY_STATE
-        )
-        logger.debug("steadystate %s", steadystate)
-        if steadystate:
-            self.shellTemp += delta_to_apply
-            self.waterTemp += delta_to_apply
-            self.bodyTemp += delta_to_apply
-            self.brewHeadTemp += delta_to_apply
-
-        # self.shellTemp = temperature
-
-        self.diagnostics = {
-            "deltaTime": deltaTime,
-            "flow_rate": flow_rate,
-            "waterToFlowPower": waterToFlowPower,
-            "brewHeadToAmbientPower": brewHeadToAmbientPower,
-            "shellToWaterPower": shellToWaterPower,
-            "elementToWaterPower": elementToWaterPower,
-            "shellToBrewHeadPower": shellToBrewHeadPower,
-            "elementToBrewHeadPower": elementToBrewHeadPower,
-            "waterFlowToBrewHeadPower": waterFlowToBrewHeadPower,
-            "elementToShellPower": elementToShellPower,
-            "shellToBodyPower": shellToBodyPower,
-            "elementToBodyPower": elementToBodyPower,
-            "elementTempDelta": elementTempDelta,
-            "delta_to_apply": delta_to_apply,
-            "steadystate": steadystate,
-            "ambientTemp": self.ambientTemp,
-            "desiredWaterInputPower": math.nan,
-            "desiredAverageShellTemp": math.nan,
-            "maxStableAverageShellTemp": math.nan,
-            "error": math.nan,
-            "heaterPower_W": 0.0,
-            "maxAllowableElementToShellPower": math.nan,
-            "maxAllowableElementTemp": math.nan,
-            "maxAllowablePowerForElement": math.nan,
-        }
-
-        if not boiling:
-            return 0, (
-                self.shellTemp,
-                self.elementTemp,
-                self.waterTemp,
-                self.bodyTemp,
-                self.brewHeadTemp,
-                self.modeledSensorTemp,
-                temperature,
-            )
+    def __repr__(self) -> str:
+        return " ".join(f"{name}={getattr(self, name)}" for name in self.FIELDS)
 
-        # arrange heater power so that the average boiler energy will be correct in 2 seconds (if possible)
-        # the error term handles boiler shell and water - other known power sinks are added explicitly
 
-        # we want the water to reach target temperature in the next 15s so calculate the necessary average temperature of the shell
-        desiredWaterInputPower = (
-            (self.temp_setpoint - self.waterTemp)
-            * config.SPEC_HEAT_WATER_100
-            * config.BOILER_VOLUME
-            / 15.0
+class PController:
+    def __init__(
+        self, initial_temperature: float, flow: "Flow", clock: Clock = SYSTEM_CLOCK
+    ) -> None:
+        self.clock = clock
+        self.state = ControllerState()
+        self.state.setpoint = config.TARGET_TEMP
+
+        init_model(self.state, initial_temperature)
+        self.planner = (
+            HorizonPlanner.from_config(self.state.ambientTemp)
+            if config.MPC_HORIZON_STEPS > 0
+            else None
         )
-        desiredWaterInputPower += waterToFlowPower
-        logger.debug("desiredWaterInputPower: %s", desiredWaterInputPower)
+        self.feed_forward = FeedForward.from_config()
+        # (event, time) from the flow thread, applied by update
+        self._flow_events: Deque[Tuple[str, float]] = deque()
 
-        desiredAverageShellTemp = (
-            self.waterTemp
-            + desiredWaterInputPower / config.BOILER_WATER_XFER_COEFF_NOFLOW
-        )
-        logger.debug("desiredAverageShellTemp: %s", desiredAverageShellTemp)
-
-        # TODO: Flow 0
-        if flow_rate > 1.0:
-            desiredAverageShellTemp = self.waterTemp + desiredWaterInputPower / 25.0
-
-        # now clip the temperature so that it won't take more than 20s to lose excess heat to ambient
-        maxStableAverageShellTemp = (
-            (
-                brewHeadToAmbientPower * 20.0
-                - (self.waterTemp - self.temp_setpoint)
-                * config.SPEC_HEAT_WATER_100
-                * config.BOILER_VOLUME
-            )
-            / config.SPEC_HEAT_ALUMINIUM
-            / config.MASS_BOILER_SHELL
-            + self.temp_setpoint
-        )
-        logger.debug("maxStableAverageShellTemp: %s", maxStableAverageShellTemp)
-        desiredAverageShellTemp = min(
-            desiredAverageShellTemp, maxStableAverageShellTemp
-        )
-        logger.debug("desiredAverageShellTemp: %s", desiredAverageShellTemp)
+        self.pumpPowerRate = 0.0
+        self.lastBoilerPidTime: float = self.clock.now()
+        self.flow = flow
 
-        error = (
-            (self.shellTemp - desiredAverageShellTemp)
-            * config.SPEC_HEAT_ALUMINIUM
-            * config.MASS_BOILER_SHELL
-            / 2.0
-        )
-        logger.debug("error shellTemp: %s", error)
-        error += (
-            (self.elementTemp - desiredAverageShellTemp)
-            * config.SPEC_HEAT_ALUMINIUM
-            * config.MASS_BOILER_SHELL
-            / 2.0
-        )
-        logger.debug("error total (shellTemp + elementTemp): %s", error)
+    @property
+    def temp_setpoint(self) -> float:
+        return float(self.state.setpoint)
 
-        self.heaterPower = (
-            shellToBrewHeadPower
-            + elementToBrewHeadPower
-            + shellToBodyPower
-            + elementToBodyPower
-            + shellToWaterPower
-            + elementToWaterPower
-            - (error / 2.0)
-        )
-        logger.debug("ISH LOST %s W", (self.heaterPower + (error * 2.0)))
-        # keep power level safe and sane (where it would take two seconds to get triac or elements over max temp and five seconds to get shell over max temp)
-        maxAllowableElementToShellPower = (
-            (config.SHELL_MAX_TEMPERATURE - self.shellTemp)
-            * config.SPEC_HEAT_ALUMINIUM
-            * config.MASS_BOILER_SHELL
-            / 5.0
-            + shellToWaterPower
-            + shellToBrewHeadPower
-            + shellToBodyPower
-        )
-        logger.debug("maxAllowableElementToShellPower %s", maxAllowableElementToShellPower)
-        maxAllowableElementTemp = (
-            maxAllowableElementToShellPower / config.ELEMENT_SHELL_XFER_COEFF
-            + self.shellTemp
-        )
-        logger.debug("maxAllowableElementTemp %s", maxAllowableElementTemp)
-        maxAllowableElementTemp = min(
-            maxAllowableElementTemp, config.ELEMENT_MAX_TEMPERATURE
-        )
-        logger.debug("maxAllowableElementTemp %s", maxAllowableElementTemp)
-        maxAllowablePowerForElement = (
-            (maxAllowableElementTemp - self.elementTemp)
-            * config.SPEC_HEAT_ALUMINIUM
-            * config.MASS_BOILER_SHELL
-            / 2.0
-            + elementToShellPower
-            + elementToWaterPower
-            + elementToBrewHeadPower
-            + elementToBodyPower
-        )
-        logger.debug("maxAllowablePowerForElement %s", maxAllowablePowerForElement)
-
-        logger.debug("heaterPower0 %s", self.heaterPower)
-        self.heaterPower = min(config.MAX_BOILER_POWER, self.heaterPower)
-        logger.debug("heaterPower1 %s", self.heaterPower)
-        self.heaterPower = min(maxAllowablePowerForElement, self.heaterPower)
-        logger.debug("heaterPower2 %s", self.heaterPower)
-        self.heaterPower = max(0.0, self.heaterPower)
-        logger.debug("heaterPower3 %s", self.heaterPower)
-        normalizedHeaterPower = self.heaterPower / config.MAX_BOILER_POWER
-        normalizedHeaterPower = max(normalizedHeaterPower, 0.0)
-        normalizedHeaterPower = min(normalizedHeaterPower, 1.0)
-        logger.debug("heaterPower normalized %s", normalizedHeaterPower)
-
-        self.diagnostics.update(
-            {
-                "desiredWaterInputPower": desiredWaterInputPower,
-                "desiredAverageShellTemp": desiredAverageShellTemp,
-                "maxStableAverageShellTemp": maxStableAverageShellTemp,
-                "error": error,
-                "heaterPower_W": self.heaterPower,
-                "maxAllowableElementToShellPower": maxAllowableElementToShellPower,
-                "maxAllowableElementTemp": maxAllowableElementTemp,
-                "maxAllowablePowerForElement": maxAllowablePowerForElement,
-            }
-        )
+    def set_target_temp(self, temperature: float) -> None:
+        self.state.setpoint = temperature
+
+    def on_flow_event(self, event: str) -> None:
+        """``Flow`` listener. Runs on the pump / flow-meter thread, so it
+        only queues the event; ``update`` opens or closes the feed-forward
+        window on the control thread from the next tick."""
+        self._flow_events.append((event, self.clock.now()))
+
+    def _apply_flow_events(self) -> None:
+        events = self._flow_events
+        while events:
+            event, t = events.popleft()
+            if event == "brew_start":
+                self.feed_forward.start(t, learn=True)
+            elif event == "flow_start" and not self.feed_forward.active:
+                # pump started some other way (pulse, steam): same cold
+                # inrush, but not a shot to learn from
+                self.feed_forward.start(t, learn=False)
+            elif event == "brew_end":
+                self.feed_forward.stop()
+
+    def update(self, *, temperature: float, boiling: bool) -> float:
+        """Run one control step and return the normalized heater power.
+
+        The thermal masses and diagnostics of this step are left on
+        ``self.state`` rather than returned."""
+        s = self.state
+        current_time = self.clock.now()
+        deltaTime = current_time - self.lastBoilerPidTime
+        self.lastBoilerPidTime = current_time
+        if self._flow_events:
+            self._apply_flow_events()
 
-        return min(normalizedHeaterPower, 1.0), (
-            self.shellTemp,
-            self.elementTemp,
-            self.waterTemp,
-            self.bodyTemp,
-            self.brewHeadTemp,
-            self.modeledSensorTemp,
-            temperature,
+        flow_rate = self.flow.get_flow_rate() or 0
+
+        s.raw_temp = temperature
+        s.boiling = boiling
+        model_step(
+            s, s, temperature=temperature, deltaTime=deltaTime, flow_rate=flow_rate
         )
+
+        if boiling:
+            s.feedForward_W = self.feed_forward.power(current_time, s.waterToFlowPower)
+            s.heater = heater_step(s, s, s, feed_forward=s.feedForward_W)
+            if self.planner is not None:
+                # The plan replaces heater_step's power law; its per-tick
+                # element limit still applies on top.
+                s.plannedHeater = self.planner.plan(s, s.flow_rate)
+                s.heaterPower_W = max(
+                    0.0,
+                    min(
+                        s.plannedHeater * config.MAX_BOILER_POWER,
+                        s.maxAllowablePowerForElement,
+                    ),
+                )
+                s.heater = s.heaterPower_W / config.MAX_BOILER_POWER
+            s.heaterPower = s.heaterPower_W
+        else:
+            s.set_idle_heater()
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("pcontroller %r", s)
+        return float(s.heater)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""Vectorized offline replay of the PController thermal model.
+
+``PController.update`` advances one machine by one sample. For tuning we
+want to push recorded logs (or thousands of synthetic traces) through the
+same equations without waiting for wall-clock time, so this module runs
+``model_step`` / ``heater_step`` from ``espyresso.pcontroller`` on numpy
+arrays: time is stepped in a Python loop, every trace advances together
+in one array operation per step.
+
+Inputs are ``(T, N)`` arrays (T samples, N traces) and outputs are
+``(T, N)`` arrays keyed like the tick-log columns, so
+``replay(...)["modeledSensorTemp"][:, 0]`` lines up with the
+``modeledSensorTemp`` column of the first trace's tick log.
+
+numpy is only needed here (offline); the controller itself stays
+pure-Python.
+"""
+import csv
+import math
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from espyresso import config, tick_log
+from espyresso.pcontroller import (
+    HEATER_DIAGNOSTICS,
+    MASS_FIELDS,
+    MODEL_DIAGNOSTICS,
+    heater_step,
+    init_model,
+    model_step,
+)
+
+STATE_COLUMNS = MASS_FIELDS
+
+# Columns replay() produces, besides the thermal masses.
+DIAGNOSTIC_COLUMNS = (
+    MODEL_DIAGNOSTICS + ("ambientTemp",) + tuple(name for name, _ in HEATER_DIAGNOSTICS)
+)
+
+# Columns replay() needs from a tick log.
+INPUT_COLUMNS = (
+    "t",
+    "raw_temp",
+    "deltaTime",
+    "flow_rate",
+    "boiling",
+    "setpoint",
+    "pwm_override",
+)
+SEED_COLUMNS = STATE_COLUMNS + ("ambientTemp", "heaterPower_W")
+
+
+class BatchPController:
+    """``PController`` state for N independent machines held in arrays.
+
+    Attribute names match ``PController`` so the shared step functions
+    can operate on either."""
+
+    setpoint: "np.ndarray[Any, Any]"
+    heaterPower: "np.ndarray[Any, Any]"
+    ambientTemp: "np.ndarray[Any, Any]"
+    shellTemp: "np.ndarray[Any, Any]"
+    elementTemp: "np.ndarray[Any, Any]"
+    waterTemp: "np.ndarray[Any, Any]"
+    bodyTemp: "np.ndarray[Any, Any]"
+    brewHeadTemp: "np.ndarray[Any, Any]"
+    modeledSensorTemp: "np.ndarray[Any, Any]"
+
+    def __init__(self, initial_temperature: Any, p: Any = config) -> None:
+        initial_temperature = np.array(initial_temperature, dtype=np.float64)
+        self.p = p
+        self.setpoint = np.full_like(initial_temperature, p.TARGET_TEMP)
+        init_model(self, initial_temperature, p=p, xp=np)
+        # init_model hands the same array to several masses and the step
+        # functions update them with in-place ``+=``; give each its own.
+        for name in STATE_COLUMNS:
+            setattr(self, name, np.array(getattr(self, name)))
+        self.heaterPower = np.zeros_like(initial_temperature)
+
+    @classmethod
+    def from_state(
+        cls, state: Dict[str, Any], heaterPower: Any = 0.0, p: Any = config
+    ) -> "BatchPController":
+        """Resume from logged thermal-mass values instead of a cold start."""
+        m = cls(state["shellTemp"], p=p)
+        for name in STATE_COLUMNS + ("ambientTemp",):
+            if name in state:
+                setattr(m, name, np.array(state[name], dtype=np.float64))
+        m.heaterPower = np.broadcast_to(
+            np.asarray(heaterPower, dtype=np.float64), m.shellTemp.shape
+        ).copy()
+        return m
+
+    def update(
+        self,
+        *,
+        temperature: Any,
+        deltaTime: Any,
+        flow_rate: Any,
+        boiling: Any,
+        setpoint: Any = None,
+        heaterPower: Any = None,
+    ) -> "np.ndarray[Any, Any]":
+        """One ``PController.update`` for every trace at once.
+
+        Returns the normalized heater power as an array of shape ``(N,)``;
+        the diagnostics are left on ``self`` like on ``ControllerState``.
+
+        ``heaterPower`` (W) is the power the element actually delivered
+        since the previous step. Without it the model assumes the power
+        ``heater_step`` asked for last time, which leaves out feed-forward,
+        the horizon planner and PWM overrides."""
+        if setpoint is not None:
+            self.setpoint = np.asarray(setpoint, dtype=np.float64)
+        if heaterPower is not None:
+            self.heaterPower = np.asarray(heaterPower, dtype=np.float64)
+        boiling = np.asarray(boiling, dtype=bool)
+
+        model_step(
+            self,
+            self,
+            temperature=temperature,
+            deltaTime=deltaTime,
+            flow_rate=np.nan_to_num(flow_rate),
+            p=self.p,
+            xp=np,
+        )
+        heater_d = SimpleNamespace()
+        normalized = heater_step(self, self, heater_d, p=self.p, xp=np)
+
+        # Not boiling: PController returns 0 and keeps its previous
+        # heaterPower for the next model step.
+        self.heaterPower = np.where(boiling, heater_d.heaterPower_W, self.heaterPower)
+        for name, idle in HEATER_DIAGNOSTICS:
+            setattr(self, name, np.where(boiling, getattr(heater_d, name), idle))
+        return np.where(boiling, normalized, 0.0)
+
+
+def replay(
+    temperature: "np.ndarray[Any, Any]",
+    deltaTime: "np.ndarray[Any, Any]",
+    flow_rate: "np.ndarray[Any, Any]",
+    boiling: "np.ndarray[Any, Any]",
+    setpoint: Optional["np.ndarray[Any, Any]"] = None,
+    *,
+    heater_power: Optional["np.ndarray[Any, Any]"] = None,
+    initial_state: Optional[Dict[str, Any]] = None,
+    initial_heater_power: Any = 0.0,
+    p: Any = config,
+) -> Dict[str, "np.ndarray[Any, Any]"]:
+    """Run the controller over ``(T, N)`` input arrays.
+
+    Without ``initial_state`` every trace cold-starts from its first
+    temperature, exactly like ``PController(initial_temperature=...)``.
+    ``heater_power`` (W) drives the model with the power each step
+    actually got instead of the controller's own output (see
+    ``BatchPController.update``). Returns ``heater``, the thermal masses
+    and every diagnostics column as ``(T, N)`` arrays."""
+    temperature = _as_2d(temperature)
+    deltaTime = _as_2d(deltaTime)
+    flow_rate = _as_2d(flow_rate)
+    boiling = _as_2d(boiling).astype(bool)
+    if setpoint is not None:
+        setpoint = _as_2d(setpoint)
+    if heater_power is not None:
+        heater_power = _as_2d(heater_power)
+
+    if initial_state is None:
+        m = BatchPController(temperature[0], p=p)
+    else:
+        m = BatchPController.from_state(
+            initial_state, heaterPower=initial_heater_power, p=p
+        )
+
+    columns = STATE_COLUMNS + DIAGNOSTIC_COLUMNS
+    out = {
+        name: np.empty(temperature.shape, dtype=np.float64)
+        for name in ("heater",) + columns
+    }
+    for i in range(temperature.shape[0]):
+        out["heater"][i] = m.update(
+            temperature=temperature[i],
+            deltaTime=deltaTime[i],
+            flow_rate=flow_rate[i],
+            boiling=boiling[i],
+            setpoint=None if setpoint is None else setpoint[i],
+            heaterPower=None if heater_power is None else heater_power[i],
+        )
+        for name in columns:
+            out[name][i] = getattr(m, name)
+    return out
+
+
+def _as_2d(a: Any) -> "np.ndarray[Any, Any]":
+    array: "np.ndarray[Any, Any]" = np.asarray(a, dtype=np.float64)
+    return array[:, np.newaxis] if array.ndim == 1 else array
+
+
+def load_tick_log(path: str) -> Dict[str, "np.ndarray[Any, Any]"]:
+    """Read a ``shot-*-tick.bin`` or ``shot-*-tick.csv`` into one float64
+    array per column.
+
+    Empty cells become NaN; non-numeric columns are dropped."""
+    if path.endswith(".bin"):
+        return {
+            name: np.array(values, dtype=np.float64)
+            for name, values in tick_log.read_ticks(path).items()
+        }
+    with open(path) as f:
+        reader = csv.reader(f)
+        header: List[str] = next(reader, [])
+        rows = [r for r in reader if len(r) == len(header)]
+    columns: Dict[str, "np.ndarray[Any, Any]"] = {}
+    for j, name in enumerate(header):
+        try:
+            columns[name] = np.array(
+                [float(r[j]) if r[j] != "" else math.nan for r in rows],
+                dtype=np.float64,
+            )
+        except ValueError:
+            continue
+    return columns
+
+
+def stack_traces(
+    traces: Sequence[Dict[str, "np.ndarray[Any, Any]"]],
+    columns: Sequence[str] = INPUT_COLUMNS + SEED_COLUMNS,
+) -> Dict[str, "np.ndarray[Any, Any]"]:
+    """Pad per-trace columns of different lengths into ``(T, N)`` arrays.
+
+    Padding repeats each trace's last sample with ``deltaTime = 0`` so the
+    model state of a finished trace stays frozen. A ``mask`` array marks
+    the real samples."""
+    length = max(len(trace["raw_temp"]) for trace in traces)
+    out: Dict[str, "np.ndarray[Any, Any]"] = {}
+    for name in columns:
+        if not all(name in trace for trace in traces):
+            continue
+        stacked = np.empty((length, len(traces)), dtype=np.float64)
+        for j, trace in enumerate(traces):
+            values = trace[name]
+            stacked[: len(values), j] = values
+            stacked[len(values) :, j] = values[-1] if len(values) else math.nan
+        out[name] = stacked
+    mask = np.zeros((length, len(traces)), dtype=bool)
+    for j, trace in enumerate(traces):
+        mask[: len(trace["raw_temp"]), j] = True
+    out["mask"] = mask
+    if "deltaTime" in out:
+        out["deltaTime"][~mask] = 0.0
+    return out
+
+
+def replay_ticks(
+    traces: Sequence[Dict[str, "np.ndarray[Any, Any]"]], p: Any = config
+) -> Tuple[Dict[str, "np.ndarray[Any, Any]"], Dict[str, "np.ndarray[Any, Any]"]]:
+    """Replay recorded tick logs through the model.
+
+    Each trace resumes from the thermal masses logged on its first row
+    (so logs that start mid-session line up) and is driven by the logged
+    ``raw_temp``, ``deltaTime``, ``flow_rate``, ``boiling`` and
+    ``setpoint`` of the remaining rows. The heater power of each step is
+    the ``heaterPower_W`` (or ``pwm_override``) logged on the row before
+    it, what the boiler was given; only logs without that column fall back
+    to ``heater_step``.
+    Returns ``(inputs, outputs)``: the stacked inputs (rows 1..) and the
+    replayed columns, both ``(T - 1, N)``."""
+    stacked = stack_traces(traces)
+    first = {
+        name: stacked[name][0]
+        for name in STATE_COLUMNS + ("ambientTemp",)
+        if name in stacked
+    }
+    if all(name in first for name in STATE_COLUMNS):
+        initial_state: Optional[Dict[str, Any]] = first
+    else:
+        initial_state = None
+    inputs = {name: values[1:] for name, values in stacked.items()}
+    heater_power = None
+    if "heaterPower_W" in stacked:
+        heater_power = np.nan_to_num(stacked["heaterPower_W"][:-1])
+        if "pwm_override" in stacked:
+            # the boiler runs the override whatever the controller asks
+            override = np.nan_to_num(stacked["pwm_override"][:-1])
+            heater_power = np.where(
+                override > 0, override * p.MAX_BOILER_POWER, heater_power
+            )
+    outputs = replay(
+        inputs["raw_temp"],
+        inputs["deltaTime"],
+        inputs["flow_rate"],
+        inputs["boiling"],
+        inputs.get("setpoint"),
+        heater_power=heater_power,
+        initial_state=initial_state,
+        p=p,
+    )
+    return inputs, outputs
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Physical stand-in for the machine, driven by what the controller commands.
+
+``BoilerPlant`` runs the same thermal-mass equations as the controller's
+model (``pcontroller.model_step``) with its own "true" parameters, and
+never looks at a measurement: it is the boiler the controller is trying
+to model. The sensor reading is the plant's sensor mass (which lags the
+element) plus noise and the TSIC's 11-bit resolution.
+
+``FlowMeter`` turns a flow rate into the meter's edges, using the
+calibration table ``Flow`` reads them with, so the controller sees the
+flow it would on the machine.
+
+Used by ``espyresso.simulation``; stdlib only.
+"""
+import math
+import random
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from espyresso.flow import _ML_PER_PULSE, _PULSE_RATES, Flow
+from espyresso.pcontroller import MASS_FIELDS, init_model, model_params, model_step
+
+# Where the plant differs from config, i.e. from what the controller
+# believes. Rough guesses at how far the fitted constants could be off;
+# pass params=model_params(MPC_SMOOTHING=0.0) for a plant that matches
+# the controller's model exactly.
+TRUE_PARAMS: Dict[str, float] = {
+    "BOILER_WATER_XFER_COEFF_NOFLOW": 13.5,
+    "ELEMENT_SHELL_XFER_COEFF": 15.0,
+    "BREWHEAD_AMBIENT_XFER_COEFF": 0.65,
+    "HEAT_CAPACITY_BODY": 450.0,
+    "RESERVOIR_TEMPERATURE": 20.0,
+    # the plant is never corrected towards a measurement
+    "MPC_SMOOTHING": 0.0,
+}
+
+# TSIC 306: 11 bits over -50..150 °C
+TSIC_RESOLUTION = 200.0 / 2047
+
+
+class BoilerPlant:
+    """Thermal masses of the boiler, brew head and body.
+
+    ``step`` advances them by ``dt`` seconds with the heater at ``heater``
+    (0..1 of MAX_BOILER_POWER) and ``flow_ml_s`` of reservoir water going
+    through. Like the controller's model, flow above 2 ml/s counts as
+    2 ml/s."""
+
+    def __init__(
+        self,
+        ambient: Optional[float] = None,
+        *,
+        params: Optional[SimpleNamespace] = None,
+        sensor_tau: float = 0.0,
+        sensor_noise: float = 0.03,
+        seed: int = 0,
+    ) -> None:
+        self.p = params or model_params(**TRUE_PARAMS)
+        self.ambient = self.p.AMBIENT_TEMPERATURE if ambient is None else ambient
+        self.sensor_tau = sensor_tau
+        self.sensor_noise = sensor_noise
+        self.rng = random.Random(seed)
+
+        self.m = SimpleNamespace(heaterPower=0.0)
+        init_model(self.m, self.ambient, self.p)
+        # extra first-order lag of the probe itself, on top of the sensor
+        # mass; 0 reads the sensor mass directly
+        self.probe_temp = self.ambient
+
+    def step(self, dt: float, heater: float, flow_ml_s: float) -> None:
+        m = self.m
+        m.heaterPower = heater * self.p.MAX_BOILER_POWER
+        model_step(
+            m,
+            m,
+            temperature=m.modeledSensorTemp,
+            deltaTime=dt,
+            flow_rate=flow_ml_s,
+            p=self.p,
+        )
+        if self.sensor_tau > 0:
+            self.probe_temp += (m.modeledSensorTemp - self.probe_temp) * (
+                1.0 - math.exp(-dt / self.sensor_tau)
+            )
+        else:
+            self.probe_temp = m.modeledSensorTemp
+
+    @property
+    def water_temp(self) -> float:
+        return float(self.m.waterTemp)
+
+    @property
+    def brew_head_temp(self) -> float:
+        return float(self.m.brewHeadTemp)
+
+    @property
+    def sensor_temp(self) -> float:
+        return float(self.probe_temp)
+
+    def masses(self) -> Dict[str, float]:
+        return {name: float(getattr(self.m, name)) for name in MASS_FIELDS}
+
+    def read_sensor(self) -> float:
+        """One TSIC reading: the probe temperature with noise, quantized."""
+        temp = self.probe_temp + self.rng.gauss(0.0, self.sensor_noise)
+        return float(round(temp / TSIC_RESOLUTION) * TSIC_RESOLUTION)
+
+
+class FlowMeter:
+    """Edges of the flow meter for a given flow.
+
+    ``Flow`` counts half a pulse per edge and looks the volume of a pulse
+    up by pulse rate; this inverts that lookup, so ``Flow`` reads back the
+    flow the plant is running at (within the table's range)."""
+
+    def __init__(self) -> None:
+        self.phase = 0.0
+        self._flow = 0.0
+        self._edge_interval = math.inf
+
+    def edge_interval(self, flow_ml_s: float) -> float:
+        """Seconds between edges at ``flow_ml_s``."""
+        if flow_ml_s != self._flow:
+            self._flow = flow_ml_s
+            self._edge_interval = 0.5 / self._pulse_rate(flow_ml_s)
+        return self._edge_interval
+
+    @staticmethod
+    def _pulse_rate(flow_ml_s: float) -> float:
+        if flow_ml_s < _PULSE_RATES[0] * _ML_PER_PULSE[0]:
+            # below the table Flow uses its first entry
+            return flow_ml_s / _ML_PER_PULSE[0]
+
+        def flow_at(rate: float) -> float:
+            return rate * (Flow.get_mls_per_pulse(rate) or 0.0)
+
+        low, high = _PULSE_RATES[0], 2 * _PULSE_RATES[-1]
+        while flow_at(high) < flow_ml_s:
+            high *= 2
+        for _ in range(40):
+            mid = (low + high) / 2
+            if flow_at(mid) < flow_ml_s:
+                low = mid
+            else:
+                high = mid
+        return high
+
+    def edges(self, now: float, dt: float, flow_ml_s: float) -> List[float]:
+        """Times of the edges in ``[now, now + dt)``."""
+        if flow_ml_s <= 0:
+            self.phase = 0.0
+            return []
+        interval = self.edge_interval(flow_ml_s)
+        times = []
+        while self.phase < dt:
+            times.append(now + self.phase)
+            self.phase += interval
+        self.phase -= dt
+        return times
@@ -6,7 +6,8 @@ from typing import TYPE_CHECKING, Callable, Optional, Tuple
 
 import pigpio
 
-from espyresso import config, shot_logger
+from espyresso import config, shot_logger, telemetry
+from espyresso.clock import SYSTEM_CLOCK, Clock
 from espyresso.pwm import PWM
 
 if TYPE_CHECKING:
@@ -33,8 +34,10 @@ class Pump:
         brewing_timer: "BrewingTimer",
         ranger: "Ranger",
         pumping: bool = False,
+        clock: Clock = SYSTEM_CLOCK,
     ) -> None:
         self.pigpio_pi = pigpio_pi
+        self.clock = clock
         self.bluetooth_scale = bluetooth_scale
         self.boiler = boiler
         self.temperature = temperature
@@ -53,10 +56,32 @@ class Pump:
 
         self.started_preinfuse: Optional[float] = None
         self.stopped_preinfuse: Optional[float] = None
+        self.shot_stat_file: Optional[str] = config.SHOT_STAT_FILE
 
         self.set_pwm_value(0.75)
         self.pump_thread = threading.Thread(target=self.brew_shot_routine)
 
+    def is_active(self) -> bool:
+        """A brew, steam or pulse routine is running."""
+        return self.pump_thread.is_alive()
+
+    def _start_routine(self, routine: Callable[[], None], name: str) -> None:
+        def run() -> None:
+            try:
+                routine()
+            finally:
+                telemetry.update(pump_active=False)
+
+        telemetry.update(pump_active=True)
+        self.pump_thread = self.clock.start_thread(run, name)
+
+    def _publish(self) -> None:
+        telemetry.update(
+            pumping=self.pumping,
+            preinfuse_started=self.started_preinfuse or 0.0,
+            preinfuse_stopped=self.stopped_preinfuse or 0.0,
+        )
+
     def toggle_pump(self) -> None:
         self.pumping = not self.pumping
         if not self.pumping:
@@ -64,6 +89,7 @@ class Pump:
         else:
             self.reset_started_time()
             self.pigpio_pi.write(self.pump_out_gpio, 1)
+        self._publish()
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event("pump", state="on" if self.pumping else "off")
@@ -72,6 +98,7 @@ class Pump:
         self.pigpio_pi.write(self.pump_out_gpio, 0)
         self.boiler.set_pwm_override(None)
         self.pumping = False
+        self._publish()
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event("pump", state="off", source="stop_pump")
@@ -80,7 +107,7 @@ class Pump:
         if self.stopped_preinfuse and self.started_preinfuse:
             return self.stopped_preinfuse - self.started_preinfuse
         if self.started_preinfuse and self.pumping:
-            return time.perf_counter() - self.started_preinfuse
+            return self.clock.now() - self.started_preinfuse
         return 0
 
     def pulse_pump(self) -> Tuple[bool, Optional[str]]:
@@ -94,9 +121,8 @@ class Pump:
         if not self.boiler.boiling:
             return False, "Not boiling"
 
-        self.pump_thread = threading.Thread(target=self.pulse_pump_routine)
         self.reset_started_time()
-        self.pump_thread.start()
+        self._start_routine(self.pulse_pump_routine, "pulse-pump")
         return True, None
 
     def pulse_pump_routine(self) -> None:
@@ -108,24 +134,24 @@ class Pump:
         # Disable automatic BrewingTimer
         self.brewing_timer.disable_automatic_timing()
 
-        started = time.perf_counter()
+        started = self.clock.now()
         self.toggle_pump()
         while (
             self.pumping
-            and time.perf_counter() - started < 120
+            and self.clock.now() - started < 120
             and self.temperature.get_latest_brewhead_temperature() < 80
         ):
             self.set_pwm_value(0.5)
-            time.sleep(1)
+            self.clock.sleep(1)
             self.set_pwm_value(0)
-            time.sleep(1)
+            self.clock.sleep(1)
 
         self.reset()
         if sl is not None:
             sl.log_event(
                 "pulse_pump",
                 phase="end",
-                seconds=time.perf_counter() - started,
+                seconds=self.clock.now() - started,
                 brewhead=self.temperature.get_latest_brewhead_temperature(),
             )
 
@@ -137,9 +163,8 @@ class Pump:
         # if not self.ranger.has_enough_water():
         #    return False, "Not enough water"
 
-        self.pump_thread = threading.Thread(target=self.pulse_pump_steam_routine)
         self.reset_started_time()
-        self.pump_thread.start()
+        self._start_routine(self.pulse_pump_steam_routine, "steam-pump")
         return True, None
 
     def pulse_pump_steam_routine(self) -> None:
@@ -151,20 +176,20 @@ class Pump:
         # Disable automatic BrewingTimer
         self.brewing_timer.disable_automatic_timing()
 
-        started = time.perf_counter()
+        started = self.clock.now()
         self.temperature.set_steam_temp()
         self.boiler.turn_on_boiler()
 
-        while self.pumping and time.perf_counter() - started < 120:
+        while self.pumping and self.clock.now() - started < 120:
             self.set_pwm_value(0.4)
-            time.sleep(0.5)
+            self.clock.sleep(0.5)
             self.set_pwm_value(0)
-            time.sleep(0.5)
+            self.clock.sleep(0.5)
 
         self.temperature.set_brew_temp()
         self.reset()
         if sl is not None:
-            sl.log_event("steam", phase="end", seconds=time.perf_counter() - started)
+            sl.log_event("steam", phase="end", seconds=self.clock.now() - started)
 
     def brew_shot(self) -> Tuple[bool, Optional[str]]:
         if self.pump_thread.is_alive():
@@ -177,9 +202,8 @@ class Pump:
         if not self.boiler.boiling:
             return False, "Not boiling"
 
-        self.pump_thread = threading.Thread(target=self.brew_shot_routine)
         self.reset_started_time()
-        self.pump_thread.start()
+        self._start_routine(self.brew_shot_routine, "brew-shot")
         return True, None
 
     def brew_shot_routine(self) -> None:
@@ -198,10 +222,12 @@ class Pump:
         # Hard-code boiler to 30% during preinfuse and start pump at 0.5 PWM (2-3 bars?)
         self.set_pwm_value(0.5)
         self.toggle_pump()
+        self.flow.publish("brew_start")
 
         # Set started preinfuse time
-        self.started_preinfuse = time.perf_counter()
+        self.started_preinfuse = self.clock.now()
         self.stopped_preinfuse = None
+        self._publish()
 
         sl = shot_logger.get()
         if sl is not None:
@@ -210,12 +236,13 @@ class Pump:
         # Sleep until flow is above 30ml or 7seconds
         while self.pumping and not (
             self.flow.get_millilitres() > 30
-            or (time.perf_counter() - self.started_preinfuse) > 7
+            or (self.clock.now() - self.started_preinfuse) > 7
         ):
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
 
         # Stop preinfuse timer
-        self.stopped_preinfuse = time.perf_counter()
+        self.stopped_preinfuse = self.clock.now()
+        self._publish()
 
         # Start brewing timer
         self.brewing_timer.reset_timer()
@@ -250,7 +277,7 @@ class Pump:
             if time_passed > 45:
                 return self.reset_brew_routine()
 
-            time.sleep(0.05)
+            self.clock.sleep(0.05)
 
         return self.reset_brew_routine()
 
@@ -261,6 +288,7 @@ class Pump:
 
     def reset_brew_routine(self) -> None:
         self.reset()
+        self.flow.publish("brew_end")
         self.brewing_timer.stop_timer()
         self.log_shot()
         logger.info(
@@ -270,13 +298,14 @@ class Pump:
         )
         self.brewing_timer.enable_automatic_timing()
         if not self.stopped_preinfuse:
-            self.stopped_preinfuse = time.perf_counter()
+            self.stopped_preinfuse = self.clock.now()
+            self._publish()
         sl = shot_logger.get()
         if sl is not None:
             sl.log_event(
                 "brew",
                 phase="end",
-                shot_seconds=shot_seconds,
+                shot_seconds=self.brewing_timer.get_time_since_started(),
                 total_ml=self.flow.get_millilitres(),
                 pulses=self.flow.get_pulse_count(),
                 final_grams=self.bluetooth_scale.get_scale_weight(),
@@ -298,7 +327,7 @@ class Pump:
         shot_time = self.brewing_timer.get_time_since_started()
 
         # Skip seemingly invalid shots
-        if not (5 < shot_time < 45):
+        if not (5 < shot_time < 45) or not self.shot_stat_file:
             return
 
         preinfuse_ml = (self.stopped_preinfuse or 0) - (self.started_preinfuse or 0)
@@ -309,5 +338,5 @@ class Pump:
             f"Shot grams: {self.bluetooth_scale.get_scale_weight()};"
             f"Preinfuse mL: {preinfuse_ml};"
         )
-        with open(config.SHOT_STAT_FILE, "a") as f:
+        with open(self.shot_stat_file, "a") as f:
             f.write(shot_log)
@@ -8,7 +8,7 @@ from typing import TYPE_CHECKING, Any, Deque
 
 import pigpio
 
-from espyresso import config
+from espyresso import config, telemetry
 from espyresso.utils import linear_transform
 
 logger = logging.getLogger(__name__)
@@ -38,6 +38,8 @@ class Ranger(threading.Thread):
         self.done = threading.Event()
 
         self.history: Deque[float] = collections.deque(maxlen=10)
+        # median of ``history``, computed once per reading
+        self.distance: float = 0
         self.high: int = 0
         self.low: int = 0
 
@@ -58,6 +60,8 @@ class Ranger(threading.Thread):
             if self.done.wait(timeout=5):
                 distance = linear_transform(self.low, 180, 860, 100, 0)
                 self.history.append(distance)
+                self.distance = statistics.median(self.history)
+                telemetry.update(water=self.distance)
 
                 logger.debug(
                     f"Ranger distance: {distance}; low: {self.low}; high: {self.high}"
@@ -69,7 +73,7 @@ class Ranger(threading.Thread):
         self._stop_event.set()
 
     def get_current_distance(self) -> float:
-        return statistics.median(self.history) if self.history else 0
+        return self.distance
 
     def has_enough_water(self) -> bool:
         return self.get_current_distance() > 10
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""SQLite database of shots, for history queries across sessions.
+
+One row per shot in ``shots`` (wall-clock start, brew/preinfuse numbers
+from the brew events, temperature summary from the ticks) and the shot's
+tick series in ``ticks``, keyed by ``(shot_id, t)``. For example, every
+shot this month whose sensor dropped more than 2 °C::
+
+    SELECT * FROM shots
+    WHERE started >= strftime('%s', 'now', 'start of month')
+      AND temp_droop > 2
+
+``ShotRecorder`` turns a session's tick and event stream into those rows.
+``ShotLogger`` feeds it live from its writer thread, and
+``tools/backfill_shot_db.py`` feeds it from logs written before.
+"""
+import csv
+import logging
+import math
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from espyresso import tick_log
+
+logger = logging.getLogger(__name__)
+
+# Tick columns kept per shot; the full tick log stays on disk.
+TICK_COLUMNS = (
+    "raw_temp",
+    "heater",
+    "flow_rate",
+    "setpoint",
+    "shellTemp",
+    "waterTemp",
+    "brewHeadTemp",
+)
+
+# The first seconds of a shot define the starting temperature for droop.
+DROOP_BASELINE_SECONDS = 2.0
+
+SHOT_COLUMNS = (
+    "session",
+    "started",
+    "duration_s",
+    "preinfuse_s",
+    "preinfuse_ml",
+    "total_ml",
+    "final_grams",
+    "pulses",
+    "peak_temp",
+    "mean_temp",
+    "min_temp",
+    "temp_droop",
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    started REAL NOT NULL,
+    {", ".join(f"{name} REAL" for name in SHOT_COLUMNS[2:])}
+);
+CREATE INDEX IF NOT EXISTS shots_started ON shots (started);
+CREATE INDEX IF NOT EXISTS shots_session ON shots (session);
+CREATE TABLE IF NOT EXISTS ticks (
+    shot_id INTEGER NOT NULL REFERENCES shots (id) ON DELETE CASCADE,
+    t REAL NOT NULL,
+    {", ".join(f"{name} REAL" for name in TICK_COLUMNS)},
+    PRIMARY KEY (shot_id, t)
+) WITHOUT ROWID;
+"""
+
+
+class ShotDB:
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Used from the shot logger's writer thread and, on close, from
+        # the thread stopping it; the logger serializes the two.
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(_SCHEMA)
+
+    def has_session(self, session: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM sessions WHERE session = ?", (session,)
+        ).fetchone()
+        return row is not None
+
+    def add_session(self, session: str, started: float) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO sessions VALUES (?, ?)", (session, started)
+            )
+
+    def add_shot(self, shot: Dict[str, Any], ticks: Sequence[Tuple[float, ...]]) -> int:
+        """Insert one shot and its ticks (``(t,) + TICK_COLUMNS`` tuples)."""
+        with self.conn:
+            cur = self.conn.execute(
+                f"INSERT INTO shots ({', '.join(SHOT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(SHOT_COLUMNS))})",
+                [shot.get(name) for name in SHOT_COLUMNS],
+            )
+            shot_id = cur.lastrowid
+            assert shot_id is not None
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO ticks VALUES "
+                f"({', '.join('?' * (len(TICK_COLUMNS) + 2))})",
+                [(shot_id,) + tick for tick in ticks],
+            )
+        return shot_id
+
+    def shots(
+        self, where: str = "1", params: Sequence[Any] = ()
+    ) -> List[Dict[str, Any]]:
+        """Shot rows as dicts, oldest first, filtered by an SQL ``where``."""
+        cur = self.conn.execute(
+            f"SELECT * FROM shots WHERE {where} ORDER BY started", params
+        )
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+    def ticks(self, shot_id: int) -> List[Dict[str, float]]:
+        cur = self.conn.execute(
+            "SELECT * FROM ticks WHERE shot_id = ? ORDER BY t", (shot_id,)
+        )
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _float(v: Any) -> Optional[float]:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) else f
+
+
+class ShotRecorder:
+    """Collects the ticks between a ``brew phase=preinfuse_start`` and the
+    matching ``brew phase=end`` event, then writes the shot to ``db``.
+
+    ``t`` is seconds since ``started`` (wall clock), as in the shot log."""
+
+    def __init__(self, db: ShotDB, session: str, started: float) -> None:
+        self.db = db
+        self.session = session
+        self.started = started
+        self._shot: Optional[Dict[str, Any]] = None
+        self._ticks: List[Tuple[float, ...]] = []
+        self._index: Optional[List[int]] = None
+        self._fields: Optional[Sequence[str]] = None
+        db.add_session(session, started)
+
+    def tick(self, t: float, fields: Sequence[str], values: Sequence[Any]) -> None:
+        """``fields`` names ``values``; pass the same sequence every tick."""
+        shot = self._shot
+        if shot is None:
+            return
+        if fields is not self._fields:
+            self._fields = fields
+            self._index = [
+                fields.index(name) if name in fields else -1 for name in TICK_COLUMNS
+            ]
+        assert self._index is not None
+        self._ticks.append(
+            (t - shot["t0"],)
+            + tuple(_float(values[i]) if i >= 0 else None for i in self._index)
+        )
+
+    def event(self, t: float, kind: str, fields: Dict[str, Any]) -> None:
+        if kind != "brew":
+            return
+        phase = fields.get("phase")
+        if phase == "preinfuse_start":
+            self._shot = {"t0": t}
+            self._ticks = []
+        elif self._shot is None:
+            return
+        elif phase == "preinfuse_stop":
+            self._shot["preinfuse_s"] = _float(fields.get("preinfuse_seconds"))
+            self._shot["preinfuse_ml"] = _float(fields.get("preinfuse_ml"))
+        elif phase == "end":
+            shot = self._shot
+            shot.update(
+                total_ml=_float(fields.get("total_ml")),
+                final_grams=_float(fields.get("final_grams")),
+                pulses=_float(fields.get("pulses")),
+            )
+            self._shot = None
+            self._finish(shot, t)
+
+    def _finish(self, shot: Dict[str, Any], t: float) -> None:
+        shot["session"] = self.session
+        shot["started"] = self.started + shot["t0"]
+        shot["duration_s"] = t - shot["t0"]
+        temps = [tick[1] for tick in self._ticks if tick[1] is not None]
+        if temps:
+            baseline = [
+                tick[1]
+                for tick in self._ticks
+                if tick[1] is not None and tick[0] <= DROOP_BASELINE_SECONDS
+            ] or temps[:1]
+            shot["peak_temp"] = max(temps)
+            shot["min_temp"] = min(temps)
+            shot["mean_temp"] = sum(temps) / len(temps)
+            shot["temp_droop"] = sum(baseline) / len(baseline) - min(temps)
+        try:
+            self.db.add_shot(shot, self._ticks)
+        except sqlite3.Error:
+            logger.exception("could not store shot in %s", self.db.path)
+        self._ticks = []
+
+
+def session_of(tick_path: str) -> Tuple[str, float]:
+    """Session name and wall-clock start from a ``shot-<ts>-tick.*`` path."""
+    name = os.path.basename(tick_path).split("-tick.")[0]
+    stamp = name[len("shot-") :]
+    return name, time.mktime(time.strptime(stamp, "%Y%m%d-%H%M%S"))
+
+
+def iter_tick_rows(path: str) -> Iterator[Tuple[List[str], List[Any]]]:
+    """``(columns, values)`` for every row of a binary or CSV tick log;
+    ``columns`` includes ``t`` first."""
+    if path.endswith(".bin"):
+        with open(path, "rb") as f:
+            columns, _, _ = tick_log.read_header(f)
+        for row in tick_log.iter_rows(path):
+            yield columns, list(row.values())
+        return
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        for values in reader:
+            if len(values) == len(columns):
+                yield columns, values
+
+
+def iter_events(path: str) -> Iterator[Tuple[float, str, Dict[str, str]]]:
+    """``(t, kind, fields)`` for every event of a ``shot-*-event.csv``."""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        next(f, None)
+        for line in f:
+            parts = line.rstrip("\n").split(",", 2)
+            if len(parts) < 2:
+                continue
+            fields = dict(
+                item.split("=", 1)
+                for item in (parts[2] if len(parts) > 2 else "").split()
+                if "=" in item
+            )
+            yield float(parts[0]), parts[1], fields
+
+
+def backfill(db: ShotDB, tick_path: str, event_path: str) -> int:
+    """Record the shots of one logged session; returns how many."""
+    session, started = session_of(tick_path)
+    recorder = ShotRecorder(db, session, started)
+    events = list(iter_events(event_path))
+    before = len(db.shots("session = ?", (session,)))
+    i = 0
+    columns: Optional[List[str]] = None
+    fields: List[str] = []
+    for row_columns, values in iter_tick_rows(tick_path):
+        if row_columns is not columns:
+            columns, fields = row_columns, row_columns[1:]
+        t = float(values[0])
+        # Event times are logged to 0.1 ms; one logged at the same time as
+        # a tick came after it.
+        while i < len(events) and events[i][0] < round(t, 4):
+            recorder.event(*events[i])
+            i += 1
+        recorder.tick(t, fields, values[1:])
+    for event in events[i:]:
+        recorder.event(*event)
+    return len(db.shots("session = ?", (session,))) - before
@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
-"""Structured CSV logger for reviewing real-life shots against the MPC.
+"""Structured logger for reviewing real-life shots against the MPC.
 
-Writes two line-buffered files per session in ``base_dir`` (default ``log/``):
+Writes two files per session in ``base_dir`` (default ``log/``), from a
+background thread:
 
-- ``shot-<ts>-tick.csv``  one row per controller update (~ TSIC sample rate).
-  Column header is inferred from the first ``log_tick`` call, so the caller
-  decides the schema.
+- ``shot-<ts>-tick.bin``  one record per controller update (control rate).
+  Columns are ``t`` plus the ``FIELDS`` of the state object passed to the
+  first ``log_tick`` call (``pcontroller.ControllerState``). The format is
+  described in ``espyresso.tick_log``; with ``fmt="csv"`` the same columns
+  go to ``shot-<ts>-tick.csv`` as text instead.
 - ``shot-<ts>-event.csv``  ``t,kind,details`` for discrete events.
 
+With ``shot_db`` set, every finished brew is also recorded in that SQLite
+database (see ``espyresso.shot_db``).
+
 A single process-wide instance is exposed via :func:`init` / :func:`get` so
 modules deep in the call graph (pcontroller, boiler, pump, buttons, ...) can
 emit without threading a dependency through every constructor.
@@ -17,7 +23,15 @@ import math
 import os
 import threading
 import time
-from typing import Any, List, Optional, TextIO
+from collections import deque
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Deque, Dict, Optional, TextIO, Tuple
+
+from espyresso.shot_db import ShotDB, ShotRecorder
+from espyresso.tick_log import TickWriter
+
+if TYPE_CHECKING:
+    from espyresso.pcontroller import ControllerState
 
 logger = logging.getLogger(__name__)
 
@@ -40,25 +54,72 @@ def _fmt(v: Any) -> str:
 
 
 class ShotLogger:
-    # Block-buffered: the previous ``buffering=1`` (line-buffered) forced
-    # one Python→OS write per tick (~10 Hz). On the Pi Zero's SD card the
-    # kernel cache absorbed most of it, but per-record write syscalls add
-    # up. With 8 KiB blocks the kernel sees one write per ~100 rows;
-    # ``close()`` flushes any tail before exit, and we periodically flush
-    # on each event so a crash mid-shot only loses tail tick rows.
+    """Callers only append a raw tuple to a bounded queue; a writer thread
+    formats and writes whatever is queued every ``flush_interval`` seconds.
+
+    If the queue is full (the SD card stalled for longer than the queue
+    covers) new entries are dropped and counted in ``dropped`` instead of
+    blocking the control loop; the count is written as a final event.
+
+    ``fsync`` decides when written batches are forced to the card:
+    ``"never"`` (leave it to the kernel), ``"event"`` (batches holding an
+    event, so button presses and shot start/stop survive a power cut) or
+    ``"batch"`` (every batch)."""
+
+    # One write per batch already; 8 KiB blocks keep a batch of ticks in
+    # a handful of write syscalls.
     _BUFFER = 8192
 
-    def __init__(self, base_dir: str = "log") -> None:
+    def __init__(
+        self,
+        base_dir: str = "log",
+        fmt: str = "binary",
+        *,
+        queue_size: int = 4096,
+        flush_interval: float = 1.0,
+        fsync: str = "event",
+        shot_db: Optional[str] = None,
+    ) -> None:
+        if fmt not in ("binary", "csv"):
+            raise ValueError(f"unknown shot log format {fmt!r}")
+        if fsync not in ("never", "event", "batch"):
+            raise ValueError(f"unknown fsync policy {fsync!r}")
         os.makedirs(base_dir, exist_ok=True)
         ts = time.strftime("%Y%m%d-%H%M%S")
-        self.tick_path = os.path.join(base_dir, f"shot-{ts}-tick.csv")
+        ext = "bin" if fmt == "binary" else "csv"
+        self.tick_path = os.path.join(base_dir, f"shot-{ts}-tick.{ext}")
         self.event_path = os.path.join(base_dir, f"shot-{ts}-event.csv")
+        self.binary = fmt == "binary"
+        self.fsync = fsync
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        # Entries are (t, FIELDS values) for ticks and (t, kind, fields)
+        # for events. deque append/popleft are atomic, so producers never
+        # take a lock; only the writing side does.
+        self._queue: Deque[Tuple[Any, ...]] = deque()
+        self._tick_fields: Optional[Tuple[str, ...]] = None
+        self._tick_values: Optional["attrgetter[Any]"] = None
         self._tick_file: Optional[TextIO] = None
-        self._tick_keys: List[str] = []
+        self._tick_writer: Optional[TickWriter] = None
         self._event_file: TextIO = open(self.event_path, "w", buffering=self._BUFFER)
         self._event_file.write("t,kind,details\n")
-        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
         self._t0 = time.perf_counter()
+        self._recorder: Optional[ShotRecorder] = None
+        if shot_db:
+            try:
+                self._recorder = ShotRecorder(
+                    ShotDB(shot_db), f"shot-{ts}", time.time()
+                )
+            except Exception:
+                logger.exception("shot database %s unavailable", shot_db)
+        self._thread = threading.Thread(
+            target=self._run, name="shot-logger", daemon=True
+        )
+        self._thread.start()
         logger.info(
             "ShotLogger started: tick=%s event=%s", self.tick_path, self.event_path
         )
@@ -66,48 +127,116 @@ class ShotLogger:
     def _now(self) -> float:
         return time.perf_counter() - self._t0
 
-    def log_tick(self, **fields: Any) -> None:
-        try:
-            with self._lock:
-                if self._tick_file is None:
-                    self._tick_keys = ["t"] + list(fields.keys())
-                    self._tick_file = open(
-                        self.tick_path, "w", buffering=self._BUFFER
-                    )
-                    self._tick_file.write(",".join(self._tick_keys) + "\n")
-                row = [f"{self._now():.4f}"]
-                row.extend(_fmt(fields.get(k)) for k in self._tick_keys[1:])
-                self._tick_file.write(",".join(row) + "\n")
-        except Exception:
-            logger.exception("ShotLogger.log_tick failed")
+    def _put(self, entry: Tuple[Any, ...]) -> None:
+        if len(self._queue) >= self.queue_size or self._closed.is_set():
+            self.dropped += 1
+            return
+        self._queue.append(entry)
+
+    def log_tick(self, state: "ControllerState") -> None:
+        """Queue one row read straight from the controller's state slots."""
+        tick_values = self._tick_values
+        if tick_values is None:
+            self._tick_fields = state.FIELDS
+            tick_values = self._tick_values = attrgetter(*state.FIELDS)
+        self._put((self._now(), tick_values(state)))
 
     def log_event(self, kind: str, **fields: Any) -> None:
-        # Events are rare (button presses, setpoint changes, shot
-        # start/stop) but interesting; flush so the most recent event is
-        # always on disk and tick rows up to that point are saved too.
+        self._put((self._now(), kind, fields))
+
+    def flush(self) -> None:
+        """Write everything queued so far, on the calling thread."""
+        with self._write_lock:
+            self._drain()
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def _drain(self) -> None:
+        wrote_event = wrote = False
+        queue = self._queue
         try:
-            with self._lock:
-                details = " ".join(f"{k}={_fmt(v)}" for k, v in fields.items())
-                self._event_file.write(f"{self._now():.4f},{kind},{details}\n")
-                self._event_file.flush()
+            while queue:
+                entry = queue.popleft()
+                if len(entry) == 2:
+                    self._write_tick(*entry)
+                else:
+                    self._write_event(*entry)
+                    wrote_event = True
+                if self._recorder is not None:
+                    self._record(entry)
+                wrote = True
+            if not wrote:
+                return
+            self._event_file.flush()
+            if self._tick_file is not None:
+                self._tick_file.flush()
+            if self._tick_writer is not None:
+                self._tick_writer.flush()
+            if self.fsync == "batch" or (self.fsync == "event" and wrote_event):
+                os.fsync(self._event_file.fileno())
                 if self._tick_file is not None:
-                    self._tick_file.flush()
+                    os.fsync(self._tick_file.fileno())
+                if self._tick_writer is not None:
+                    os.fsync(self._tick_writer.fileno())
         except Exception:
-            logger.exception("ShotLogger.log_event failed")
+            logger.exception("ShotLogger write failed")
+
+    def _record(self, entry: Tuple[Any, ...]) -> None:
+        assert self._recorder is not None
+        try:
+            if len(entry) == 2:
+                self._recorder.tick(entry[0], self._tick_fields or (), entry[1])
+            else:
+                self._recorder.event(*entry)
+        except Exception:
+            logger.exception("ShotRecorder failed")
+
+    def _write_tick(self, t: float, values: Tuple[Any, ...]) -> None:
+        fields = self._tick_fields or ()
+        if self.binary:
+            if self._tick_writer is None:
+                self._tick_writer = TickWriter(
+                    self.tick_path, ("t",) + fields, buffering=self._BUFFER
+                )
+            self._tick_writer.write(t, values)
+            return
+        if self._tick_file is None:
+            self._tick_file = open(self.tick_path, "w", buffering=self._BUFFER)
+            self._tick_file.write("t," + ",".join(fields) + "\n")
+        self._tick_file.write(f"{t:.4f}," + ",".join(map(_fmt, values)) + "\n")
+
+    def _write_event(self, t: float, kind: str, fields: Dict[str, Any]) -> None:
+        details = " ".join(f"{k}={_fmt(v)}" for k, v in fields.items())
+        self._event_file.write(f"{t:.4f},{kind},{details}\n")
 
     def close(self) -> None:
-        with self._lock:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(timeout=5.0)
+        with self._write_lock:
+            if self.dropped:
+                logger.warning("ShotLogger dropped %d entries", self.dropped)
+                self._queue.append(
+                    (self._now(), "shot_logger", {"dropped": self.dropped})
+                )
+            self._drain()
             if self._tick_file is not None:
-                self._tick_file.flush()
                 self._tick_file.close()
                 self._tick_file = None
-            self._event_file.flush()
+            if self._tick_writer is not None:
+                self._tick_writer.close()
+                self._tick_writer = None
             self._event_file.close()
+            if self._recorder is not None:
+                self._recorder.db.close()
 
 
-def init(base_dir: str = "log") -> ShotLogger:
+def init(base_dir: str = "log", fmt: str = "binary", **kwargs: Any) -> ShotLogger:
     global _INSTANCE
-    _INSTANCE = ShotLogger(base_dir)
+    _INSTANCE = ShotLogger(base_dir, fmt, **kwargs)
     return _INSTANCE
 
 
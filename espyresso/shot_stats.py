@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Single-pass accumulators for analysing tick logs.
+
+Every accumulator takes rows (``{column: float}`` dicts with a ``t``) one
+at a time through ``add`` and keeps only O(1) state, so a whole log is
+analysed in one streaming pass with constant memory; ``run`` feeds a row
+stream to a set of them. Used by ``tools/review_shot.py``; stdlib only so
+it runs on the Pi.
+
+Values are picked from a row by a ``key``: a column name, or a callable
+for derived values. NaN and missing values are skipped.
+"""
+import abc
+import math
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+Row = Dict[str, float]
+Key = Union[str, Callable[[Row], float]]
+Predicate = Callable[[Row], bool]
+
+
+def _getter(key: Key) -> Callable[[Row], float]:
+    if callable(key):
+        return key
+    column = key
+    return lambda r: r.get(column, math.nan)
+
+
+class Accumulator(abc.ABC):
+    @abc.abstractmethod
+    def add(self, row: Row) -> None:
+        """Called once per row, in order."""
+
+    def finish(self) -> None:
+        """Called once after the last row."""
+
+
+class Stats(Accumulator):
+    """Count, min, max, mean and variance (Welford) of a value."""
+
+    def __init__(self, key: Key, where: Optional[Predicate] = None) -> None:
+        self.value = _getter(key)
+        self.where = where
+        self.count = 0
+        self.mean = math.nan
+        self._m2 = 0.0
+        self.min = math.nan
+        self.max = math.nan
+        self.first = math.nan
+        self.last = math.nan
+
+    def add(self, row: Row) -> None:
+        if self.where is not None and not self.where(row):
+            return
+        v = self.value(row)
+        if v is None or math.isnan(v):
+            return
+        self.count += 1
+        if self.count == 1:
+            self.mean = self.min = self.max = self.first = v
+        else:
+            delta = v - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (v - self.mean)
+            if v < self.min:
+                self.min = v
+            elif v > self.max:
+                self.max = v
+        self.last = v
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class Intervals(Accumulator):
+    """Time spent, and number of stretches, where ``pred`` holds.
+
+    A stretch runs from its first matching row to the first row that
+    doesn't match, or to the last row if the log ends inside it."""
+
+    def __init__(self, pred: Predicate) -> None:
+        self.pred = pred
+        self.count = 0
+        self.seconds = 0.0
+        self._start: Optional[float] = None
+        self._last_t = math.nan
+
+    def add(self, row: Row) -> None:
+        t = row["t"]
+        self._last_t = t
+        if self.pred(row):
+            if self._start is None:
+                self._start = t
+        elif self._start is not None:
+            self._close(t)
+
+    def _close(self, t: float) -> None:
+        assert self._start is not None
+        self.seconds += t - self._start
+        self.count += 1
+        self._start = None
+
+    def finish(self) -> None:
+        if self._start is not None:
+            self._close(self._last_t)
+
+
+class FirstTime(Accumulator):
+    """``t`` of the first row where ``pred`` holds (None if never)."""
+
+    def __init__(self, pred: Predicate) -> None:
+        self.pred = pred
+        self.t: Optional[float] = None
+
+    def add(self, row: Row) -> None:
+        if self.t is None and self.pred(row):
+            self.t = row["t"]
+
+
+class Crossings(Accumulator):
+    """Times a value crosses ``threshold``, in either direction."""
+
+    def __init__(
+        self,
+        key: Key,
+        threshold: Union[float, Callable[[], float]],
+        where: Optional[Predicate] = None,
+    ) -> None:
+        self.value = _getter(key)
+        if callable(threshold):
+            self.threshold = threshold
+        else:
+            fixed = threshold
+            self.threshold = lambda: fixed
+        self.where = where
+        self.count = 0
+        self.first: Optional[float] = None
+        self._below: Optional[bool] = None
+
+    def add(self, row: Row) -> None:
+        if self.where is not None and not self.where(row):
+            return
+        v = self.value(row)
+        if v is None or math.isnan(v):
+            return
+        below = v < self.threshold()
+        if self._below is not None and below != self._below:
+            self.count += 1
+            if self.first is None:
+                self.first = row["t"]
+        self._below = below
+
+
+class Windows(Accumulator):
+    """Routes rows to a fresh set of accumulators per time window.
+
+    ``windows`` are sorted, non-overlapping ``(start, end)`` pairs, e.g. the
+    brews from the event log; ``factory(start, end)`` makes the
+    accumulators for one. Rows with ``start <= t <= end`` go to it."""
+
+    def __init__(
+        self,
+        windows: Sequence[Tuple[float, float]],
+        factory: Callable[[float, float], Dict[str, Accumulator]],
+    ) -> None:
+        self.windows = list(windows)
+        self.factory = factory
+        self.results: List[Dict[str, Accumulator]] = []
+        self._index = 0
+
+    def add(self, row: Row) -> None:
+        t = row["t"]
+        windows = self.windows
+        while self._index < len(windows) and t > windows[self._index][1]:
+            self._index += 1
+        if self._index == len(windows) or t < windows[self._index][0]:
+            return
+        while len(self.results) <= self._index:
+            self.results.append(self.factory(*windows[len(self.results)]))
+        for acc in self.results[self._index].values():
+            acc.add(row)
+
+    def finish(self) -> None:
+        while len(self.results) < len(self.windows):
+            self.results.append(self.factory(*self.windows[len(self.results)]))
+        for accs in self.results:
+            for acc in accs.values():
+                acc.finish()
+
+
+def run(rows: Iterable[Row], accumulators: Iterable[Accumulator]) -> int:
+    """Feed every row to every accumulator, then finish them; returns the
+    number of rows."""
+    accs = list(accumulators)
+    n = 0
+    for row in rows:
+        n += 1
+        for acc in accs:
+            acc.add(row)
+    for acc in accs:
+        acc.finish()
+    return n
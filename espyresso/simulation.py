@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""Closed-loop simulation of the machine on a simulated clock.
+
+``Simulation`` wires the real Boiler, Flow, BrewingTimer, Temperature
+(with its PController) and Pump to a fake pigpio, a fake TSIC sensor and
+a plant model of the boiler (``espyresso.plant``) driven by the heater
+PWM the controller commands. Everything runs on a ``SimulatedClock``, so
+a warm-up + brew + steam session runs deterministically, far faster than
+real time:
+
+    sim = Simulation()
+    sim.warm_up()
+    sim.brew()
+    sim.steam(30)
+
+The control loop and the brewing timer are polled on the clock instead
+of running as threads; the pump routines run as lock-step threads. Nothing
+is written to disk: the feed-forward profile starts empty and learns in
+memory, and the shot stat file is off.
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from espyresso import config
+from espyresso.boiler import Boiler
+from espyresso.clock import SimulatedClock
+from espyresso.flow import Flow
+from espyresso.pcontroller import FeedForward
+from espyresso.plant import BoilerPlant, FlowMeter
+from espyresso.pump import Pump
+from espyresso.temperature import Temperature
+from espyresso.timer import BrewingTimer
+from espyresso.tsic import Measurement
+from espyresso.utils import WaveQueue
+
+logger = logging.getLogger(__name__)
+
+# The plant's Euler step. 50 ms is the brew routine's finest pump timing;
+# a finer step changes the scorecards by less than their rounding and
+# costs a model step per call.
+PLANT_STEP = 0.05
+TSIC_PERIOD = 0.1
+
+
+class FakePi:
+    """The parts of ``pigpio.pi`` the machine uses: GPIO levels, hardware
+    PWM duty cycles (as fractions) and edge callbacks."""
+
+    def __init__(self) -> None:
+        self.levels: Dict[int, int] = {}
+        self.duty: Dict[int, float] = {}
+        self.callbacks: Dict[int, List[Callable[[int, int, int], None]]] = {}
+
+    def set_mode(self, gpio: int, mode: int) -> None:
+        pass
+
+    def set_pull_up_down(self, gpio: int, pud: int) -> None:
+        pass
+
+    def write(self, gpio: int, level: int) -> None:
+        self.levels[gpio] = level
+
+    def read(self, gpio: int) -> int:
+        return self.levels.get(gpio, 0)
+
+    def hardware_PWM(self, gpio: int, freq: int, duty: int) -> None:
+        self.duty[gpio] = duty / 1e6
+
+    def callback(
+        self, gpio: int, edge: int = 0, func: Optional[Callable[..., None]] = None
+    ) -> None:
+        if func is not None:
+            self.callbacks.setdefault(gpio, []).append(func)
+
+    def fire(self, gpio: int, level: int = 1) -> None:
+        for func in self.callbacks.get(gpio, []):
+            func(gpio, level, 0)
+
+    def stop(self) -> None:
+        pass
+
+
+class FakeTsic:
+    """Stands in for ``TsicInputChannel``: reads the plant's sensor
+    temperature every ``TSIC_PERIOD`` simulated seconds. ``dropout`` makes
+    it go quiet, like a loose sensor wire."""
+
+    def __init__(self, clock: SimulatedClock, read: Callable[[], float]) -> None:
+        self.clock = clock
+        self.read = read
+        self.callback: Optional[Callable[[Measurement], None]] = None
+        self.dropout = False
+
+    def measure_once(self, timeout: Optional[float] = None) -> Measurement:
+        return Measurement(self.read(), self.clock.now())
+
+    def start(self, callback: Callable[[Measurement], None]) -> None:
+        self.callback = callback
+
+    def stop(self) -> None:
+        self.callback = None
+
+    def sample(self) -> None:
+        if self.callback is not None and not self.dropout:
+            self.callback(self.measure_once())
+
+
+class FakeScale:
+    """Cup weight: what the pump pushed through, less what the puck holds,
+    in 0.1 g steps like the real scale."""
+
+    def __init__(self, retained_ml: float = 25.0) -> None:
+        self.retained_ml = retained_ml
+        self.pumped_ml = 0.0
+
+    def tare(self) -> None:
+        self.pumped_ml = 0.0
+
+    def get_scale_weight(self) -> float:
+        return round(max(0.0, self.pumped_ml - self.retained_ml), 1)
+
+
+class FakeRanger:
+    def __init__(self) -> None:
+        self.enough_water = True
+
+    def has_enough_water(self) -> bool:
+        return self.enough_water
+
+
+class Simulation:
+    """The machine on a simulated clock; see the module docstring.
+
+    ``pump_flow`` is the flow (ml/s) through the puck at full pump PWM
+    with the pump on."""
+
+    def __init__(
+        self,
+        *,
+        plant: Optional[BoilerPlant] = None,
+        pump_flow: float = 3.0,
+    ) -> None:
+        self.clock = SimulatedClock()
+        self.pi = FakePi()
+        self.plant = plant or BoilerPlant()
+        self.flow_meter = FlowMeter()
+        self.pump_flow = pump_flow
+        self.started_time = 0.0
+        self.flow_ml_s = 0.0
+
+        self.scale = FakeScale()
+        self.ranger = FakeRanger()
+        self.tsic = FakeTsic(self.clock, self.plant.read_sensor)
+
+        self.flow_queue = _queue(0, 3, "FLOW", steps=5)
+        self.boiler_queue = _queue(0, 100, "BOILER", steps=5)
+        self.temp_queue = _queue(90, 100, "TEMP", target_y=config.TARGET_TEMP)
+
+        self.flow = Flow(self.pi, self.flow_queue, clock=self.clock)
+        self.brewing_timer = BrewingTimer(flow=self.flow, clock=self.clock)
+        self.boiler = Boiler(
+            pigpio_pi=self.pi,
+            reset_started_time=self.reset_started_time,
+            add_to_queue=self.boiler_queue.add_to_queue,
+        )
+        self.temperature = Temperature(
+            get_started_time=self.get_started_time,
+            pigpio_pi=self.pi,
+            boiler=self.boiler,
+            flow=self.flow,
+            temp_queue=self.temp_queue,
+            clock=self.clock,
+            tsic=self.tsic,
+        )
+        feed_forward = self.temperature.pcontroller.feed_forward
+        self.temperature.pcontroller.feed_forward = FeedForward(
+            [0.0] * len(feed_forward.profile),
+            gain=feed_forward.gain,
+            lead=feed_forward.lead,
+            learning_rate=feed_forward.learning_rate,
+        )
+        self.pump = Pump(
+            pigpio_pi=self.pi,
+            bluetooth_scale=self.scale,  # type: ignore
+            boiler=self.boiler,
+            temperature=self.temperature,
+            flow=self.flow,
+            reset_started_time=self.reset_started_time,
+            brewing_timer=self.brewing_timer,
+            ranger=self.ranger,  # type: ignore
+            clock=self.clock,
+        )
+        self.pump.shot_stat_file = None
+        self.tsic.start(self.temperature.callback)
+
+        self.clock.call_every(PLANT_STEP, self._step_plant)
+        self.clock.call_every(TSIC_PERIOD, self.tsic.sample)
+        self.clock.call_every(config.CONTROL_PERIOD, self.temperature.control_loop.poll)
+        self.clock.call_at(0.0, self._poll_brewing_timer)
+
+    def reset_started_time(self) -> None:
+        self.started_time = self.clock.now()
+
+    def get_started_time(self) -> float:
+        return self.started_time
+
+    @property
+    def now(self) -> float:
+        return self.clock.now()
+
+    @property
+    def heater(self) -> float:
+        return self.pi.duty.get(config.BOILER_PWM_GPIO, 0.0)
+
+    @property
+    def pumping(self) -> bool:
+        return bool(self.pi.levels.get(config.PUMP_OUT_GPIO))
+
+    def _poll_brewing_timer(self) -> None:
+        delay = self.brewing_timer.poll()
+        self.clock.call_at(self.clock.now() + delay, self._poll_brewing_timer)
+
+    def _step_plant(self) -> None:
+        pump = self.pi.duty.get(config.PUMP_PWM_GPIO, 0.0) if self.pumping else 0.0
+        self.flow_ml_s = pump * self.pump_flow
+        self.plant.step(PLANT_STEP, self.heater, self.flow_ml_s)
+        self.scale.pumped_ml += self.flow_ml_s * PLANT_STEP
+
+        # Flow-meter edges that fall inside the next step, at their own
+        # times rather than rounded to the step.
+        for when in self.flow_meter.edges(self.clock.now(), PLANT_STEP, self.flow_ml_s):
+            self.clock.call_at(when, self._flow_edge)
+
+    def _flow_edge(self) -> None:
+        self.pi.fire(config.FLOW_IN_GPIO)
+
+    def run_for(self, seconds: float) -> None:
+        self.clock.advance(seconds)
+
+    def run_until(
+        self, done: Callable[[], bool], timeout: float, step: float = 0.1
+    ) -> bool:
+        """Advance in ``step`` increments until ``done()``; False if it
+        didn't happen within ``timeout`` simulated seconds."""
+        end = self.clock.now() + timeout
+        while not done():
+            if self.clock.now() >= end:
+                return False
+            self.clock.advance(step)
+        return True
+
+    def warm_up(self, tolerance: float = 0.5, timeout: float = 900.0) -> float:
+        """Turn the boiler on and run until the water is within
+        ``tolerance`` of the setpoint; returns the seconds it took."""
+        started = self.clock.now()
+        self.boiler.turn_on_boiler()
+        setpoint = self.temperature.pcontroller.temp_setpoint
+        if not self.run_until(
+            lambda: abs(self.plant.water_temp - setpoint) < tolerance, timeout
+        ):
+            raise TimeoutError(f"not at {setpoint} °C after {timeout} s")
+        return self.clock.now() - started
+
+    def brew(self, timeout: float = 90.0) -> Tuple[float, float]:
+        """Pull a shot with the brew routine; returns (shot seconds, grams)."""
+        self.scale.tare()
+        ok, error = self.pump.brew_shot()
+        if not ok:
+            raise RuntimeError(f"brew refused: {error}")
+        if not self.run_until(lambda: not self.pump.pump_thread.is_alive(), timeout):
+            raise TimeoutError(f"shot still running after {timeout} s")
+        return (
+            self.brewing_timer.get_time_since_started(),
+            self.scale.get_scale_weight(),
+        )
+
+    def steam(self, seconds: float) -> None:
+        """Run the steam routine for ``seconds``, then stop it.
+
+        The routine only pulses a pump that is already on, so the pump is
+        turned on first, as with the pump button."""
+        if not self.pump.pumping:
+            self.pump.toggle_pump()
+        ok, error = self.pump.pulse_pump_steam()
+        if not ok:
+            raise RuntimeError(f"steam refused: {error}")
+        self.run_for(seconds)
+        if self.pump.pump_thread.is_alive():
+            self.pump.stop_pump()
+            self.run_until(lambda: not self.pump.pump_thread.is_alive(), 5.0)
+
+    def trace(self, every: float = 1.0) -> Callable[[], List[Dict[str, Any]]]:
+        """Record the plant and controller every ``every`` seconds from now
+        on; call the returned function for the rows so far."""
+        rows: List[Dict[str, Any]] = []
+
+        def sample() -> None:
+            rows.append(
+                {
+                    "t": self.clock.now(),
+                    "water": self.plant.water_temp,
+                    "sensor": self.plant.sensor_temp,
+                    "heater": self.heater,
+                    "flow": self.flow_ml_s,
+                    "setpoint": self.temperature.pcontroller.temp_setpoint,
+                }
+            )
+
+        self.clock.call_every(every, sample, first=self.clock.now())
+        return lambda: rows
+
+
+def _queue(low: int, high: int, name: str, **kwargs: Any) -> WaveQueue:
+    # same ranges as the app's queues
+    return WaveQueue(
+        low,
+        high,
+        X_MIN=getattr(config, f"{name}_X_MIN"),
+        X_MAX=getattr(config, f"{name}_X_MAX"),
+        Y_MIN=getattr(config, f"{name}_Y_MIN"),
+        Y_MAX=getattr(config, f"{name}_Y_MAX"),
+        **kwargs,
+    )
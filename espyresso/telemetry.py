@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Process-wide telemetry block in shared memory.
+
+Every subsystem writes its latest state here once per event: the flow
+meter per pulse, the ranger per reading, the scale per notification, the
+boiler, pump and brewing timer when they change. Consumers (the display
+process, a remote API) read all of it with one copy of the block instead of
+calling into every object, and always get values from a single moment.
+
+The block has a fixed layout: a sequence counter followed by one float64
+per field of ``Snapshot``. It is guarded as a seqlock: a writer makes the
+counter odd while writing and even again after, and a reader retries until
+it copied the block between two reads of the same even count. Writers in
+the owning process take a lock, as the producers run on different threads.
+The Pi Zero has a single core, so plain stores are enough for the
+ordering.
+
+Times are ``clock.now()`` values and 0.0 stands for "not set", as the
+``started``/``stopped`` attributes do. Values that depend on the current
+time are derived by the reader from a ``Snapshot``.
+
+``changed`` is set on every update and by the wave queues, so the display
+loop (or the display process's publisher, whichever renders in this
+process) can sleep until there is something new to show.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Any, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from espyresso import config
+
+# the uint32 sequence counter, padded to keep the values aligned
+HEADER_SIZE = 8
+
+
+class SeqlockBlock:
+    """A ``size`` byte shared memory block starting with the sequence
+    counter; created when ``name`` is None, attached to otherwise.
+
+    The creating process unlinks it. A spawned child shares its parent's
+    resource tracker, so attaching doesn't register the block a second
+    time."""
+
+    def __init__(self, size: int, name: Optional[str] = None) -> None:
+        self.size = size
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.seq: "np.ndarray[Any, Any]" = np.ndarray((1,), np.uint32, self.shm.buf, 0)
+        if create:
+            self.seq[0] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def version(self) -> int:
+        """Number of completed writes."""
+        return int(self.seq[0]) // 2
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        """Write the block; writers must not overlap."""
+        seq = self.seq
+        seq[0] += 1
+        try:
+            yield
+        finally:
+            seq[0] += 1
+
+    def read_into(self, local: "np.ndarray[Any, Any]", attempts: int = 100) -> bool:
+        """Copy a consistent block into ``local`` (uint8, ``size`` long);
+        False if every attempt overlapped a write, leaving it as it was."""
+        seq = self.seq
+        source = np.frombuffer(self.shm.buf, np.uint8, self.size)
+        scratch = np.empty_like(local)
+        for _ in range(attempts):
+            before = int(seq[0])
+            if before & 1:
+                time.sleep(0)
+                continue
+            scratch[:] = source
+            if int(seq[0]) == before:
+                local[:] = scratch
+                return True
+        return False
+
+    def _release(self) -> None:
+        """Drop the views of the buffer, which ``close`` requires."""
+        del self.seq
+
+    def close(self, unlink: bool = False) -> None:
+        self._release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class Snapshot(NamedTuple):
+    """One consistent read of the block."""
+
+    started_time: float = 0.0
+    boiling: float = 0.0
+    boiler_pwm: float = 0.0
+    water: float = 0.0
+    brew_started: float = 0.0
+    brew_stopped: float = 0.0
+    pumping: float = 0.0
+    # a pump routine (brew, steam, pulse) is running
+    pump_active: float = 0.0
+    preinfuse_started: float = 0.0
+    preinfuse_stopped: float = 0.0
+    flow_ml: float = 0.0
+    flow_rate: float = 0.0
+    flow_pulses: float = 0.0
+    flow_pulse_time: float = 0.0
+    scale_g: float = 0.0
+    scale_time: float = 0.0
+
+    def brew_seconds(self, now: float) -> float:
+        """As ``BrewingTimer.get_time_since_started``."""
+        if self.brew_stopped and self.brew_started:
+            return self.brew_stopped - self.brew_started
+        if self.brew_started:
+            return now - self.brew_started
+        return 0.0
+
+    def preinfuse_seconds(self, now: float) -> float:
+        """As ``Pump.get_time_since_started_preinfuse``."""
+        if self.preinfuse_stopped and self.preinfuse_started:
+            return self.preinfuse_stopped - self.preinfuse_started
+        if self.preinfuse_started and self.pumping:
+            return now - self.preinfuse_started
+        return 0.0
+
+    def scale_weight(self, now: float) -> float:
+        """As ``BluetoothScale.get_scale_weight``: 0 once the scale has
+        been quiet for 5 seconds."""
+        if now - self.scale_time > 5:
+            return 0.0
+        return self.scale_g
+
+    def current_flow_rate(self, now: float) -> float:
+        """Flow rate at the last pulse; 0 once pulses stopped for
+        ``FLOW_START_GAP``."""
+        if not self.flow_pulse_time or now - self.flow_pulse_time > (
+            config.FLOW_START_GAP
+        ):
+            return 0.0
+        return self.flow_rate
+
+
+FIELDS = Snapshot._fields
+INDEX = {name: i for i, name in enumerate(FIELDS)}
+SIZE = HEADER_SIZE + 8 * len(FIELDS)
+
+
+class Telemetry(SeqlockBlock):
+    def __init__(self, name: Optional[str] = None) -> None:
+        super().__init__(SIZE, name)
+        self.values: "np.ndarray[Any, Any]" = np.ndarray(
+            (len(FIELDS),), np.float64, self.shm.buf, HEADER_SIZE
+        )
+        self._lock = threading.Lock()
+
+    def update(self, **values: float) -> None:
+        """Set the given fields as one write."""
+        slots = [(INDEX[name], float(value)) for name, value in values.items()]
+        with self._lock, self.writing():
+            for i, value in slots:
+                self.values[i] = value
+
+    def read(self) -> Optional[Snapshot]:
+        """A consistent copy of every field, None if writes kept
+        overlapping the copy."""
+        local = np.empty(self.size, np.uint8)
+        if not self.read_into(local):
+            return None
+        return Snapshot(*np.frombuffer(local, np.float64, offset=HEADER_SIZE).tolist())
+
+    def _release(self) -> None:
+        del self.values
+        super()._release()
+
+    def unlink(self) -> None:
+        """Remove the block's name. Threads that may still write keep the
+        mapping, which goes with the process."""
+        self.shm.unlink()
+
+
+_INSTANCE: Optional[Telemetry] = None
+# Something the display shows has changed; its single consumer clears it
+changed = threading.Event()
+
+
+def init() -> Telemetry:
+    global _INSTANCE
+    _INSTANCE = Telemetry()
+    return _INSTANCE
+
+
+def get() -> Optional[Telemetry]:
+    return _INSTANCE
+
+
+def update(**values: float) -> None:
+    """Set fields of the process-wide block, if there is one."""
+    instance = _INSTANCE
+    if instance is not None:
+        instance.update(**values)
+    notify()
+
+
+def notify() -> None:
+    """Signal a change that isn't in the block, like a new wave sample."""
+    # set() takes the event's lock even when it is already set, and the
+    # producers call this many times per frame. The consumer clears the
+    # event before it reads, so a skipped set never hides a change.
+    if not changed.is_set():
+        changed.set()
+
+
+def shutdown() -> None:
+    """Stop publishing and unlink the process-wide block."""
+    global _INSTANCE
+    instance, _INSTANCE = _INSTANCE, None
+    if instance is not None:
+        instance.unlink()
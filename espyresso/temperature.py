@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
 import logging
-import time
-from typing import TYPE_CHECKING, Any, Callable
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
-from espyresso import config, shot_logger
+from espyresso import config, metrics, shot_logger
+from espyresso.clock import SYSTEM_CLOCK, Clock
+from espyresso.control_loop import ControlLoop, Mailbox
 from espyresso.pcontroller import PController
 
 # from espyresso.pid import PID
@@ -30,14 +31,19 @@ class Temperature:
         flow: "Flow",
         get_started_time: Callable[[], float],
         temp_queue: "WaveQueue",
+        clock: Clock = SYSTEM_CLOCK,
+        tsic: Optional[Any] = None,
         **kwargs: Any,
     ) -> None:
         self.get_started_time = get_started_time
 
         self.boiler = boiler
         self.flow = flow
+        self.clock = clock
 
-        self.tsic = TsicInputChannel(
+        # ``tsic`` replaces the sensor in simulations; it needs
+        # measure_once, start and stop.
+        self.tsic: TsicInputChannel = tsic or TsicInputChannel(
             pigpio_pi=pigpio_pi, gpio=config.TSIC_GPIO
         )  # type: ignore
 
@@ -45,11 +51,9 @@ class Temperature:
         # self.pid.set_pid_gains(config.KP, config.KI, config.KD)
         # self.pid.set_integrator_limits(config.IMIN, config.IMAX)
 
-        initial_temperature = self.tsic.measure_once(
-            timeout=5
-        ).degree_celsius  # type: ignore
+        initial_temperature = self.tsic.measure_once(timeout=5).degree_celsius
 
-        self.prev_timestamp = time.perf_counter()
+        self.prev_timestamp = self.clock.now()
         logger.info("initial TSIC reading on GPIO %s = %s", config.TSIC_GPIO, initial_temperature)
 
         if not initial_temperature:
@@ -57,11 +61,20 @@ class Temperature:
         self.pcontroller = PController(
             initial_temperature=initial_temperature,
             flow=self.flow,
+            clock=self.clock,
         )
+        self.flow.add_listener(self.pcontroller.on_flow_event)
+        self.mailbox: Mailbox[Measurement] = Mailbox()
+        self.control_loop = ControlLoop(
+            self.mailbox, self.control_step, config.CONTROL_PERIOD
+        )
+        self.tsic_lost = False
+        self.tsic_queue_time = metrics.histogram("tsic_queue")
+        self.tsic_to_pwm_time = metrics.histogram("tsic_to_pwm")
         self.temp_queue = temp_queue
-        # Labels map 1:1 to the tuple PController.update returns. The
-        # last entry (raw sensor reading) is the hero in the header strip
-        # and isn't shown in the diagnostic legend.
+        # Labels map 1:1 to ControllerState.masses(). The last entry (raw
+        # sensor reading) is the hero in the header strip and isn't shown
+        # in the diagnostic legend.
         self.temp_queue.set_labels(
             [
                 "shell",
@@ -89,7 +102,7 @@ class Temperature:
             sl.log_event("setpoint", target=config.TARGET_TEMP, mode="brew")
 
     def get_latest_brewhead_temperature(self) -> float:
-        return self.pcontroller.brewHeadTemp
+        return float(self.pcontroller.state.brewHeadTemp)
 
     def update_boiler_value(self, pid_value: float) -> None:
 
@@ -99,60 +112,69 @@ class Temperature:
 
     def start(self) -> None:
         self.tsic.start(callback=self.callback)  # type: ignore
+        self.control_loop.start()
 
     def callback(self, measurement: Measurement) -> None:
+        # TSIC decoder thread: hand over and get back to decoding.
+        self.mailbox.put(measurement)
+
+    def control_step(self, measurement: Measurement, fresh: bool) -> None:
+        """One controller tick on the control-loop thread. ``measurement``
+        is the newest reading; between readings it is reused (``fresh`` is
+        False) so the model keeps stepping at the control rate."""
+        now = self.clock.now()
         if (
-            time.perf_counter() - self.get_started_time() > config.TURN_OFF_SECONDS
+            now - self.get_started_time() > config.TURN_OFF_SECONDS
             and self.boiler.get_boiling()
         ):
             # Turn off boiler after 10 minutes
             self.boiler.turn_off_boiler()
 
         if (
-            self.prev_timestamp == measurement.seconds_since_epoch
-            or measurement.degree_celsius is None
+            measurement.degree_celsius is None
             or measurement.seconds_since_epoch is None
+            or now - measurement.seconds_since_epoch > config.TSIC_STALE_SECONDS
         ):
-            logger.warning(
-                "Undefined or no new temperature measurement: %s, %s",
-                self.prev_timestamp, measurement,
-            )
-            sl = shot_logger.get()
-            if sl is not None:
-                sl.log_event("tsic_drop", repr=str(measurement))
+            # Hold the heater where it is, like a missed TSIC callback did,
+            # and report the drop once rather than every tick.
+            if not self.tsic_lost:
+                self.tsic_lost = True
+                logger.warning(
+                    "Undefined or no new temperature measurement: %s, %s",
+                    self.prev_timestamp,
+                    measurement,
+                )
+                sl = shot_logger.get()
+                if sl is not None:
+                    sl.log_event("tsic_drop", repr=str(measurement))
             return
+        self.tsic_lost = False
 
         self.prev_timestamp = measurement.seconds_since_epoch
+        if fresh:
+            # TSIC timestamps come from the same clock.
+            self.tsic_queue_time.record(now - self.prev_timestamp)
 
         temp = measurement.degree_celsius
-        heater_value, temp_tuple = self.pcontroller.update(
+        heater_value = self.pcontroller.update(
             temperature=temp, boiling=self.boiler.get_boiling()
         )
         self.update_boiler_value(heater_value)
+        if fresh:
+            self.tsic_to_pwm_time.record(self.clock.now() - self.prev_timestamp)
 
-        if config.LOG_POWER:
+        if config.LOG_POWER and fresh:
             self.log_power(temp, self.prev_timestamp, heater_value)
 
+        state = self.pcontroller.state
         sl = shot_logger.get()
         if sl is not None:
-            sl.log_tick(
-                raw_temp=temp,
-                heater=heater_value,
-                boiling=self.boiler.get_boiling(),
-                pwm_override=self.boiler.pwm_override,
-                setpoint=self.pcontroller.temp_setpoint,
-                shellTemp=temp_tuple[0],
-                elementTemp=temp_tuple[1],
-                waterTemp=temp_tuple[2],
-                bodyTemp=temp_tuple[3],
-                brewHeadTemp=temp_tuple[4],
-                modeledSensorTemp=temp_tuple[5],
-                **self.pcontroller.diagnostics,
-            )
-
-        # deque.append is GIL-atomic; no explicit lock needed for a
-        # single-producer, single-consumer rolling buffer.
-        self.temp_queue.add_to_queue(temp_tuple)
+            state.pwm_override = self.boiler.pwm_override
+            sl.log_tick(state)
+
+        # Single producer: WaveQueue writes outside the window it publishes,
+        # so the display thread needs no lock to read it.
+        self.temp_queue.add_to_queue(state.masses())
 
         # Lazy %s: the formatting (and the round() / repr) only runs when
         # DEBUG logging is actually enabled.
@@ -164,6 +186,14 @@ class Temperature:
 
     def stop(self) -> None:
         logger.debug("temperature_thread stopping")
+        self.control_loop.stop()
+        if self.control_loop.is_alive():
+            self.control_loop.join(timeout=1.0)
+        stats = self.control_loop.stats()
+        logger.info("control loop: %s", stats)
+        sl = shot_logger.get()
+        if sl is not None:
+            sl.log_event("control_loop", **stats)
         self.boiler.set_value(0)
         self.tsic.stop()  # type: ignore
         logger.debug("temperature_thread stopped")
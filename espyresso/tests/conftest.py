@@ -7,12 +7,28 @@ pygame. Tests that don't touch pygame are unaffected.
 
 pigpio is already mocked in ``espyresso.config`` whenever DEBUG is true
 (i.e. on macOS), so we don't need to handle it here.
+
+Every test gets an empty feed-forward profile file of its own.
 """
 
 from __future__ import annotations
 
 import sys
+from pathlib import Path
 from unittest.mock import MagicMock
 
+import pytest
+
 if "pygame" not in sys.modules:
     sys.modules["pygame"] = MagicMock()
+
+
+@pytest.fixture(autouse=True)
+def _no_profiles(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep the learned feed-forward profile of this checkout out of the
+    tests, and the tests' shots out of it."""
+    from espyresso import config
+
+    monkeypatch.setattr(
+        config, "FEED_FORWARD_PROFILE_FILE", str(tmp_path / "feed_forward.json")
+    )
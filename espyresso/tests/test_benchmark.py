@@ -0,0 +1,44 @@
+import math
+
+import pytest
+
+from espyresso import benchmark
+
+
+def test_compare_flags_only_scores_beyond_tolerance() -> None:
+    base = {"warm_up_s": 100.0, "iae_cs": 50.0, "droop_c": 2.0, "update_us": 20.0}
+    current = {"warm_up_s": 100.5, "iae_cs": 60.0, "droop_c": 1.0, "update_us": 40.0}
+    regressions = benchmark.compare(current, base)
+    assert [line.split(":")[0] for line in regressions] == ["iae_cs", "update_us"]
+
+
+def test_compare_treats_an_unreached_warm_up_as_a_regression() -> None:
+    assert benchmark.compare({"warm_up_s": math.nan}, {"warm_up_s": 120.0})
+    assert not benchmark.compare({"warm_up_s": 120.0}, {"warm_up_s": math.nan})
+
+
+def test_back_to_back_scores_are_deterministic() -> None:
+    a = benchmark.run_scenario("back_to_back")
+    b = benchmark.run_scenario("back_to_back")
+    assert a["shots"] == 3
+    assert 60 < a["warm_up_s"] < 400
+    assert a["droop_c"] > 0
+    assert a["update_us"] > 0
+    for name in ("warm_up_s", "overshoot_c", "iae_cs", "clip_s", "droop_c"):
+        assert a[name] == b[name]
+    assert not benchmark.compare(b, a, {"iae_cs": (0.0, 0.0)})
+
+
+@pytest.mark.parametrize("name", sorted(set(benchmark.SCENARIOS) - {"back_to_back"}))
+def test_scenarios_run_to_the_end(name: str) -> None:
+    result = benchmark.run_scenario(name)
+    assert result["sim_s"] > 500
+    assert not math.isnan(result["warm_up_s"])
+
+
+def test_steam_heat_is_not_scored_as_overshoot() -> None:
+    result = benchmark.run_scenario("steam_then_brew")
+    # the water comes back from ~125 °C after steaming
+    assert result["overshoot_c"] < 0.5
+    assert result["shots"] == 1
+    assert result["droop_c"] > 0
@@ -0,0 +1,100 @@
+"""``tools/calibrate_mpc.py`` on a synthetic trace made with known model
+constants: the scoring is zero there, and the search finds its way back
+to them from a perturbed start."""
+import csv
+import math
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from espyresso import config  # noqa: E402
+from espyresso.pcontroller import init_model, model_params  # noqa: E402
+from espyresso.pcontroller_batch import STATE_COLUMNS, replay_ticks  # noqa: E402
+from tools import calibrate_mpc  # noqa: E402
+
+TRUE = {
+    "SENSOR_XFER_COEFF": config.SENSOR_XFER_COEFF,
+    "ELEMENT_SHELL_XFER_COEFF": config.ELEMENT_SHELL_XFER_COEFF,
+}
+START = {
+    "SENSOR_XFER_COEFF": TRUE["SENSOR_XFER_COEFF"] * 1.6,
+    "ELEMENT_SHELL_XFER_COEFF": TRUE["ELEMENT_SHELL_XFER_COEFF"] * 0.7,
+}
+
+
+def _trace(n: int = 400) -> Dict[str, Any]:
+    """Warm-up at full power, then on/off pulses; ``raw_temp`` is what the
+    model with ``TRUE`` predicts, with no sensor correction."""
+    seed = SimpleNamespace()
+    init_model(seed, 22.0)
+    power = [
+        config.MAX_BOILER_POWER if i < 200 or (i // 50) % 2 else 0.0 for i in range(n)
+    ]
+    trace: Dict[str, Any] = {
+        "t": np.arange(n) * 0.1,
+        "raw_temp": np.full(n, 22.0),
+        "deltaTime": np.full(n, 0.1),
+        "flow_rate": np.zeros(n),
+        "boiling": np.ones(n),
+        "setpoint": np.full(n, config.TARGET_TEMP),
+        "heaterPower_W": np.array(power),
+        "ambientTemp": np.full(n, seed.ambientTemp),
+    }
+    for name in STATE_COLUMNS:
+        trace[name] = np.full(n, float(getattr(seed, name)))
+    _, out = replay_ticks([trace], p=model_params(MPC_SMOOTHING=0.0, **TRUE))
+    for name in STATE_COLUMNS:
+        trace[name][1:] = out[name][:, 0]
+    trace["raw_temp"] = trace["modeledSensorTemp"].copy()
+    return trace
+
+
+def _write(trace: Dict[str, Any], path: Path) -> str:
+    columns: List[str] = list(trace)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(len(trace["t"])):
+            writer.writerow([repr(float(trace[name][i])) for name in columns])
+    return str(path)
+
+
+def test_trace_warms_up() -> None:
+    trace = _trace()
+    assert trace["raw_temp"][-1] > 50.0
+
+
+def test_score_is_zero_at_the_generating_constants(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(calibrate_mpc, "_TRACES", [_trace()])
+    assert calibrate_mpc.score(TRUE) == pytest.approx(0.0, abs=1e-9)
+    assert calibrate_mpc.score(START) > 0.1
+
+
+def test_fit_moves_towards_the_generating_constants(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    path = _write(_trace(), tmp_path / "shot-20260101-070000-tick.csv")
+    monkeypatch.setattr(config, "MPC_PROFILE_FILE", str(tmp_path / "none.json"))
+    for name, value in START.items():
+        monkeypatch.setattr(config, name, value)
+
+    best, start_score, best_score = calibrate_mpc.fit(
+        [path],
+        list(START),
+        span=3.0,
+        initial_step=0.25,
+        tolerance=0.02,
+        max_rounds=60,
+        workers=2,
+    )
+
+    assert best_score < start_score / 10
+    for name, true in TRUE.items():
+        assert abs(math.log(best[name] / true)) < abs(math.log(START[name] / true))
+        assert best[name] == pytest.approx(true, rel=0.1)
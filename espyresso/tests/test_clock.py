@@ -0,0 +1,58 @@
+from typing import List, Tuple
+
+import pytest
+
+from espyresso.clock import SimulatedClock
+
+
+def test_timers_run_in_time_order() -> None:
+    clock = SimulatedClock()
+    calls: List[Tuple[str, float]] = []
+    clock.call_every(0.5, lambda: calls.append(("every", clock.now())))
+    clock.call_at(0.75, lambda: calls.append(("at", clock.now())))
+
+    clock.run_until(1.6)
+    assert calls == [("every", 0.5), ("at", 0.75), ("every", 1.0), ("every", 1.5)]
+    assert clock.now() == 1.6
+
+
+def test_threads_run_in_lock_step() -> None:
+    clock = SimulatedClock()
+    seen: List[Tuple[str, float]] = []
+
+    def worker(name: str, period: float) -> None:
+        for _ in range(3):
+            seen.append((name, clock.now()))
+            clock.sleep(period)
+
+    clock.start_thread(lambda: worker("a", 1.0), "a")
+    clock.start_thread(lambda: worker("b", 1.5), "b")
+    clock.call_at(2.0, lambda: seen.append(("timer", clock.now())))
+    clock.advance(10.0)
+
+    assert seen == [
+        ("a", 0.0),
+        ("b", 0.0),
+        ("a", 1.0),
+        ("b", 1.5),
+        ("timer", 2.0),
+        ("a", 2.0),
+        ("b", 3.0),
+    ]
+
+
+def test_thread_errors_reach_the_driver() -> None:
+    clock = SimulatedClock()
+
+    def worker() -> None:
+        clock.sleep(1.0)
+        raise ValueError("boom")
+
+    clock.start_thread(worker, "worker")
+    with pytest.raises(ValueError, match="boom"):
+        clock.advance(2.0)
+
+
+def test_sleep_outside_a_simulated_thread_is_refused() -> None:
+    with pytest.raises(RuntimeError):
+        SimulatedClock().sleep(1.0)
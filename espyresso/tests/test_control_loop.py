@@ -0,0 +1,73 @@
+"""Tests for ``espyresso.control_loop``."""
+
+from __future__ import annotations
+
+import time
+from typing import List, Tuple
+
+from espyresso.control_loop import ControlLoop, Mailbox
+
+
+def test_mailbox_take_returns_each_value_once() -> None:
+    box: Mailbox[int] = Mailbox()
+    assert box.take() is None
+    box.put(1)
+    assert box.take() == 1
+    assert box.take() is None
+    assert box.peek() == 1
+
+
+def test_mailbox_counts_overwritten_values() -> None:
+    box: Mailbox[int] = Mailbox()
+    for value in range(5):
+        box.put(value)
+    assert box.take() == 4
+    assert box.missed == 4
+
+
+def _run(loop: ControlLoop, seconds: float) -> None:
+    loop.start()
+    time.sleep(seconds)
+    loop.stop()
+    loop.join(timeout=1.0)
+    assert not loop.is_alive()
+
+
+def test_control_loop_holds_last_value_between_samples() -> None:
+    box: Mailbox[float] = Mailbox()
+    calls: List[Tuple[float, bool]] = []
+    loop = ControlLoop(box, lambda v, fresh: calls.append((v, fresh)), 0.01)
+    box.put(21.5)
+    _run(loop, 0.1)
+
+    assert calls[0] == (21.5, True)
+    assert all(call == (21.5, False) for call in calls[1:])
+    assert len(calls) >= 5
+    stats = loop.stats()
+    assert stats["ticks"] == len(calls)
+    assert stats["stale_ticks"] == len(calls) - 1
+
+
+def test_control_loop_waits_for_first_value() -> None:
+    box: Mailbox[float] = Mailbox()
+    calls: List[float] = []
+    loop = ControlLoop(box, lambda v, fresh: calls.append(v), 0.01)
+    _run(loop, 0.05)
+    assert calls == []
+
+
+def test_control_loop_survives_step_errors_and_counts_overruns() -> None:
+    box: Mailbox[int] = Mailbox()
+    calls: List[int] = []
+
+    def step(value: int, fresh: bool) -> None:
+        calls.append(value)
+        if len(calls) == 1:
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+
+    loop = ControlLoop(box, step, 0.01)
+    box.put(1)
+    _run(loop, 0.1)
+    assert len(calls) > 1
+    assert loop.overruns >= 1
@@ -14,14 +14,20 @@ cover:
 
 from __future__ import annotations
 
+import threading
+import time
+from typing import TYPE_CHECKING, Any, List, Tuple
 from unittest.mock import MagicMock, Mock
 
 import pytest
 
 from espyresso import config
-from espyresso.display import Display, _RENDER_CACHE_MAX
+from espyresso.display import Display, _AXIS_CACHE_MAX, _RENDER_CACHE_MAX
 from espyresso.utils import WaveQueue
 
+if TYPE_CHECKING:
+    import pygame
+
 
 def make_display() -> Display:
     """Make a Display with mocks wired so f-string formatting works.
@@ -164,17 +170,17 @@ def _make_temp_queue() -> WaveQueue:
     return q
 
 
-def _spy_render(display: Display) -> list:
+def _spy_render(display: Display) -> List[Tuple[str, Any]]:
     """Replace display._render with a spy and return the list it
     accumulates ``(text, color)`` tuples into."""
-    rendered: list = []
+    rendered: List[Tuple[str, Any]] = []
     original = display._render
 
     def spy(text, size, color):  # type: ignore[no-untyped-def]
         rendered.append((text, color))
         return original(text, size, color)
 
-    display._render = spy  # type: ignore[assignment]
+    display._render = spy  # type: ignore[method-assign]
     return rendered
 
 
@@ -230,11 +236,11 @@ def test_temp_legend_skips_redraw_when_values_unchanged(display: Display) -> Non
     q.set_labels(["shell", "elem", "water", "body", "head", "model"])
     q.add_to_queue((28.0, 50.5, 24.7, 22.7, 22.7, 23.8))
 
-    dirty1: list = []
+    dirty1: List[pygame.Rect] = []
     display._redraw_temp_legend(dirty1)
     assert len(dirty1) == 1, "first frame must be dirty"
 
-    dirty2: list = []
+    dirty2: List[pygame.Rect] = []
     display._redraw_temp_legend(dirty2)
     assert dirty2 == [], "no value changed → no dirty rect"
 
@@ -286,3 +292,126 @@ def test_render_frame_skips_unchanged_zones(display: Display) -> None:
     # zones should be skipped. At most the header (countdown) can be
     # dirty if a second elapsed; we just assert it's strictly fewer.
     assert len(dirty) < 8, "second frame should not redraw every zone"
+
+
+# ----------------------- axis layer cache ------------------------------ #
+
+
+class _Rect:
+    def __init__(self, x: int, y: int, w: int, h: int) -> None:
+        self.x, self.y, self.size = x, y, (w, h)
+
+
+@pytest.fixture
+def zone(monkeypatch: pytest.MonkeyPatch) -> pygame.Rect:
+    """The temp wave's zone, with ``pygame.Rect`` swapped for ``_Rect``."""
+    import pygame  # mocked in conftest
+
+    monkeypatch.setattr(pygame, "Rect", _Rect)
+    return pygame.Rect(*config.LAYOUT_TEMP_WAVE)
+
+
+def test_axis_layer_composed_once_per_range(
+    display: Display, zone: pygame.Rect
+) -> None:
+    q = _make_temp_queue()
+    calls: List[Any] = []
+    original = display.draw_y_axis
+
+    def spy(*args, **kwargs):  # type: ignore[no-untyped-def]
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    display.draw_y_axis = spy  # type: ignore[method-assign]
+    display._axis_layer("temp", zone, q, 90, 100)
+    display._axis_layer("temp", zone, q, 90, 100)
+    assert len(calls) == 1
+    assert list(display._axis_cache) == [("temp", 90, 100, 10, config.TARGET_TEMP)]
+
+    display._axis_layer("temp", zone, q, 90, 105)
+    assert len(calls) == 2
+    # drawn at the layer's origin, not the screen's
+    x_min, x_max, y_min, y_max = calls[0][:4]
+    assert (x_min, y_min) == (q.X_MIN - zone.x, q.Y_MIN - zone.y)
+    assert (x_max, y_max) == (q.X_MAX - zone.x, q.Y_MAX - zone.y)
+
+
+def test_axis_layer_cache_evicts_lru(display: Display, zone: pygame.Rect) -> None:
+    q = _make_temp_queue()
+    display._axis_layer("temp", zone, q, 0, 10)
+    for high in range(11, 11 + _AXIS_CACHE_MAX):
+        display._axis_layer("temp", zone, q, 0, high)
+        display._axis_layer("temp", zone, q, 0, 10)
+    assert len(display._axis_cache) == _AXIS_CACHE_MAX
+    assert ("temp", 0, 10, 10, config.TARGET_TEMP) in display._axis_cache
+    assert ("temp", 0, 11, 10, config.TARGET_TEMP) not in display._axis_cache
+
+
+# ----------------------- adaptive frame rate -------------------------- #
+
+
+@pytest.fixture
+def pacing(display: Display, monkeypatch: pytest.MonkeyPatch) -> Display:
+    import pygame  # mocked in conftest
+
+    monkeypatch.setattr(pygame.event, "peek", lambda types: False)
+    display.fps, display.idle_fps = 50.0, 5.0
+    display.changed = threading.Event()
+    return display
+
+
+def _waited(display: Display) -> float:
+    started = time.perf_counter()
+    display._wait_for_next_frame(started)
+    return time.perf_counter() - started
+
+
+def test_idle_frames_come_at_the_idle_rate(pacing: Display) -> None:
+    pacing.pump.is_active.return_value = False  # type: ignore[attr-defined]
+    pacing.changed.set()
+    # a change doesn't make an idle frame come early
+    assert _waited(pacing) >= 0.2
+    assert not pacing.changed.is_set()
+
+    # nor does nothing changing hold it back
+    assert 0.2 <= _waited(pacing) < 0.5
+
+
+def test_active_frames_follow_the_changes(pacing: Display) -> None:
+    pacing.pump.is_active.return_value = True  # type: ignore[attr-defined]
+    timer = threading.Timer(0.05, pacing.changed.set)
+    timer.start()
+    waited = _waited(pacing)
+    timer.join()
+    assert 0.04 <= waited < 0.15
+
+    pacing.changed.set()
+    assert 0.02 <= _waited(pacing) < 0.1, "capped at fps"
+
+
+def test_touch_cuts_the_wait_short(
+    pacing: Display, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import pygame  # mocked in conftest
+
+    pacing.pump.is_active.return_value = False  # type: ignore[attr-defined]
+    monkeypatch.setattr(pygame.event, "peek", lambda types: True)
+    assert _waited(pacing) < 0.05
+
+
+def test_headless_frames_stay_off_screen(monkeypatch: pytest.MonkeyPatch) -> None:
+    import os
+
+    import pygame  # mocked in conftest
+
+    monkeypatch.setattr(config, "DISPLAY_BACKEND", "headless")
+    # restored after the test, as Display sets it
+    monkeypatch.delenv("SDL_VIDEODRIVER", raising=False)
+    update = Mock()
+    monkeypatch.setattr(pygame.display, "update", update)
+
+    display = make_display()
+    assert os.environ["SDL_VIDEODRIVER"] == "dummy"
+    assert display.framebuffer is None
+    display._flush(display._render_frame())
+    update.assert_not_called()
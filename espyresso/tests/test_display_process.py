@@ -0,0 +1,179 @@
+import threading
+import time
+from multiprocessing import Pipe
+from typing import Dict, Iterator
+from unittest.mock import MagicMock
+
+import pytest
+
+from espyresso import config
+from espyresso.display_process import (
+    ButtonRelay,
+    Publisher,
+    SharedSnapshot,
+    SnapshotView,
+    WaveSpec,
+    relay_buttons,
+)
+from espyresso.telemetry import Telemetry
+from espyresso.utils import WaveQueue
+
+
+def _queues() -> Dict[str, WaveQueue]:
+    temp = WaveQueue(
+        90,
+        100,
+        X_MIN=config.TEMP_X_MIN,
+        X_MAX=config.TEMP_X_MAX,
+        Y_MIN=config.TEMP_Y_MIN,
+        Y_MAX=config.TEMP_Y_MAX,
+        target_y=config.TARGET_TEMP,
+    )
+    temp.set_labels(["shell", "elem", "water", "body", "head", "model", "tp"])
+    flow = WaveQueue(
+        0,
+        3,
+        X_MIN=config.FLOW_X_MIN,
+        X_MAX=config.FLOW_X_MAX,
+        Y_MIN=config.FLOW_Y_MIN,
+        Y_MAX=config.FLOW_Y_MAX,
+        steps=5,
+    )
+    return {"temp": temp, "flow": flow}
+
+
+@pytest.fixture
+def queues() -> Dict[str, WaveQueue]:
+    return _queues()
+
+
+@pytest.fixture
+def snapshot(queues: Dict[str, WaveQueue]) -> Iterator[SharedSnapshot]:
+    snapshot = SharedSnapshot({name: WaveSpec.of(q) for name, q in queues.items()})
+    yield snapshot
+    snapshot.close(unlink=True)
+
+
+@pytest.fixture
+def state() -> Iterator[Telemetry]:
+    state = Telemetry()
+    now = time.perf_counter()
+    state.update(
+        started_time=1234.5,
+        boiling=True,
+        boiler_pwm=0.456,
+        water=63.0,
+        brew_started=now - 16.5,
+        brew_stopped=now - 4.0,
+        pumping=False,
+        preinfuse_started=now - 20.5,
+        preinfuse_stopped=now - 16.5,
+        flow_ml=30.2,
+        flow_rate=1.5,
+        flow_pulse_time=now - 10.0,
+        scale_g=18.4,
+        scale_time=now,
+    )
+    yield state
+    state.close(unlink=True)
+
+
+def test_view_serves_published_values(
+    queues: Dict[str, WaveQueue], snapshot: SharedSnapshot, state: Telemetry
+) -> None:
+    Publisher(snapshot, wave_queues=queues, fps=20).publish()
+
+    attached = SharedSnapshot(snapshot.waves, name=snapshot.name)
+    attached_state = Telemetry(name=state.name)
+    try:
+        view = SnapshotView(attached, attached_state)
+        assert view.refresh()
+        assert view.get_started_time() == 1234.5
+        assert view.get_boiling() is True
+        assert view.get_current_distance() == 63.0
+        assert view.get_time_since_started() == pytest.approx(12.5)
+        assert view.get_time_since_started_preinfuse() == pytest.approx(4.0)
+        assert view.get_millilitres() == 30.2
+        assert view.get_flow_rate() == 0.0, "no pulse for 10 s"
+        assert view.get_scale_weight() == 18.4
+        assert view.pwm.get_display_value() == "45.6"
+        assert len(view.waves["temp"]) == 0
+        assert view.waves["temp"].queue_labels[-1] == "tp"
+    finally:
+        attached.close()
+        attached_state.close()
+
+
+def test_wave_mirror_follows_the_queue(
+    queues: Dict[str, WaveQueue], snapshot: SharedSnapshot, state: Telemetry
+) -> None:
+    publisher = Publisher(snapshot, wave_queues=queues, fps=20)
+    view = SnapshotView(snapshot, state)
+    temp, mirror = queues["temp"], view.waves["temp"]
+
+    for i in range(temp.capacity + 5):
+        temp.add_to_queue((80.0 + i * 0.5,) * 7)
+    publisher.publish()
+    view.refresh()
+    assert list(mirror) == list(temp)
+    assert (mirror.low, mirror.high) == (temp.low, temp.high)
+    assert mirror.target_y == config.TARGET_TEMP
+    assert mirror.snapshot()[0] == temp.snapshot()[0]
+
+    version = mirror.version
+    publisher.publish()
+    view.refresh()
+    assert mirror.version == version, "nothing new, nothing to redraw"
+
+    temp.add_to_queue((95.0,) * 7)
+    temp.target_y = None
+    publisher.publish()
+    view.refresh()
+    assert mirror.version != version
+    assert mirror[-1] == (95.0,) * 7
+    assert mirror.target_y is None
+    with pytest.raises(TypeError):
+        mirror.add_to_queue((1.0,))
+
+
+def test_reader_never_sees_a_write_in_progress(
+    queues: Dict[str, WaveQueue], snapshot: SharedSnapshot, state: Telemetry
+) -> None:
+    publisher = Publisher(snapshot, wave_queues=queues, fps=20)
+    publisher.publish()
+    view = SnapshotView(snapshot, state)
+    assert view.refresh()
+
+    with snapshot.writing():
+        snapshot.arrays.headers["temp"][:2] = (50, 60)
+        assert not snapshot.read_into(view._local, attempts=3)
+    # the previous snapshot is still served
+    assert view.waves["temp"].low == 90
+    assert view.refresh()
+    assert view.waves["temp"].low == 50
+
+
+def test_touches_are_replayed_on_the_buttons() -> None:
+    receive, send = Pipe(duplex=False)
+    buttons = MagicMock()
+    stop = threading.Event()
+    relay = threading.Thread(target=relay_buttons, args=(receive, buttons, stop))
+    relay.start()
+
+    remote = ButtonRelay(send)
+    remote.rising_button_one()
+    remote.falling_button_one()
+    send.send("turn_off_system")  # not a button event
+    remote.rising_button_two()
+    with pytest.raises(AttributeError):
+        remote.turn_off_system  # noqa: B018
+    send.close()
+    relay.join(timeout=5)
+    stop.set()
+
+    assert not relay.is_alive()
+    assert [c[0] for c in buttons.method_calls] == [
+        "rising_button_one",
+        "falling_button_one",
+        "rising_button_two",
+    ]
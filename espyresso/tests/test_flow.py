@@ -1,3 +1,4 @@
+from typing import List
 from unittest.mock import Mock
 
 import pytest
@@ -95,3 +96,22 @@ def test_flow_pulse_callback_increments_count_for_valid_pulse() -> None:
     # No previous change → first pulse always passes the debounce check
     flow.pulse_callback(0, 0, 0)
     assert flow.pulse_count == 1
+
+
+def test_flow_pulse_callback_publishes_flow_start_after_a_gap(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    now = [100.0]
+    monkeypatch.setattr("espyresso.flow.time.perf_counter", lambda: now[0])
+    flow = Flow(pigpio_pi=Mock(), flow_queue=_flow_queue())
+    events: List[str] = []
+    flow.add_listener(events.append)
+
+    for _ in range(3):
+        flow.pulse_callback(0, 0, 0)
+        now[0] += 0.3
+    assert events == ["flow_start"]
+
+    now[0] += config.FLOW_START_GAP
+    flow.pulse_callback(0, 0, 0)
+    assert events == ["flow_start", "flow_start"]
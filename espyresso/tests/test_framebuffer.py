@@ -0,0 +1,85 @@
+"""Tests for ``espyresso.framebuffer``, with a plain file standing in for
+the device."""
+
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pytest
+
+from espyresso.framebuffer import Framebuffer, rgb565
+
+
+def _device(path: Path, size: int) -> str:
+    path.write_bytes(bytes(size))
+    return str(path)
+
+
+@pytest.fixture
+def fb(tmp_path: Path) -> Iterator[Framebuffer]:
+    fb = Framebuffer(_device(tmp_path / "fb1", 8 * 4 * 2), (8, 4))
+    yield fb
+    fb.close()
+
+
+def _screen(width: int, height: int) -> "np.ndarray[Any, Any]":
+    """A surfarray-ordered (x, y, rgb) screen with distinct pixels."""
+    rgb = np.zeros((width, height, 3), np.uint8)
+    rgb[..., 0] = np.arange(width)[:, None] * 32
+    rgb[..., 1] = np.arange(height)[None, :] * 64
+    rgb[..., 2] = 255
+    return rgb
+
+
+def test_rgb565_packing() -> None:
+    colors = np.array([[255, 255, 255], [255, 0, 0], [0, 255, 0], [0, 0, 255]])
+    assert rgb565(colors).tolist() == [0xFFFF, 0xF800, 0x07E0, 0x001F]
+    assert rgb565(np.array([[8, 4, 8]], np.uint8)).tolist() == [0x0821]
+
+
+def test_write_lands_in_the_file(tmp_path: Path) -> None:
+    path = _device(tmp_path / "fb1", 8 * 4 * 2)
+    fb = Framebuffer(path, (8, 4))
+    fb.write(2, 1, np.full((3, 2, 3), 255, np.uint8))
+    fb.close()
+
+    pixels = np.fromfile(path, np.uint16).reshape(4, 8)
+    expected = np.zeros((4, 8), np.uint16)
+    expected[1:3, 2:5] = 0xFFFF
+    assert (pixels == expected).all()
+
+
+def test_blit_copies_only_the_dirty_rects(
+    fb: Framebuffer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import pygame  # mocked in conftest
+
+    screen = _screen(8, 4)
+    monkeypatch.setattr(pygame.surfarray, "pixels3d", lambda s: screen)
+
+    fb.blit(pygame.Surface((8, 4)), [(1, 0, 2, 2), (6, 2, 5, 5)])
+    expected = np.zeros((4, 8), np.uint16)
+    packed = rgb565(screen).T
+    expected[0:2, 1:3] = packed[0:2, 1:3]
+    # clipped to the framebuffer
+    expected[2:4, 6:8] = packed[2:4, 6:8]
+    assert (fb.pixels == expected).all()
+
+
+def test_padded_rows_and_32_bit(tmp_path: Path) -> None:
+    # 5 pixels of 4 bytes in rows of 32 bytes
+    fb = Framebuffer(_device(tmp_path / "fb0", 32 * 3), (5, 3), 32, stride=32)
+    try:
+        fb.write(4, 2, np.array([[[0x12, 0x34, 0x56]]], np.uint8))
+        fb.write(-1, -1, _screen(2, 2))
+        assert fb.pixels.shape == (3, 5)
+        assert fb.pixels[2, 4] == 0x123456
+        assert fb.pixels[0, 0] == (32 << 16) | (64 << 8) | 255
+        assert fb.pixels[0, 1] == 0
+    finally:
+        fb.close()
+
+
+def test_unsupported_depth(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        Framebuffer(_device(tmp_path / "fb1", 64), (4, 4), 24)
@@ -0,0 +1,78 @@
+import pytest
+
+from espyresso import config
+from espyresso.clock import SimulatedClock
+from espyresso.history import History
+from espyresso.utils import WaveQueue
+
+
+def test_buckets_hold_min_max_mean() -> None:
+    history = History(tiers=((1.0, 10),))
+    for t, value in [(0.1, 90.0), (0.5, 94.0), (0.9, 92.0), (1.2, 80.0)]:
+        history.add((value, -value), t=t)
+
+    buckets = history.window(10, now=1.5)
+    assert buckets.times.tolist() == [0.0, 1.0]
+    assert buckets.low.tolist() == [[90.0, -94.0], [80.0, -80.0]]
+    assert buckets.high.tolist() == [[94.0, -90.0], [80.0, -80.0]]
+    assert buckets.mean[0].tolist() == pytest.approx([92.0, -92.0])
+
+
+def test_coarse_tiers_fold_finer_buckets() -> None:
+    history = History(tiers=((1.0, 5), (10.0, 10)))
+    for i in range(250):
+        t = i * 0.1
+        history.add((t,), t=t)
+
+    # the fine tier only reaches 5 s back, so 20 s comes from the 10 s tier
+    assert history.tier_for(4) == 0
+    assert history.tier_for(20) == 1
+    fine = history.window(4, now=25.0)
+    assert fine.times.tolist() == [21.0, 22.0, 23.0, 24.0]
+
+    coarse = history.window(20, now=25.0)
+    assert coarse.times.tolist() == [0.0, 10.0, 20.0]
+    assert coarse.low[:, 0].tolist() == pytest.approx([0.0, 10.0, 20.0])
+    assert coarse.high[:2, 0].tolist() == pytest.approx([9.9, 19.9])
+    assert coarse.mean[:2, 0].tolist() == pytest.approx([4.95, 14.95])
+
+
+def test_memory_stays_bounded() -> None:
+    history = History(tiers=((1.0, 5),))
+    for i in range(100):
+        history.add((float(i),), t=float(i))
+
+    buckets = history.window(1000, now=100.0)
+    # the five newest closed buckets, plus the open one
+    assert buckets.times.tolist() == [94.0, 95.0, 96.0, 97.0, 98.0, 99.0]
+
+
+def test_wave_queue_feeds_history_past_its_window() -> None:
+    clock = SimulatedClock()
+    queue = WaveQueue(
+        90,
+        100,
+        X_MIN=config.TEMP_X_MIN,
+        X_MAX=config.TEMP_X_MAX,
+        Y_MIN=config.TEMP_Y_MIN,
+        Y_MAX=config.TEMP_Y_MAX,
+        history=History(clock=clock),
+    )
+    for i in range(1200):
+        queue.add_to_queue((20.0 + i * 0.1,))
+        clock.advance(0.1)
+    queue.clear()
+
+    assert len(queue) == 0
+    buckets = queue.history.window(120) if queue.history else None
+    assert buckets is not None
+    assert len(buckets.times) == 120
+    assert buckets.low[0, 0] == pytest.approx(20.0)
+    assert buckets.high[-1, 0] == pytest.approx(139.9)
+
+
+def test_width_is_fixed_by_the_first_sample() -> None:
+    history = History()
+    history.add((1.0, 2.0), t=0.0)
+    with pytest.raises(ValueError):
+        history.add((1.0,), t=0.1)
@@ -0,0 +1,82 @@
+import json
+import socket
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from espyresso import metrics
+from espyresso.flow import Flow
+from espyresso.tests.test_flow import _flow_queue
+
+
+@pytest.mark.parametrize("us", [0, 1, 31, 32, 33, 63, 64, 1000, 123456, 9_999_999])
+def test_bucket_bounds_contain_value(us: int) -> None:
+    low, high = metrics._bucket_bounds(metrics._bucket(us))
+    assert low <= us < high
+    assert high - low <= max(1, low / 16)
+
+
+def test_buckets_are_contiguous() -> None:
+    for index in range(metrics._bucket(10_000_000)):
+        assert metrics._bucket_bounds(index)[1] == metrics._bucket_bounds(index + 1)[0]
+
+
+def test_histogram_percentiles() -> None:
+    h = metrics.Histogram("test")
+    for ms in range(1, 101):
+        h.record(ms / 1000.0)
+
+    assert h.count == 100
+    assert h.percentile(50) == pytest.approx(0.050, rel=0.07)
+    assert h.percentile(99) == pytest.approx(0.099, rel=0.07)
+    snap = h.snapshot()
+    assert snap["max_ms"] == 100.0
+    assert snap["mean_ms"] == pytest.approx(50.5)
+
+
+def test_histogram_clamps_and_resets() -> None:
+    h = metrics.Histogram("test", highest=1.0)
+    size = len(h.counts)
+    h.record(-1.0)
+    h.record(60.0)
+
+    assert len(h.counts) == size
+    assert h.max_us == 1_000_000
+    assert h.percentile(100) == pytest.approx(1.0, rel=0.07)
+    h.reset()
+    assert h.count == 0
+    assert sum(h.counts) == 0
+    assert h.percentile(50) == 0.0
+
+
+def test_flow_callback_is_timed() -> None:
+    metrics.histogram("flow_callback").reset()
+    flow = Flow(pigpio_pi=Mock(), flow_queue=_flow_queue())
+    flow.pulse_callback(0, 1, 0)
+    flow.pulse_callback(0, 1, 0)  # debounced, still timed
+
+    assert metrics.histogram("flow_callback").count == 2
+
+
+def test_status_server_serves_snapshot(tmp_path: Path) -> None:
+    metrics.histogram("test_status").record(0.002)
+    server = metrics.StatusServer(str(tmp_path / "metrics.sock"))
+    server.start()
+    assert server.wait_ready(timeout=5)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(server.path)
+            data = b""
+            while True:
+                chunk = client.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+    finally:
+        server.stop()
+        server.join(timeout=5)
+
+    status = json.loads(data)
+    assert status["test_status"]["count"] >= 1
+    assert not (tmp_path / "metrics.sock").exists()
@@ -4,8 +4,8 @@ The MPC is rich and physics-y; we don't try to validate the numerics
 end-to-end. Instead we pin down the *contract* of ``update``:
 
   * not boiling → heater power is exactly 0
-  * the returned tuple has 7 thermal-mass values in a known order
-  * the last value of the tuple is the raw measured temperature
+  * ``state.masses()`` has 7 thermal-mass values in a known order
+  * the last value of ``state.masses()`` is the raw measured temperature
   * heater power is always in the normalized [0, 1] range
   * with no flow and at setpoint, the heater settles to a small positive value
 
@@ -16,12 +16,25 @@ outputs must not change.
 
 from __future__ import annotations
 
+import json
+import math
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
 from unittest.mock import Mock
 
 import pytest
 
 from espyresso import config
-from espyresso.pcontroller import PController
+from espyresso.pcontroller import (
+    PLAN_FIELDS,
+    FeedForward,
+    HorizonPlanner,
+    PController,
+    _affine_step,
+    model_params,
+    model_step,
+)
 
 
 @pytest.fixture
@@ -33,30 +46,42 @@ def flow_zero() -> Mock:
 
 def test_not_boiling_returns_zero_heater_power(flow_zero: Mock) -> None:
     p = PController(initial_temperature=22.0, flow=flow_zero)
-    heater, masses = p.update(temperature=22.0, boiling=False)
+    heater = p.update(temperature=22.0, boiling=False)
     assert heater == 0
 
 
-def test_returned_tuple_shape(flow_zero: Mock) -> None:
+def test_state_masses_shape(flow_zero: Mock) -> None:
     p = PController(initial_temperature=22.0, flow=flow_zero)
-    _, masses = p.update(temperature=22.0, boiling=False)
+    p.update(temperature=22.0, boiling=False)
+    masses = p.state.masses()
     assert len(masses) == 7
     # All entries are floats
     for v in masses:
         assert isinstance(v, float)
 
 
-def test_returned_tuple_last_entry_is_measured_temperature(flow_zero: Mock) -> None:
+def test_state_masses_last_entry_is_measured_temperature(flow_zero: Mock) -> None:
     p = PController(initial_temperature=22.0, flow=flow_zero)
-    _, masses = p.update(temperature=42.42, boiling=False)
-    assert masses[-1] == 42.42
+    p.update(temperature=42.42, boiling=False)
+    assert p.state.masses()[-1] == 42.42
+
+
+def test_update_writes_into_the_same_state_object(flow_zero: Mock) -> None:
+    p = PController(initial_temperature=22.0, flow=flow_zero)
+    state = p.state
+    heater = p.update(temperature=22.0, boiling=True)
+    p.update(temperature=23.0, boiling=True)
+    assert p.state is state
+    assert state.raw_temp == 23.0
+    assert state.heater == p.update(temperature=23.0, boiling=True)
+    assert 0.0 <= heater <= 1.0
 
 
 def test_heater_power_normalized_to_unit_interval(flow_zero: Mock) -> None:
     """When boiling, heater power must be in [0, 1] regardless of state."""
     p = PController(initial_temperature=22.0, flow=flow_zero)
     # cold start, target high — controller wants max power
-    heater, _ = p.update(temperature=22.0, boiling=True)
+    heater = p.update(temperature=22.0, boiling=True)
     assert 0.0 <= heater <= 1.0
 
 
@@ -65,7 +90,7 @@ def test_heater_power_zero_when_already_at_setpoint(flow_zero: Mock) -> None:
     p = PController(initial_temperature=config.TARGET_TEMP, flow=flow_zero)
     # Drive several updates to let thermal masses equilibrate around setpoint
     for _ in range(10):
-        heater, _ = p.update(temperature=config.TARGET_TEMP, boiling=True)
+        heater = p.update(temperature=config.TARGET_TEMP, boiling=True)
     # Some heater output is expected (we lose heat to ambient) but it
     # must stay well below full power.
     assert 0.0 <= heater < 0.5
@@ -81,5 +106,179 @@ def test_set_target_temp_changes_setpoint(flow_zero: Mock) -> None:
 def test_cold_start_drives_full_power(flow_zero: Mock) -> None:
     """22°C and boiling with a 95°C setpoint → heater pinned at 1.0."""
     p = PController(initial_temperature=22.0, flow=flow_zero)
-    heater, _ = p.update(temperature=22.0, boiling=True)
+    heater = p.update(temperature=22.0, boiling=True)
+    assert heater == pytest.approx(1.0)
+
+
+def test_model_params_overrides_without_touching_config() -> None:
+    p = model_params(SENSOR_XFER_COEFF=0.5)
+    assert p.SENSOR_XFER_COEFF == 0.5
+    assert p.ELEMENT_SHELL_XFER_COEFF == config.ELEMENT_SHELL_XFER_COEFF
+    assert config.SENSOR_XFER_COEFF != 0.5
+
+
+def test_mpc_profile_applies_only_when_loaded(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "mpc_profile.json"
+    path.write_text(
+        json.dumps(
+            {"SENSOR_XFER_COEFF": 0.5, "_meta": {}, "nope": 1, "LOG_SHOT": False}
+        )
+    )
+    monkeypatch.setattr(config, "MPC_PROFILE_FILE", str(path))
+    # restored afterwards
+    monkeypatch.setattr(config, "SENSOR_XFER_COEFF", config.SENSOR_XFER_COEFF)
+    monkeypatch.setattr(config, "LOG_SHOT", True)
+
+    assert model_params().SENSOR_XFER_COEFF != 0.5
+    assert config.load_mpc_profile() == ["SENSOR_XFER_COEFF"]
+    assert model_params().SENSOR_XFER_COEFF == 0.5
+    # settings other than model constants stay as they were
+    assert config.LOG_SHOT is True
+    assert config.load_mpc_profile(str(tmp_path / "missing.json")) == []
+
+
+def test_model_params_rejects_unknown_names() -> None:
+    with pytest.raises(ValueError):
+        model_params(NOT_A_CONSTANT=1.0)
+
+
+def _planner(**params: float) -> HorizonPlanner:
+    return HorizonPlanner(
+        22.0,
+        steps=20,
+        step_seconds=1.0,
+        substeps=5,
+        blocks=(3,),
+        levels=(0.0, 0.5, 1.0),
+        flow_bins=(0.0, 2.0),
+        p=model_params(**params),
+    )
+
+
+def _masses(setpoint: float = 95.0, **temps: float) -> SimpleNamespace:
+    m = SimpleNamespace(**{name: temps.get(name, 22.0) for name in PLAN_FIELDS})
+    m.setpoint = setpoint
+    return m
+
+
+def test_affine_step_matches_model_step() -> None:
+    p = model_params(MPC_SMOOTHING=0.0)
+    a, b, c = _affine_step(p, 0.1, 1.5, 22.0)
+    m = _masses(shellTemp=120.0, elementTemp=140.0, waterTemp=90.0, bodyTemp=60.0)
+    x = [getattr(m, name) for name in PLAN_FIELDS]
+    m.modeledSensorTemp, m.ambientTemp, m.heaterPower = 90.0, 22.0, 700.0
+    model_step(m, m, temperature=90.0, deltaTime=0.1, flow_rate=1.5, p=p)
+    for i, name in enumerate(PLAN_FIELDS):
+        predicted = sum(a_ij * x_j for a_ij, x_j in zip(a[i], x)) + b[i] * 700 + c[i]
+        assert getattr(m, name) == pytest.approx(predicted, abs=1e-9)
+
+
+def test_planner_heats_cold_boiler_and_idles_hot_one() -> None:
+    planner = _planner()
+    cold = _masses()
+    hot = _masses(shellTemp=110.0, elementTemp=110.0, waterTemp=105.0)
+    assert planner.plan(cold, 0.0) == 1.0
+    assert planner.plan(hot, 0.0) == 0.0
+
+
+def test_planner_respects_element_limit() -> None:
+    # Full power from cold for the whole horizon would take the element
+    # past 60°C; the best trajectory that stays under it backs off later.
+    unlimited = _planner()
+    unlimited.plan(_masses(), 0.0)
+    assert unlimited.trajectory == (1.0, 1.0)
+    limited = _planner(ELEMENT_MAX_TEMPERATURE=60.0)
+    limited.plan(_masses(), 0.0)
+    assert limited.trajectory[1] < 1.0
+
+
+def test_horizon_mode_sets_planned_heater(
+    flow_zero: Mock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(config, "MPC_HORIZON_STEPS", 20)
+    p = PController(initial_temperature=22.0, flow=flow_zero)
+    heater = p.update(temperature=22.0, boiling=True)
+    assert p.state.plannedHeater == 1.0
     assert heater == pytest.approx(1.0)
+    p.update(temperature=22.0, boiling=False)
+    assert math.isnan(p.state.plannedHeater)
+
+
+def _feed_forward(path: Optional[str] = None) -> FeedForward:
+    return FeedForward(
+        [100.0, 200.0, 300.0], gain=1.0, lead=1, learning_rate=0.5, path=path
+    )
+
+
+def test_feed_forward_leads_the_profile_and_closes() -> None:
+    ff = _feed_forward()
+    assert ff.power(0.0, 0.0) == 0.0
+    ff.start(10.0, learn=False)
+    assert ff.power(10.5, 0.0) == 200.0
+    assert ff.power(12.5, 0.0) == 300.0
+    assert ff.power(13.5, 0.0) == 0.0
+    assert not ff.active
+
+
+def test_feed_forward_learns_only_complete_shots(tmp_path: Path) -> None:
+    path = str(tmp_path / "ff.json")
+    ff = _feed_forward(path)
+    ff.start(0.0, learn=True)
+    ff.power(0.5, 300.0)
+    ff.stop()
+    assert ff.profile == [100.0, 200.0, 300.0]
+
+    ff.start(0.0, learn=True)
+    for t, measured in ((0.5, 300.0), (1.5, 400.0), (2.5, 500.0)):
+        ff.power(t, measured)
+    ff.stop()
+    assert ff.profile == [200.0, 300.0, 400.0]
+    with open(path) as f:
+        assert json.load(f) == [200.0, 300.0, 400.0]
+
+
+def test_feed_forward_profile_is_found_from_any_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    assert Path(config.PROFILE_DIR).is_absolute()
+    with open(config.FEED_FORWARD_PROFILE_FILE, "w") as f:
+        json.dump([100.0, 200.0], f)
+    monkeypatch.chdir(tmp_path / "..")
+    ff = FeedForward.from_config()
+    assert ff.profile[:3] == [100.0, 200.0, 0.0]
+    assert ff.path == config.FEED_FORWARD_PROFILE_FILE
+
+
+def test_brew_start_raises_heater_power(
+    flow_zero: Mock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(config, "FEED_FORWARD_PROFILE_FILE", "/nonexistent/ff.json")
+    heaters = []
+    for event in (None, "brew_start"):
+        p = PController(initial_temperature=config.TARGET_TEMP, flow=flow_zero)
+        p.feed_forward.profile = [500.0] * config.FEED_FORWARD_SECONDS
+        for _ in range(10):
+            p.update(temperature=config.TARGET_TEMP, boiling=True)
+        if event:
+            p.on_flow_event(event)
+        heaters.append(p.update(temperature=config.TARGET_TEMP, boiling=True))
+        assert p.state.feedForward_W == (500.0 if event else 0.0)
+    assert heaters[1] > heaters[0]
+
+
+def test_flow_events_are_applied_on_the_control_tick(flow_zero: Mock) -> None:
+    p = PController(initial_temperature=config.TARGET_TEMP, flow=flow_zero)
+    p.on_flow_event("brew_start")
+    # the flow thread only queues the event
+    assert not p.feed_forward.active
+    p.update(temperature=config.TARGET_TEMP, boiling=True)
+    assert p.feed_forward.active and p.feed_forward.learning
+
+    p.on_flow_event("brew_end")
+    p.on_flow_event("flow_start")
+    assert p.feed_forward.active
+    p.update(temperature=config.TARGET_TEMP, boiling=True)
+    # applied in order: the shot closed, then the pump restarted
+    assert p.feed_forward.active and not p.feed_forward.learning
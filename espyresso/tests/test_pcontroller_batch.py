@@ -0,0 +1,155 @@
+"""Tests for ``espyresso.pcontroller_batch``.
+
+The batch engine is only useful if it reproduces ``PController`` exactly,
+so the main test drives a real ``PController`` with a fake clock and flow
+meter and compares every state column against a vectorized replay of the
+same inputs.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+from unittest.mock import Mock
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from espyresso import config  # noqa: E402
+from espyresso.clock import SimulatedClock  # noqa: E402
+from espyresso.pcontroller import (  # noqa: E402
+    ControllerState,
+    PController,
+    init_model,
+    model_step,
+)
+from espyresso.pcontroller_batch import (  # noqa: E402
+    STATE_COLUMNS,
+    replay,
+    replay_ticks,
+    stack_traces,
+)
+
+
+def _drive_pcontroller(
+    temps: List[float],
+    flows: List[float],
+    boiling: List[bool],
+    dt: float = 0.1,
+) -> Dict[str, List[float]]:
+    clock = SimulatedClock(1000.0)
+    flow = Mock()
+    p = PController(initial_temperature=temps[0], flow=flow, clock=clock)
+    out: Dict[str, List[float]] = {"heater": [], "deltaTime": [], "heaterPower": []}
+    for name in STATE_COLUMNS:
+        out[name] = []
+    for temp, flow_rate, boil in zip(temps, flows, boiling):
+        clock.advance(dt)
+        flow.get_flow_rate.return_value = flow_rate
+        heater = p.update(temperature=temp, boiling=boil)
+        out["heater"].append(heater)
+        out["deltaTime"].append(p.state.deltaTime)
+        out["heaterPower"].append(p.state.heaterPower)
+        for name in STATE_COLUMNS:
+            out[name].append(getattr(p.state, name))
+    return out
+
+
+def _scenario(n: int = 400) -> Dict[str, List[Any]]:
+    temps = [22.0 + min(i * 0.3, 75.0) for i in range(n)]
+    flows = [1.8 if 250 < i < 320 else 0.0 for i in range(n)]
+    boiling = [not (100 < i < 130) for i in range(n)]
+    return {"temps": temps, "flows": flows, "boiling": boiling}
+
+
+def test_replay_matches_pcontroller() -> None:
+    s = _scenario()
+    expected = _drive_pcontroller(s["temps"], s["flows"], s["boiling"])
+
+    out = replay(
+        np.array(s["temps"]),
+        np.array(expected["deltaTime"]),
+        np.array(s["flows"]),
+        np.array(s["boiling"]),
+    )
+    for name in ("heater",) + STATE_COLUMNS:
+        np.testing.assert_allclose(out[name][:, 0], expected[name], rtol=1e-12)
+
+
+def test_replay_runs_traces_independently() -> None:
+    s = _scenario(200)
+    expected = _drive_pcontroller(s["temps"], s["flows"], s["boiling"])
+    n = len(s["temps"])
+
+    temps = np.column_stack([s["temps"], np.full(n, 22.0)])
+    dts = np.column_stack([expected["deltaTime"]] * 2)
+    flows = np.column_stack([s["flows"], np.zeros(n)])
+    boiling = np.column_stack([s["boiling"], np.zeros(n, dtype=bool)])
+    out = replay(temps, dts, flows, boiling)
+
+    np.testing.assert_allclose(out["waterTemp"][:, 0], expected["waterTemp"])
+    assert np.all(out["heater"][:, 1] == 0.0)
+
+
+def test_stack_traces_freezes_short_traces() -> None:
+    short = {"raw_temp": np.array([22.0, 23.0]), "deltaTime": np.array([0.1, 0.1])}
+    long = {"raw_temp": np.arange(5.0), "deltaTime": np.full(5, 0.1)}
+    stacked = stack_traces([short, long])
+    assert stacked["raw_temp"].shape == (5, 2)
+    assert list(stacked["raw_temp"][:, 0]) == [22.0, 23.0, 23.0, 23.0, 23.0]
+    assert list(stacked["deltaTime"][2:, 0]) == [0.0, 0.0, 0.0]
+    assert stacked["mask"][:, 0].tolist() == [True, True, False, False, False]
+
+
+def test_replay_ticks_resumes_from_logged_state() -> None:
+    s = _scenario(120)
+    expected = _drive_pcontroller(s["temps"], s["flows"], s["boiling"])
+    trace = {
+        "raw_temp": np.array(s["temps"]),
+        "deltaTime": np.array(expected["deltaTime"]),
+        "flow_rate": np.array(s["flows"]),
+        "boiling": np.array(s["boiling"], dtype=float),
+        # the power the boiler got after each row drives the next row
+        "heaterPower_W": np.array(expected["heaterPower"]),
+    }
+    for name in STATE_COLUMNS:
+        trace[name] = np.array(expected[name])
+
+    _, out = replay_ticks([trace])
+    np.testing.assert_allclose(
+        out["modeledSensorTemp"][:, 0], expected["modeledSensorTemp"][1:]
+    )
+
+
+@pytest.mark.parametrize("override", [False, True])
+def test_replay_ticks_uses_the_logged_heater_power(override: bool) -> None:
+    # power heater_step would never ask for
+    n, power = 60, 700.0
+    temps = [30.0 + 0.2 * i for i in range(n)]
+    m = ControllerState()
+    init_model(m, temps[0])
+    m.setpoint = 93.0
+    expected: List[float] = []
+    for temp in temps[1:]:
+        m.heaterPower = power
+        model_step(m, m, temperature=temp, deltaTime=0.1, flow_rate=0.0)
+        expected.append(m.modeledSensorTemp)
+
+    seed = ControllerState()
+    init_model(seed, temps[0])
+    trace = {
+        "raw_temp": np.array(temps),
+        "deltaTime": np.full(n, 0.1),
+        "flow_rate": np.zeros(n),
+        "boiling": np.ones(n),
+        "setpoint": np.full(n, 93.0),
+        "heaterPower_W": np.full(n, power),
+    }
+    if override:
+        trace["heaterPower_W"] = np.zeros(n)
+        trace["pwm_override"] = np.full(n, power / config.MAX_BOILER_POWER)
+    for name in STATE_COLUMNS + ("ambientTemp",):
+        trace[name] = np.full(n, getattr(seed, name))
+
+    _, out = replay_ticks([trace])
+    np.testing.assert_allclose(out["modeledSensorTemp"][:, 0], expected)
@@ -0,0 +1,65 @@
+from unittest.mock import Mock
+
+import pytest
+
+from espyresso import config
+from espyresso.clock import SimulatedClock
+from espyresso.flow import Flow
+from espyresso.pcontroller import PController, model_params
+from espyresso.plant import TSIC_RESOLUTION, BoilerPlant, FlowMeter
+from espyresso.tests.test_flow import _flow_queue
+
+
+def test_plant_stays_at_ambient_without_heat() -> None:
+    plant = BoilerPlant(sensor_noise=0.0)
+    for _ in range(1000):
+        plant.step(0.1, 0.0, 0.0)
+    assert plant.water_temp == pytest.approx(config.AMBIENT_TEMPERATURE)
+    assert plant.read_sensor() == pytest.approx(plant.sensor_temp, abs=TSIC_RESOLUTION)
+
+
+def test_heat_reaches_the_water_and_flow_carries_it_off() -> None:
+    still, flowing = BoilerPlant(), BoilerPlant()
+    for plant in (still, flowing):
+        for _ in range(600):
+            plant.step(0.1, 1.0, 0.0)
+    assert still.water_temp > 60
+    # the sensor sits on the element side and runs ahead of the water
+    assert still.sensor_temp > still.water_temp
+
+    for _ in range(100):
+        still.step(0.1, 0.0, 0.0)
+        flowing.step(0.1, 0.0, 2.0)
+    assert flowing.water_temp < still.water_temp - 5
+
+
+def test_matching_plant_follows_the_controllers_model() -> None:
+    """With the controller's own parameters and no noise, the model the
+    controller keeps tracks the plant it is driving."""
+    plant = BoilerPlant(params=model_params(MPC_SMOOTHING=0.0), sensor_noise=0.0)
+    clock = SimulatedClock()
+    controller = PController(
+        initial_temperature=plant.sensor_temp,
+        flow=Mock(get_flow_rate=lambda: 0.0),
+        clock=clock,
+    )
+    heater = 0.0
+    for _ in range(3000):
+        plant.step(0.1, heater, 0.0)
+        clock.advance(0.1)
+        heater = controller.update(temperature=plant.read_sensor(), boiling=True)
+    assert controller.state.waterTemp == pytest.approx(plant.water_temp, abs=0.5)
+    assert plant.water_temp == pytest.approx(config.TARGET_TEMP, abs=1.0)
+
+
+@pytest.mark.parametrize("flow_ml_s", [1.2, 2.0, 3.5])
+def test_flow_reads_back_the_metered_flow(flow_ml_s: float) -> None:
+    clock = SimulatedClock()
+    flow = Flow(pigpio_pi=Mock(), flow_queue=_flow_queue(), clock=clock)
+    meter = FlowMeter()
+    for step in range(500):
+        for when in meter.edges(clock.now(), 0.02, flow_ml_s):
+            clock.run_until(when)
+            flow.pulse_callback(0, 0, 0)
+        clock.run_until((step + 1) * 0.02)
+    assert flow.get_millilitres() == pytest.approx(flow_ml_s * 10, rel=0.05)
@@ -0,0 +1,76 @@
+"""``tools/render_shot.py`` on a simulated log. It needs the real pygame,
+so it runs in its own process rather than under conftest's mock."""
+import math
+import os
+import struct
+import subprocess
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from espyresso import config, shot_logger, tick_log
+from espyresso.simulation import Simulation
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _png_size(path: Path) -> Tuple[int, int]:
+    with open(path, "rb") as f:
+        header = f.read(24)
+    assert header[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height
+
+
+def _simulated_log(monkeypatch: pytest.MonkeyPatch, log_dir: Path) -> str:
+    sim = Simulation()
+    monkeypatch.setattr("espyresso.shot_logger.time.perf_counter", sim.clock.now)
+    log = shot_logger.ShotLogger(str(log_dir), "binary")
+    monkeypatch.setattr(shot_logger, "_INSTANCE", log)
+    sim.run_for(8.0)
+    log.close()
+    return log.tick_path
+
+
+def test_renders_a_simulated_log_headless(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    env = dict(
+        os.environ,
+        SDL_VIDEODRIVER="dummy",
+        SDL_AUDIODRIVER="dummy",
+        PYGAME_HIDE_SUPPORT_PROMPT="1",
+    )
+    if subprocess.run([sys.executable, "-c", "import pygame"], env=env).returncode:
+        pytest.skip("pygame is not installed")
+
+    tick_path = _simulated_log(monkeypatch, tmp_path / "log")
+    times = [row["t"] for row in tick_log.iter_rows(tick_path)]
+    assert len(times) > 50
+    every = 0.5
+    expected = math.floor((times[-1] - times[0]) / every + 1e-9) + 1
+
+    frames = tmp_path / "frames"
+    result = subprocess.run(
+        [
+            sys.executable,
+            str(ROOT / "tools" / "render_shot.py"),
+            str(tmp_path / "log"),
+            "--out",
+            str(frames),
+            "--every",
+            str(every),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    assert result.stdout.splitlines()[0] == f"{expected} frames from {tick_path}"
+    pngs = sorted(frames.iterdir())
+    assert len(pngs) == expected
+    assert {_png_size(p) for p in pngs} == {(config.WIDTH, config.HEIGHT)}
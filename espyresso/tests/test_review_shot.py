@@ -0,0 +1,96 @@
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from tools import review_shot
+
+DAY = 86400.0
+
+
+def _temp(t: float) -> float:
+    # warm-up ramp to 95.9, then 95.2 with a 2 °C droop late in the brew
+    if t < 6.0:
+        return 90.0 + t
+    if 32.0 < t <= 40.0:
+        return 95.2 - (t - 32.0) / 4
+    return 95.2
+
+
+def _write_log(log_dir: Path, stamp: str, brew: bool = True) -> Path:
+    tick = log_dir / f"shot-{stamp}-tick.csv"
+    with open(tick, "w") as f:
+        f.write("t,raw_temp,setpoint,heater,flow_rate\n")
+        for i in range(600):
+            t = round(i * 0.1, 1)
+            flow = 2.0 if brew and 30.0 <= t <= 40.0 else 0.0
+            f.write(f"{t},{_temp(t)},95.0,0.5,{flow}\n")
+    with open(log_dir / f"shot-{stamp}-event.csv", "w") as f:
+        f.write("t,kind,details\n")
+        if brew:
+            f.write("30.0,brew,phase=preinfuse_start\n")
+            f.write("40.0,brew,phase=end\n")
+    return tick
+
+
+def test_analyze_session_rows(tmp_path: Path) -> None:
+    tick = _write_log(tmp_path, "20260101-070000")
+    rows = review_shot.analyze_session(review_shot._find_pair(str(tick)))
+
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["session"] == "shot-20260101-070000"
+    assert row["shot"] == 1
+    assert row["shot_t"] == 30.0
+    assert row["brew_s"] == 10.0
+    assert row["warmup_s"] == pytest.approx(5.0)
+    assert row["overshoot"] == pytest.approx(0.9)
+    assert row["droop"] == pytest.approx(2.0, abs=0.05)
+    assert row["brew_mean_flow"] == pytest.approx(2.0)
+
+
+def test_analyze_session_without_brews_keeps_one_row(tmp_path: Path) -> None:
+    tick = _write_log(tmp_path, "20260101-070000", brew=False)
+    rows = review_shot.analyze_session(review_shot._find_pair(str(tick)))
+    assert len(rows) == 1
+    assert "shot" not in rows[0]
+    assert rows[0]["warmup_s"] == pytest.approx(5.0)
+
+
+def test_trends_slope_per_30_days() -> None:
+    rows: List[Dict[str, Any]] = [
+        {"started": 1000.0 + k * DAY, "overshoot": 1.0 + 0.1 * k} for k in range(4)
+    ]
+    rows.append({"started": 1000.0 + 5 * DAY, "overshoot": math.nan})
+    trends = review_shot._trends(rows)
+
+    overshoot = trends["overshoot"]
+    assert overshoot["count"] == 4
+    assert overshoot["mean"] == pytest.approx(1.15)
+    assert overshoot["slope_per_30d"] == pytest.approx(3.0)
+    assert "droop" not in trends
+
+
+def test_batch_skips_unreadable_logs(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    _write_log(tmp_path, "20260101-070000")
+    _write_log(tmp_path, "20260102-070000")
+    broken = tmp_path / "shot-20260103-070000-tick.bin"
+    broken.write_bytes(b"not a tick log")
+    output = tmp_path / "shots.json"
+
+    review_shot.batch([str(tmp_path)], "json", str(output), workers=2)
+
+    with open(output) as f:
+        result = json.load(f)
+    assert [r["session"] for r in result["shots"]] == [
+        "shot-20260101-070000",
+        "shot-20260102-070000",
+    ]
+    # the same shot a day apart: no trend
+    assert result["trends"]["droop"]["count"] == 2
+    assert result["trends"]["droop"]["slope_per_30d"] == pytest.approx(0.0)
+    assert f"skipping {broken}" in capsys.readouterr().err
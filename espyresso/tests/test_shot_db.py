@@ -0,0 +1,91 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from espyresso.shot_db import ShotDB, backfill
+from espyresso.shot_logger import ShotLogger
+
+
+class _State:
+    FIELDS = ("raw_temp", "heater", "flow_rate", "boiling")
+
+    def __init__(self) -> None:
+        self.raw_temp = 95.0
+        self.heater = 0.5
+        self.flow_rate = 0.0
+        self.boiling = True
+
+
+def _log_session(
+    monkeypatch: pytest.MonkeyPatch, base_dir: Path, fmt: str, db: str
+) -> ShotLogger:
+    now = [0.0]
+    monkeypatch.setattr("espyresso.shot_logger.time.perf_counter", lambda: now[0])
+    log = ShotLogger(str(base_dir), fmt, flush_interval=60.0, shot_db=db)
+    state = _State()
+
+    def ticks(n: int, temp_step: float = 0.0) -> None:
+        for _ in range(n):
+            now[0] += 0.1
+            state.raw_temp += temp_step
+            log.log_tick(state)  # type: ignore[arg-type]
+
+    ticks(20)
+    log.log_event("brew", phase="preinfuse_start")
+    state.flow_rate = 1.5
+    ticks(30, -0.1)  # 3 °C droop over 3 s
+    log.log_event(
+        "brew", phase="preinfuse_stop", preinfuse_seconds=3.0, preinfuse_ml=12.5
+    )
+    ticks(20, 0.05)
+    log.log_event("brew", phase="end", total_ml=40.0, pulses=80, final_grams=36.2)
+    state.flow_rate = 0.0
+    ticks(10)
+    log.close()
+    return log
+
+
+def _check_shot(shots: List[Dict[str, Any]]) -> None:
+    assert len(shots) == 1
+    shot = shots[0]
+    assert shot["duration_s"] == pytest.approx(5.0, abs=0.01)
+    assert shot["preinfuse_s"] == 3.0
+    assert shot["preinfuse_ml"] == 12.5
+    assert shot["final_grams"] == pytest.approx(36.2)
+    assert shot["pulses"] == 80
+    assert shot["peak_temp"] == pytest.approx(95.0, abs=0.2)
+    assert shot["min_temp"] == pytest.approx(92.0, abs=0.01)
+    assert shot["temp_droop"] == pytest.approx(2.0, abs=0.2)
+
+
+def test_shot_logger_records_shots(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    db_path = str(tmp_path / "shots.sqlite3")
+    _log_session(monkeypatch, tmp_path, "binary", db_path)
+
+    db = ShotDB(db_path)
+    shots = db.shots()
+    _check_shot(shots)
+    ticks = db.ticks(shots[0]["id"])
+    assert len(ticks) == 50
+    assert ticks[0]["t"] == pytest.approx(0.1)
+    assert ticks[0]["flow_rate"] == 1.5
+    assert ticks[0]["waterTemp"] is None  # not in this log
+    assert db.shots("temp_droop > ?", (2.5,)) == []
+    db.close()
+
+
+@pytest.mark.parametrize("fmt", ["binary", "csv"])
+def test_backfill_matches_live_recording(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, fmt: str
+) -> None:
+    log = _log_session(monkeypatch, tmp_path, fmt, str(tmp_path / "live.sqlite3"))
+
+    db = ShotDB(str(tmp_path / "backfill.sqlite3"))
+    assert backfill(db, log.tick_path, log.event_path) == 1
+    _check_shot(db.shots())
+    assert len(db.ticks(db.shots()[0]["id"])) == 50
+    assert db.has_session(Path(log.tick_path).name.split("-tick.")[0])
+    db.close()
@@ -0,0 +1,59 @@
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from espyresso.shot_logger import ShotLogger
+
+
+def _events(log: ShotLogger) -> List[List[str]]:
+    with open(log.event_path) as f:
+        return [line.rstrip("\n").split(",", 2) for line in f][1:]
+
+
+def test_callers_only_queue(tmp_path: Path) -> None:
+    log = ShotLogger(str(tmp_path), flush_interval=60.0)
+    log.log_event("brew", phase="start", weight=1.5)
+    log.log_event("boiler", state="off")
+
+    assert _events(log) == []
+    log.flush()
+    assert [(kind, details) for _, kind, details in _events(log)] == [
+        ("brew", "phase=start weight=1.5000"),
+        ("boiler", "state=off"),
+    ]
+    log.close()
+
+
+def test_writer_thread_drains(tmp_path: Path) -> None:
+    log = ShotLogger(str(tmp_path), flush_interval=0.01, fsync="batch")
+    log.log_event("brew", phase="start")
+    deadline = time.perf_counter() + 5.0
+    while not _events(log) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+    assert len(_events(log)) == 1
+    log.close()
+
+
+def test_overflow_is_counted_not_blocking(tmp_path: Path) -> None:
+    log = ShotLogger(str(tmp_path), queue_size=3, flush_interval=60.0)
+    for i in range(5):
+        log.log_event("scale", weight=i)
+    log.close()
+    log.log_event("late")
+
+    assert log.dropped == 3
+    events = _events(log)
+    assert [details for _, _, details in events[:3]] == [
+        "weight=0",
+        "weight=1",
+        "weight=2",
+    ]
+    assert events[-1][1:] == ["shot_logger", "dropped=2"]
+
+
+def test_rejects_unknown_fsync_policy(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        ShotLogger(str(tmp_path), fsync="always")
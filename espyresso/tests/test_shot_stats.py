@@ -0,0 +1,74 @@
+import math
+import statistics
+from typing import Dict, List
+
+import pytest
+
+from espyresso.shot_stats import (
+    Accumulator,
+    Crossings,
+    FirstTime,
+    Intervals,
+    Stats,
+    Windows,
+    run,
+)
+
+
+def _rows(values: List[float], dt: float = 1.0) -> List[Dict[str, float]]:
+    return [{"t": i * dt, "v": v} for i, v in enumerate(values)]
+
+
+def test_stats_match_statistics_module() -> None:
+    values = [3.0, 1.5, math.nan, 4.25, -2.0, 7.0]
+    stats = Stats("v")
+    assert run(_rows(values), [stats]) == len(values)
+
+    real = [v for v in values if not math.isnan(v)]
+    assert stats.count == len(real)
+    assert stats.mean == pytest.approx(statistics.fmean(real))
+    assert stats.variance == pytest.approx(statistics.pvariance(real))
+    assert (stats.min, stats.max) == (-2.0, 7.0)
+    assert (stats.first, stats.last) == (3.0, 7.0)
+
+
+def test_stats_with_key_and_filter() -> None:
+    stats = Stats(lambda r: r["v"] * 2, where=lambda r: r["t"] >= 2)
+    run(_rows([1.0, 2.0, 3.0, 4.0]), [stats])
+    assert (stats.count, stats.mean) == (2, 7.0)
+
+
+def test_intervals_close_on_first_false_row_and_at_end() -> None:
+    intervals = Intervals(lambda r: r["v"] > 0)
+    run(_rows([0, 1, 1, 0, 0, 1, 1, 1]), [intervals])
+    # [1, 3) and the open stretch [5, 7]
+    assert intervals.count == 2
+    assert intervals.seconds == 4.0
+
+
+def test_first_time_and_crossings() -> None:
+    first = FirstTime(lambda r: r["v"] >= 95)
+    crossings = Crossings("v", 95.0)
+    run(_rows([90, 94, 96, 94.5, math.nan, 95.5, 96]), [first, crossings])
+    assert first.t == 2.0
+    assert crossings.count == 3
+    assert crossings.first == 2.0
+
+
+def test_windows_route_rows_per_window() -> None:
+    windows = Windows(
+        [(1.0, 2.0), (4.0, 5.0), (10.0, 11.0)], lambda a, b: {"v": Stats("v")}
+    )
+    run(_rows([0, 1, 2, 3, 4, 5, 6]), [windows])
+
+    means = [accs["v"].mean for accs in windows.results]  # type: ignore[attr-defined]
+    assert means[:2] == [1.5, 4.5]
+    assert math.isnan(means[2])  # no rows: accumulators exist but are empty
+
+
+def test_accumulator_must_implement_add() -> None:
+    class NoAdd(Accumulator):
+        pass
+
+    with pytest.raises(TypeError):
+        NoAdd()  # type: ignore[abstract]
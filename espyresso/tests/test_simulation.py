@@ -0,0 +1,65 @@
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from espyresso import config
+from espyresso.simulation import Simulation
+
+
+def _session() -> Dict[str, Any]:
+    sim = Simulation()
+    trace = sim.trace(1.0)
+    warm_up = sim.warm_up()
+    sim.run_for(120)
+    settled: List[float] = [r["water"] for r in trace()[-30:]]
+    shot_seconds, grams = sim.brew()
+    return {
+        "warm_up": warm_up,
+        "settled": settled,
+        "shot_seconds": shot_seconds,
+        "grams": grams,
+        "pulses": sim.flow.get_pulse_count(),
+        "trace": trace(),
+        "sim": sim,
+    }
+
+
+def test_warm_up_and_brew_faster_than_real_time() -> None:
+    started = time.perf_counter()
+    s = _session()
+    elapsed = time.perf_counter() - started
+
+    assert 60 < s["warm_up"] < 400
+    assert all(abs(t - config.TARGET_TEMP) < 3.0 for t in s["settled"])
+    assert 15 < s["shot_seconds"] < 45
+    assert s["grams"] == 35.0
+    assert s["pulses"] > 100
+    assert s["sim"].now / elapsed > 100  # ~1100x on a desktop
+
+
+def test_simulation_is_deterministic() -> None:
+    a, b = _session(), _session()
+    assert a["trace"] == b["trace"]
+    assert a["pulses"] == b["pulses"]
+
+
+def test_steam_raises_the_setpoint_and_restores_it() -> None:
+    sim = Simulation()
+    sim.warm_up()
+    setpoints = sim.trace(0.5)
+    sim.steam(20)
+    assert max(r["setpoint"] for r in setpoints()) == config.TARGET_STEAM_TEMP
+    assert sim.temperature.pcontroller.temp_setpoint == config.TARGET_TEMP
+    assert not sim.pumping
+
+
+def test_tsic_dropout_holds_the_heater() -> None:
+    sim = Simulation()
+    sim.warm_up()
+    sim.tsic.dropout = True
+    sim.run_for(config.TSIC_STALE_SECONDS + 0.5)
+    held = sim.heater
+    sim.run_for(5)
+    assert sim.temperature.tsic_lost
+    assert sim.heater == pytest.approx(held)
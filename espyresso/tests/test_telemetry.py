@@ -0,0 +1,131 @@
+import threading
+from typing import Iterator
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from espyresso import telemetry
+from espyresso.boiler import Boiler
+from espyresso.simulation import Simulation
+from espyresso.telemetry import Snapshot, Telemetry
+from espyresso.timer import BrewingTimer
+from espyresso.utils import WaveQueue
+
+
+@pytest.fixture
+def state() -> Iterator[Telemetry]:
+    state = telemetry.init()
+    yield state
+    telemetry.shutdown()
+    state.close()
+
+
+def test_update_is_one_consistent_write(state: Telemetry) -> None:
+    version = state.version
+    state.update(flow_ml=12.5, flow_pulses=40)
+    assert state.version == version + 1
+
+    attached = Telemetry(name=state.name)
+    try:
+        read = attached.read()
+        assert read is not None
+        assert (read.flow_ml, read.flow_pulses) == (12.5, 40.0)
+        assert read.water == 0.0
+    finally:
+        attached.close()
+
+    with state.writing():
+        assert state.read_into(np.empty(state.size, np.uint8), attempts=3) is False
+    with pytest.raises(KeyError):
+        state.update(nonsense=1.0)
+
+
+def test_readers_never_see_a_torn_write(state: Telemetry) -> None:
+    done = threading.Event()
+
+    def write() -> None:
+        i = 0.0
+        while not done.is_set():
+            i += 1
+            state.update(flow_ml=i, flow_pulses=i, flow_rate=i)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(2000):
+            read = state.read()
+            if read is not None:
+                assert read.flow_ml == read.flow_pulses == read.flow_rate
+    finally:
+        done.set()
+        writer.join()
+
+
+def test_producers_publish_their_events(state: Telemetry) -> None:
+    boiler = Boiler(pigpio_pi=Mock(), reset_started_time=Mock(), add_to_queue=Mock())
+    boiler.turn_on_boiler()
+    boiler.set_value(0.25)
+    timer = BrewingTimer(flow=Mock())
+    timer.start_timer()
+
+    read = state.read()
+    assert read is not None
+    assert read.boiling == 1.0
+    assert read.boiler_pwm == 0.25
+    assert read.brew_started == timer.started
+    assert read.brew_seconds(timer.clock.now()) >= 0
+
+
+def test_snapshot_derives_times_like_the_producers() -> None:
+    snap = Snapshot(
+        brew_started=10.0,
+        pumping=1.0,
+        preinfuse_started=5.0,
+        scale_g=18.0,
+        scale_time=10.0,
+        flow_rate=2.0,
+        flow_pulse_time=11.0,
+    )
+    assert snap.brew_seconds(12.0) == 2.0
+    assert snap._replace(brew_stopped=11.5).brew_seconds(20.0) == 1.5
+    assert snap.preinfuse_seconds(12.0) == 7.0
+    assert snap._replace(pumping=0.0).preinfuse_seconds(12.0) == 0.0
+    assert snap.scale_weight(14.0) == 18.0
+    assert snap.scale_weight(16.0) == 0.0
+    assert snap.current_flow_rate(12.0) == 2.0
+    assert snap.current_flow_rate(20.0) == 0.0
+    assert Snapshot().brew_seconds(5.0) == 0.0
+
+
+def test_updates_without_a_block_are_dropped() -> None:
+    assert telemetry.get() is None
+    telemetry.update(water=50.0)
+
+
+def test_pump_routines_publish_that_they_run(state: Telemetry) -> None:
+    sim = Simulation()
+    # the steam routine pulses a pump that is already on
+    sim.pump.toggle_pump()
+    ok, _ = sim.pump.pulse_pump_steam()
+    assert ok
+    sim.run_for(1.0)
+    read = state.read()
+    assert read is not None and read.pump_active == 1.0
+    assert sim.pump.is_active()
+
+    sim.pump.stop_pump()
+    assert sim.run_until(lambda: not sim.pump.is_active(), 5.0)
+    read = state.read()
+    assert read is not None and read.pump_active == 0.0
+
+
+def test_wave_samples_signal_a_change() -> None:
+    queue = WaveQueue(0, 3, X_MIN=40, X_MAX=100, Y_MIN=0, Y_MAX=50)
+    telemetry.changed.clear()
+    queue.add_to_queue((1.0,))
+    assert telemetry.changed.is_set()
+
+    telemetry.changed.clear()
+    queue.clear()
+    assert telemetry.changed.is_set()
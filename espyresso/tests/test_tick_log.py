@@ -0,0 +1,100 @@
+"""Tests for the binary tick-log format and ``ShotLogger`` writing it."""
+
+from __future__ import annotations
+
+import io
+import math
+from pathlib import Path
+from typing import List, Tuple
+from unittest.mock import Mock
+
+import pytest
+
+from espyresso import pcontroller, tick_log
+from espyresso.clock import SimulatedClock
+from espyresso.pcontroller import PController
+from espyresso.shot_logger import ShotLogger
+
+
+def _log_ticks(
+    monkeypatch: pytest.MonkeyPatch, base_dir: Path, fmt: str, n: int = 50
+) -> Tuple[str, List[float]]:
+    clock = SimulatedClock(100.0)
+    monkeypatch.setattr("espyresso.shot_logger.time.perf_counter", clock.now)
+    p = PController(
+        initial_temperature=22.0, flow=Mock(get_flow_rate=lambda: 0.0), clock=clock
+    )
+    log = ShotLogger(str(base_dir), fmt)
+    temps = []
+    for i in range(n):
+        clock.advance(0.1)
+        temps.append(22.0 + i * 0.25)
+        p.update(temperature=temps[-1], boiling=True)
+        p.state.pwm_override = None
+        log.log_tick(p.state)
+    log.close()
+    return log.tick_path, temps
+
+
+def test_binary_shot_log_round_trip(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    path, temps = _log_ticks(monkeypatch, tmp_path, "binary")
+    assert path.endswith("-tick.bin")
+
+    rows = list(tick_log.iter_rows(path))
+    assert len(rows) == len(temps)
+    assert list(rows[0]) == ["t"] + list(pcontroller.ControllerState.FIELDS)
+    assert [r["raw_temp"] for r in rows] == pytest.approx(temps)
+    assert all(r["boiling"] == 1.0 for r in rows)
+    assert all(math.isnan(r["pwm_override"]) for r in rows)
+
+
+def test_torn_record_is_ignored_and_trimmed(tmp_path: Path) -> None:
+    path = str(tmp_path / "shot-tick.bin")
+    writer = tick_log.TickWriter(path, ("t", "a", "b"))
+    writer.write(0.1, (1.0, None))
+    writer.write(0.2, (True, 2.5))
+    writer.close()
+    with open(path, "ab") as f:
+        f.write(b"\x00\x01\x02")  # crash halfway through a record
+
+    assert [r["t"] for r in tick_log.iter_rows(path)] == [0.1, 0.2]
+
+    writer = tick_log.TickWriter(path, ("t", "a", "b"))
+    writer.write(0.3, (3.0, 3.0))
+    writer.close()
+    rows = list(tick_log.iter_rows(path))
+    assert [r["t"] for r in rows] == [0.1, 0.2, 0.3]
+    assert rows[1] == {"t": 0.2, "a": 1.0, "b": 2.5}
+
+    with pytest.raises(ValueError):
+        tick_log.TickWriter(path, ("t", "a"))
+
+
+def test_export_csv(tmp_path: Path) -> None:
+    path = str(tmp_path / "shot-tick.bin")
+    writer = tick_log.TickWriter(path, ("t", "raw_temp", "pwm_override"))
+    writer.write(0.5, (93.25, None))
+    writer.close()
+
+    out = io.StringIO()
+    assert tick_log.export_csv(path, out) == 1
+    assert out.getvalue() == "t,raw_temp,pwm_override\n0.5000,93.2500,nan\n"
+
+
+def test_load_tick_log_reads_both_formats(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    np = pytest.importorskip("numpy")
+    from espyresso.pcontroller_batch import load_tick_log
+
+    bin_path, _ = _log_ticks(monkeypatch, tmp_path / "bin", "binary")
+    csv_path, _ = _log_ticks(monkeypatch, tmp_path / "csv", "csv")
+    binary = load_tick_log(bin_path)
+    text = load_tick_log(csv_path)
+
+    assert binary["raw_temp"].dtype == np.float64
+    for name in ("raw_temp", "shellTemp", "modeledSensorTemp", "heaterPower_W"):
+        np.testing.assert_allclose(binary[name], text[name], rtol=1e-5, atol=1e-3)
+    assert len(tick_log.read_ticks(bin_path)["t"]) == len(text["t"])
@@ -1,3 +1,6 @@
+import math
+import random
+
 import pytest
 
 from espyresso import config
@@ -23,7 +26,6 @@ def test_linear_transform_outside_range_extrapolates() -> None:
 
 
 def test_queue_lower_than_min() -> None:
-
     temp_queue = WaveQueue(
         90,
         100,
@@ -40,7 +42,6 @@ def test_queue_lower_than_min() -> None:
 
 
 def test_queue_higher_than_max() -> None:
-
     temp_queue = WaveQueue(
         90,
         100,
@@ -57,7 +58,6 @@ def test_queue_higher_than_max() -> None:
 
 
 def test_queue_popping_highest() -> None:
-
     temp_queue = WaveQueue(
         90,
         100,
@@ -124,3 +124,115 @@ def test_queue_get_min_max_methods() -> None:
     # get_min/get_max consider the seed low/high too
     assert q.get_min() == 80
     assert q.get_max() == 110
+
+
+# ----------------------- ring buffer ---------------------------------- #
+
+
+def test_queue_keeps_newest_in_order_after_wrapping() -> None:
+    q = _temp_queue()
+    for i in range(q.capacity * 3 + 7):
+        q.add_to_queue((float(i), float(-i)))
+
+    newest = range(q.capacity * 2 + 7, q.capacity * 3 + 7)
+    assert len(q) == q.capacity
+    assert list(q) == [(float(i), float(-i)) for i in newest]
+    assert q[-1] == (float(newest[-1]), float(-newest[-1]))
+    assert q.values().shape == (q.capacity, 2)
+
+
+def test_queue_window_extrema_match_brute_force() -> None:
+    rng = random.Random(1)
+    q = _temp_queue()
+    for _ in range(500):
+        q.add_to_queue((rng.uniform(60, 130), rng.uniform(60, 130)))
+        values = [v for sample in q for v in sample]
+        assert q.get_min() == int(min(q.high, min(values), q.min_low))
+        assert q.get_max() == math.ceil(max(q.low, max(values), q.max_high))
+
+
+def test_queue_rejects_other_series_count() -> None:
+    q = _temp_queue()
+    q.add_to_queue((95.0, 96.0))
+    with pytest.raises(ValueError):
+        q.add_to_queue((95.0,))
+    q.clear()
+    q.add_to_queue((95.0,))
+    assert list(q) == [(95.0,)]
+
+
+def test_queue_version_changes_on_add_and_clear() -> None:
+    q = _temp_queue()
+    versions = {q.version}
+    q.add_to_queue((95.0,))
+    versions.add(q.version)
+    q.clear()
+    versions.add(q.version)
+    assert len(versions) == 3
+    assert len(q) == 0
+
+
+def test_screen_points_match_linear_transform() -> None:
+    q = _temp_queue()
+    samples = [(91.3, 70.0), (99.9, 88.8), (93.0, 96.5)]
+    for sample in samples:
+        q.add_to_queue(sample)
+
+    points = q.screen_points(q.low, q.high)
+    assert points.shape == (2, 3, 2)
+    for series in range(2):
+        expected = [
+            (
+                q.X_MIN + i * config.ZOOM,
+                round(
+                    linear_transform(sample[series], q.low, q.high, q.Y_MAX, q.Y_MIN)
+                ),
+            )
+            for i, sample in enumerate(samples)
+        ]
+        assert points[series].tolist() == [list(p) for p in expected]
+
+
+# ----------------------- axis hysteresis ------------------------------ #
+
+
+def test_queue_keeps_axis_for_small_shrink() -> None:
+    q = _temp_queue()
+    q.add_to_queue((101.0,))
+    for _ in range(q.capacity):
+        q.add_to_queue((95.0,))
+    # 101 was evicted, but the 1 degree it freed is inside the band
+    assert q.high == 101
+
+    q.add_to_queue((120.0,))
+    for _ in range(q.capacity):
+        q.add_to_queue((95.0,))
+    assert q.high == 100
+
+
+def test_queue_grows_both_ends_from_one_sample() -> None:
+    q = _temp_queue()
+    q.add_to_queue((80.0, 115.0))
+    assert (q.low, q.high) == (80, 115)
+
+
+def test_queue_axis_version_only_moves_with_range() -> None:
+    q = _temp_queue()
+    q.add_to_queue((95.0,))
+    assert q.axis_version == 0
+    q.add_to_queue((105.0,))
+    assert q.axis_version == 1
+    q.add_to_queue((104.0,))
+    assert q.axis_version == 1
+
+
+def test_queue_axis_closes_in_after_cold_start_ramp() -> None:
+    # A warm-up from room temperature: once the ramp has left the window,
+    # the axis must come back to the default range even though the band
+    # held the shrink back when the cold samples were evicted.
+    q = _temp_queue()
+    for i in range(3 * q.capacity):
+        q.add_to_queue((min(20.0 + i * 0.25, 94.0),))
+    for _ in range(q.capacity):
+        q.add_to_queue((94.0,))
+    assert (q.low, q.high) == (90, 100)
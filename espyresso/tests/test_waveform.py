@@ -0,0 +1,133 @@
+"""Tests for ``espyresso.waveform``.
+
+pygame is mocked (``conftest.py``), so these check what gets drawn and
+scrolled rather than pixels. ``pygame.Rect`` is swapped for a small real
+one because the renderer does arithmetic on it."""
+
+from __future__ import annotations
+
+from typing import Any, Iterator, List
+from unittest.mock import Mock, patch
+
+import pytest
+
+from espyresso import config
+from espyresso.utils import WaveQueue
+from espyresso.waveform import ScrollingWave
+
+
+class Rect:
+    def __init__(self, *args: Any) -> None:
+        if len(args) == 1:
+            args = tuple(args[0])
+        self.x, self.y, self.w, self.h = (int(a) for a in args)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter((self.x, self.y, self.w, self.h))
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.w, self.h
+
+    @property
+    def right(self) -> int:
+        return self.x + self.w
+
+
+@pytest.fixture
+def lines(monkeypatch: pytest.MonkeyPatch) -> Iterator[Mock]:
+    """``pygame.draw.lines``, with ``pygame.Rect`` swapped for ours."""
+    import pygame  # mocked in conftest
+
+    monkeypatch.setattr(pygame, "Rect", Rect)
+    with patch.object(pygame.draw, "lines") as lines:
+        yield lines
+
+
+def _wave() -> ScrollingWave:
+    import pygame  # with our Rect, from the fixture
+
+    queue = WaveQueue(
+        90,
+        100,
+        X_MIN=config.TEMP_X_MIN,
+        X_MAX=config.TEMP_X_MAX,
+        Y_MIN=config.TEMP_Y_MIN,
+        Y_MAX=config.TEMP_Y_MAX,
+    )
+    return ScrollingWave(
+        queue, pygame.Rect(*config.LAYOUT_TEMP_WAVE), [(0, 255, 0), (255, 0, 0)]
+    )
+
+
+def _lines(lines: Mock) -> List[List[List[int]]]:
+    """Points of each draw.lines call since the last reset, in screen
+    coordinates."""
+    x, y = config.LAYOUT_TEMP_WAVE[:2]
+    drawn = [
+        [[px + x, py + y] for px, py in call.args[3].tolist()]
+        for call in lines.call_args_list
+    ]
+    lines.reset_mock()
+    return drawn
+
+
+def test_first_draw_is_a_full_redraw(lines: Mock) -> None:
+    wave = _wave()
+    for value in (95.0, 96.0, 97.0):
+        wave.queue.add_to_queue((value, value - 2))
+
+    wave.update()
+    points = wave.queue.screen_points(wave.queue.low, wave.queue.high)
+    assert wave.redraws == 1
+    assert _lines(lines) == points.tolist()
+
+
+def test_new_sample_only_draws_its_segment(lines: Mock) -> None:
+    wave = _wave()
+    for value in (95.0, 96.0, 97.0):
+        wave.queue.add_to_queue((value, value - 2))
+    wave.update()
+    _lines(lines)
+
+    wave.queue.add_to_queue((98.0, 96.0))
+    wave.update()
+    points = wave.queue.screen_points(wave.queue.low, wave.queue.high)
+    assert wave.redraws == 1
+    assert wave.scrolls == 0
+    assert _lines(lines) == points[:, -2:].tolist()
+
+
+def test_full_window_scrolls_left(lines: Mock) -> None:
+    wave = _wave()
+    queue = wave.queue
+    for i in range(queue.capacity):
+        queue.add_to_queue((95.0 + i % 3,))
+    wave.update()
+    _lines(lines)
+
+    queue.add_to_queue((97.0,))
+    queue.add_to_queue((95.0,))
+    with patch.object(wave.surface, "scroll") as scroll:
+        wave.update()
+    scroll.assert_called_once_with(-2 * config.ZOOM, 0)
+    points = queue.screen_points(queue.low, queue.high)
+    assert _lines(lines) == points[:, -3:].tolist()
+    assert wave.redraws == 1
+
+
+def test_range_change_and_clear_redraw(lines: Mock) -> None:
+    wave = _wave()
+    wave.queue.add_to_queue((95.0,))
+    wave.update()
+    wave.update()
+    assert wave.redraws == 1
+
+    wave.queue.add_to_queue((120.0,))
+    wave.update()
+    assert wave.redraws == 2
+
+    wave.queue.clear()
+    wave.queue.add_to_queue((95.0,))
+    wave.update()
+    assert wave.redraws == 3
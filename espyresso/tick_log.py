@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Binary tick-log format: a fixed-schema header plus packed records.
+
+Layout of a ``shot-<ts>-tick.bin`` file::
+
+    b"ESPTICK\\x01"                      magic + version
+    uint32 little-endian                 length of the JSON header
+    {"columns": [...], "format": "<d..."} JSON, space-padded so the
+                                         records start 8-byte aligned
+    record, record, ...                  struct.pack(format, t, *values)
+
+The first column is always ``t`` (float64 seconds); every other column is
+a little-endian float32, with None stored as NaN and booleans as 0/1.
+Records are only ever appended whole, so after a crash the worst case is
+a torn last record, which readers ignore and ``TickWriter`` trims before
+appending to an existing file.
+
+Writing and ``iter_rows`` / ``export_csv`` are stdlib only, so they run on
+the Pi; ``read_ticks`` memory-maps the file into numpy arrays and needs
+numpy only when called.
+"""
+import json
+import math
+import os
+import struct
+from typing import IO, Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+MAGIC = b"ESPTICK\x01"
+_LENGTH = struct.Struct("<I")
+_ALIGN = 8
+
+
+def record_format(columns: Sequence[str]) -> str:
+    return "<d" + "f" * (len(columns) - 1)
+
+
+def _encode_header(columns: Sequence[str]) -> bytes:
+    meta = json.dumps({"columns": list(columns), "format": record_format(columns)})
+    prefix = len(MAGIC) + _LENGTH.size
+    meta += " " * (-(prefix + len(meta)) % _ALIGN)
+    return MAGIC + _LENGTH.pack(len(meta)) + meta.encode()
+
+
+def read_header(f: IO[bytes]) -> Tuple[List[str], struct.Struct, int]:
+    """Columns, record struct and data offset of an open tick file."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{getattr(f, 'name', f)} is not a binary tick log")
+    (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+    meta = json.loads(f.read(length))
+    return meta["columns"], struct.Struct(meta["format"]), f.tell()
+
+
+class TickWriter:
+    """Appends one packed record per tick.
+
+    Opening an existing file with the same columns appends to it (after
+    trimming a torn last record); different columns raise ValueError."""
+
+    def __init__(
+        self, path: str, columns: Sequence[str], buffering: int = 8192
+    ) -> None:
+        if not columns or columns[0] != "t":
+            raise ValueError("the first tick-log column must be 't'")
+        self.path = path
+        self.columns = list(columns)
+        self._record = struct.Struct(record_format(columns))
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "r+b") as f:
+                existing, record, offset = read_header(f)
+                if existing != self.columns:
+                    raise ValueError(f"{path} has different columns")
+                size = os.path.getsize(path)
+                f.truncate(size - (size - offset) % record.size)
+            self._file = open(path, "ab", buffering=buffering)
+        else:
+            self._file = open(path, "wb", buffering=buffering)
+            self._file.write(_encode_header(columns))
+            self._file.flush()
+
+    def write(self, t: float, values: Iterable[Any]) -> None:
+        self._file.write(
+            self._record.pack(t, *[math.nan if v is None else v for v in values])
+        )
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, float]]:
+    """Yield every complete record as a ``{column: value}`` dict."""
+    with open(path, "rb") as f:
+        columns, record, _ = read_header(f)
+        while True:
+            chunk = f.read(record.size * 1024)
+            usable = len(chunk) - len(chunk) % record.size
+            for values in record.iter_unpack(chunk[:usable]):
+                yield dict(zip(columns, values))
+            if len(chunk) < record.size * 1024:
+                return
+
+
+def read_ticks(path: str) -> Dict[str, Any]:
+    """Memory-map a tick file as one numpy array per column.
+
+    The arrays are read-only views into the file (float64 ``t``, float32
+    for the rest); nothing is loaded until it is used."""
+    import numpy as np
+
+    with open(path, "rb") as f:
+        columns, record, offset = read_header(f)
+    dtype = np.dtype(
+        [(name, "<f8" if i == 0 else "<f4") for i, name in enumerate(columns)]
+    )
+    count = (os.path.getsize(path) - offset) // record.size
+    if count == 0:
+        return {name: np.empty(0, dtype=dtype[name]) for name in columns}
+    data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+    return {name: data[name] for name in columns}
+
+
+def _fmt(v: float) -> str:
+    if math.isnan(v):
+        return "nan"
+    return f"{v:.4f}"
+
+
+def export_csv(path: str, out: IO[str]) -> int:
+    """Write a binary tick log as CSV with the same columns as the csv
+    format (None is written as nan). Returns the number of rows."""
+    with open(path, "rb") as f:
+        columns, _, _ = read_header(f)
+    out.write(",".join(columns) + "\n")
+    rows = 0
+    for row in iter_rows(path):
+        out.write(",".join(_fmt(v) for v in row.values()) + "\n")
+        rows += 1
+    return rows
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import logging
 import threading
-import time
 from typing import TYPE_CHECKING, Any, Optional
 
+from espyresso import telemetry
+from espyresso.clock import SYSTEM_CLOCK, Clock
+
 logger = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
@@ -11,9 +13,8 @@ if TYPE_CHECKING:
 
 
 class Timer:
-    def __init__(
-        self,
-    ) -> None:
+    def __init__(self, clock: Clock = SYSTEM_CLOCK) -> None:
+        self.clock = clock
         self.started: Optional[float] = None
         self.stopped: Optional[float] = None
 
@@ -21,7 +22,7 @@ class Timer:
         if self.stopped and self.started:
             return self.stopped - self.started
         if self.started:
-            return time.perf_counter() - self.started
+            return self.clock.now() - self.started
         return 0
 
     def timer_running(self) -> bool:
@@ -29,10 +30,10 @@ class Timer:
 
     def start_timer(self) -> None:
         self.stopped = None
-        self.started = time.perf_counter()
+        self.started = self.clock.now()
 
     def stop_timer(self, *, subtract_time: int = 0) -> None:
-        self.stopped = time.perf_counter() - subtract_time
+        self.stopped = self.clock.now() - subtract_time
 
     def reset_timer(self) -> None:
         self.started = None
@@ -40,10 +41,13 @@ class Timer:
 
 
 class BrewingTimer(threading.Thread):
-    def __init__(self, flow: "Flow", *args: Any, **kwargs: Any) -> None:
+    def __init__(
+        self, flow: "Flow", *args: Any, clock: Clock = SYSTEM_CLOCK, **kwargs: Any
+    ) -> None:
         self._stop_event = threading.Event()
 
         self.flow = flow
+        self.clock = clock
         self.enable_automatic_timing_flag = True
         self.started: Optional[float] = None
         self.stopped: Optional[float] = None
@@ -53,7 +57,7 @@ class BrewingTimer(threading.Thread):
         if self.stopped and self.started:
             return self.stopped - self.started
         if self.started:
-            return time.perf_counter() - self.started
+            return self.clock.now() - self.started
         return 0
 
     def disable_automatic_timing(self) -> None:
@@ -64,24 +68,32 @@ class BrewingTimer(threading.Thread):
 
     def get_time_since_stopped(self) -> float:
         if self.stopped:
-            return time.perf_counter() - self.stopped
+            return self.clock.now() - self.stopped
         return 999999
 
     def timer_running(self) -> bool:
         return bool(self.started and not self.stopped)
 
+    def _publish(self) -> None:
+        telemetry.update(
+            brew_started=self.started or 0.0, brew_stopped=self.stopped or 0.0
+        )
+
     def start_timer(self) -> None:
         logger.debug("Starting timer")
         self.stopped = None
-        self.started = time.perf_counter()
+        self.started = self.clock.now()
+        self._publish()
 
     def stop_timer(self, *, subtract_time: float = 0) -> None:
         logger.debug("Stopping timer")
-        self.stopped = time.perf_counter() - subtract_time
+        self.stopped = self.clock.now() - subtract_time
+        self._publish()
 
     def reset_timer(self) -> None:
         self.started = None
         self.stopped = None
+        self._publish()
 
     def stop(self) -> None:
         logger.debug("Brewingtimer stopping")
@@ -90,27 +102,30 @@ class BrewingTimer(threading.Thread):
 
     def run(self) -> None:
         while not self._stop_event.is_set():
-
-            # Skip timer thread while automatic pumping e.g. brew shot routine
-            if not self.enable_automatic_timing_flag:
-                time.sleep(1)
-                continue
-
-            time_since_last_pulse = time.perf_counter() - self.flow.prev_pulse_time
-            if (
-                not self.timer_running()
-                and (self.get_time_since_stopped() > 3)
-                and time_since_last_pulse
-                and time_since_last_pulse < 1
-            ):
-                self.flow.reset_pulse_count()
-                self.start_timer()
-
-            elif (
-                self.timer_running()
-                and time_since_last_pulse
-                and time_since_last_pulse > 1
-            ):
-                self.stop_timer(subtract_time=time_since_last_pulse)
-
-            time.sleep(0.2)
+            self.clock.sleep(self.poll())
+
+    def poll(self) -> float:
+        """Start or stop the timer from the flow meter's pulses; returns the
+        seconds until the next poll."""
+        # Skip timer thread while automatic pumping e.g. brew shot routine
+        if not self.enable_automatic_timing_flag:
+            return 1
+
+        time_since_last_pulse = self.clock.now() - self.flow.prev_pulse_time
+        if (
+            not self.timer_running()
+            and (self.get_time_since_stopped() > 3)
+            and time_since_last_pulse
+            and time_since_last_pulse < 1
+        ):
+            self.flow.reset_pulse_count()
+            self.start_timer()
+
+        elif (
+            self.timer_running()
+            and time_since_last_pulse
+            and time_since_last_pulse > 1
+        ):
+            self.stop_timer(subtract_time=time_since_last_pulse)
+
+        return 0.2
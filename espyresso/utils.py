@@ -1,29 +1,58 @@
 import math
 from collections import deque
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, Deque, Iterator, List, Optional, Tuple
 
-from espyresso.config import ZOOM
+import numpy as np
 
+from espyresso import telemetry
+from espyresso.config import AXIS_HYSTERESIS, ZOOM
+from espyresso.history import History
+
+
+class WaveQueue:
+    """The newest samples of one chart, oldest first.
+
+    A sample is a tuple with one value per series, e.g. the thermal masses.
+    Samples live in a float array preallocated on the first add, written
+    twice (at ``i`` and ``i + ring``) so the window is always one
+    contiguous slice: adding is O(1), and ``screen_points`` maps the whole
+    window to pixels in one vectorized step. One slot beyond the window is
+    kept free, so the control thread writes a new sample where a display
+    thread holding the previous window never reads.
+
+    ``low``/``high`` (the y range) grow to take in every new sample and
+    shrink back when the extremes leave the window, but only by at least
+    ``hysteresis`` of the span, so the axis doesn't thrash. The window's
+    minimum and maximum are kept in monotonic deques, so
+    ``get_min``/``get_max`` are O(1) rather than a rescan of every sample
+    and series. ``version`` changes on every add and clear and
+    ``axis_version`` whenever ``low``/``high`` move, for redraw checks.
+
+    With a ``history`` every sample is also kept, downsampled, for
+    zoomed-out views (``espyresso.history``)."""
 
-class WaveQueue(deque):  # type: ignore
     def __init__(
         self,
         low: int,
         high: int,
-        *args: Any,
+        *,
         X_MIN: int,
         X_MAX: int,
         Y_MIN: int,
         Y_MAX: int,
         steps: int = 10,
         target_y: Optional[float] = None,
-        **kwargs: Any,
+        hysteresis: float = AXIS_HYSTERESIS,
+        history: Optional[History] = None,
     ) -> None:
         self.low = low
         self.high = high
         self.min_low = low
         self.max_high = high
         self.steps = steps
+        self.hysteresis = hysteresis
+        # long-range copy of every sample; survives clear()
+        self.history = history
         self.target_y = target_y
         self.X_MIN = X_MIN
         self.X_MAX = X_MAX
@@ -32,50 +61,149 @@ class WaveQueue(deque):  # type: ignore
         self.queue_labels: List[str] = []
 
         self.length = X_MAX - X_MIN
-        return super().__init__(*args, **kwargs)
+        self.capacity = max(1, math.ceil(self.length / ZOOM))
+        self._ring = self.capacity + 1
+        self._data: Optional["np.ndarray[Any, Any]"] = None
+        # (start, count, samples added so far) of the published window,
+        # replaced in one store
+        self._window = (0, 0, 0)
+        self._added = 0
+        # (sample number, value) with increasing mins / decreasing maxes
+        self._mins: Deque[Tuple[int, float]] = deque()
+        self._maxs: Deque[Tuple[int, float]] = deque()
+        self.version = 0
+        self.axis_version = 0
 
     def set_labels(self, labels: List[str]) -> None:
         self.queue_labels = labels
 
+    def __len__(self) -> int:
+        return self._window[1]
+
+    def __getitem__(self, index: int) -> Tuple[float, ...]:
+        start, count, _ = self._window
+        if index < 0:
+            index += count
+        if not 0 <= index < count or self._data is None:
+            raise IndexError("WaveQueue index out of range")
+        return tuple(self._data[start + index].tolist())
+
+    def __iter__(self) -> Iterator[Tuple[float, ...]]:
+        return iter([tuple(row) for row in self.values().tolist()])
+
+    def values(self) -> "np.ndarray[Any, Any]":
+        """The window as a (samples, series) array view; don't modify it."""
+        return self.snapshot()[1]
+
+    def snapshot(self) -> Tuple[int, "np.ndarray[Any, Any]"]:
+        """The number of samples added so far and ``values()``, both from
+        the same published window even while the producer adds more."""
+        start, count, end = self._window
+        if self._data is None:
+            return end, np.empty((0, 0))
+        return end, self._data[start : start + count]
+
+    def clear(self) -> None:
+        self._window = (0, 0, self._added)
+        self._mins.clear()
+        self._maxs.clear()
+        self.version += 1
+        telemetry.notify()
+
     def get_min(self) -> int:
-        min_val: Union[int, float] = self.high
-        for val in self:
-            new_min = min(val)
-            if new_min < min_val:
-                min_val = new_min
-        return int(min(min_val, self.min_low))
+        window_min = self._mins[0][1] if self._mins else self.high
+        return int(min(self.high, window_min, self.min_low))
 
     def get_max(self) -> int:
-        max_val: Union[int, float] = self.low
-        for val in self:
-            new_max = max(val)
-            if new_max > max_val:
-                max_val = new_max
-        return math.ceil(max(max_val, self.max_high))
+        window_max = self._maxs[0][1] if self._maxs else self.low
+        return math.ceil(max(self.low, window_max, self.max_high))
+
+    def _push(self, new_value: Tuple[float, ...]) -> None:
+        """Write ``new_value`` after the window, dropping the oldest sample
+        when full."""
+        start, count, _ = self._window
+        data = self._data
+        if data is None or (count == 0 and data.shape[1] != len(new_value)):
+            data = self._data = np.empty((2 * self._ring, len(new_value)))
+        elif data.shape[1] != len(new_value):
+            raise ValueError(
+                f"WaveQueue holds {data.shape[1]} series, got {len(new_value)}"
+            )
+
+        if count >= self.capacity:
+            oldest = self._added - count
+            if self._mins[0][0] == oldest:
+                self._mins.popleft()
+            if self._maxs[0][0] == oldest:
+                self._maxs.popleft()
+            start = (start + 1) % self._ring
+            count -= 1
+
+        slot = (start + count) % self._ring
+        data[slot] = new_value
+        data[slot + self._ring] = new_value
+        self._window = (start, count + 1, self._added + 1)
+        self.version += 1
 
-    def add_to_queue(self, new_value: Tuple[float, ...]) -> None:
-        popped = None
-        if len(self) >= self.length / ZOOM:
-            popped = self.popleft()
+        new_low = min(new_value)
+        new_high = max(new_value)
+        mins, maxs = self._mins, self._maxs
+        while mins and mins[-1][1] >= new_low:
+            mins.pop()
+        mins.append((self._added, new_low))
+        while maxs and maxs[-1][1] <= new_high:
+            maxs.pop()
+        maxs.append((self._added, new_high))
+        self._added += 1
 
-        self.append(new_value)
+    def add_to_queue(self, new_value: Tuple[float, ...]) -> None:
+        self._push(new_value)
+        if self.history is not None:
+            self.history.add(new_value)
+        low, high = self.low, self.high
 
         new_high = max(new_value)
         new_low = min(new_value)
-        if new_high > self.high:
-            self.high = int(math.ceil(new_high))
-        elif new_low < self.low:
-            self.low = int(new_low)
-
-        if not popped:
-            return
-
-        if int(min(popped)) <= self.low:
-            self.low = self.get_min()
-
-        if math.ceil(max(popped)) >= self.high:
-            self.high = self.get_max()
-        # self.high = int(self.get_max())
+        if new_high > high:
+            high = int(math.ceil(new_high))
+        if new_low < low:
+            low = int(new_low)
+
+        # Growing happened above. Check the fit on every add, not just when
+        # an extreme is evicted, so a shrink the band held back still lands
+        # once the window has moved far enough; both lookups are O(1).
+        band = self.hysteresis * (high - low)
+        fitted = self.get_min()
+        if fitted < low or fitted - low >= band:
+            low = fitted
+        fitted = self.get_max()
+        if fitted > high or high - fitted >= band:
+            high = fitted
+
+        if (low, high) != (self.low, self.high):
+            self.low, self.high = low, high
+            self.axis_version += 1
+        telemetry.notify()
+
+    def screen_points(
+        self,
+        low: float,
+        high: float,
+        values: Optional["np.ndarray[Any, Any]"] = None,
+    ) -> "np.ndarray[Any, Any]":
+        """Pixel coordinates of the window (or of ``values``, a snapshot
+        of it) for y range ``low``..``high``, as a (series, samples, 2) int
+        array; each ``points[i]`` can go straight to ``pygame.draw.lines``.
+        Same mapping as ``linear_transform`` plus ``round``, one ZOOM step
+        per sample."""
+        if values is None:
+            values = self.values()
+        count = len(values)
+        points = np.empty((values.shape[1], count, 2), dtype=np.int32)
+        points[:, :, 0] = self.X_MIN + np.arange(count) * ZOOM
+        scale = (self.Y_MIN - self.Y_MAX) / ((high - low) or 1)
+        points[:, :, 1] = np.rint((values.T - low) * scale + self.Y_MAX)
+        return points
 
 
 def linear_transform(x: float, a: float, b: float, c: float, d: float) -> float:
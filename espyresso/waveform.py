@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Scrolling off-screen plot of a ``WaveQueue``.
+
+Redrawing a wave zone used to mean every polyline point of every series
+on every new sample. ``ScrollingWave`` keeps the lines on a surface of its
+own instead: when samples are added it scrolls the plot left by ``ZOOM``
+pixels per sample that fell out of the window and draws only the new
+segments, so a frame costs one short line per series and a blit. The
+whole plot is only redrawn when the y range (``low``/``high``) changes,
+the queue was cleared, or more samples arrived than fit on screen.
+
+The surface is colour-keyed on the background, so the display blits it
+over the axis and grid and the lines stay on top, as before.
+"""
+from typing import Any, Optional, Sequence, Tuple
+
+import pygame
+
+from espyresso.config import ZOOM
+from espyresso.utils import WaveQueue
+
+Color = Tuple[int, int, int]
+
+
+class ScrollingWave:
+    def __init__(
+        self,
+        queue: WaveQueue,
+        rect: pygame.Rect,
+        colors: Sequence[Color],
+        background: Color = (0, 0, 0),
+    ) -> None:
+        self.queue = queue
+        self.rect = pygame.Rect(rect)
+        self.colors = colors
+        self.background = background
+        self.surface = pygame.Surface(self.rect.size)
+        self.surface.set_colorkey(background)
+        # Scrolling and drawing stay inside the plot columns; the axis
+        # labels left of X_MIN are the display's.
+        self.clip = pygame.Rect(
+            queue.X_MIN - self.rect.x, 0, queue.X_MAX - queue.X_MIN, self.rect.h
+        )
+        self.surface.set_clip(self.clip)
+        self.surface.fill(background)
+
+        self._end: Optional[int] = None
+        self._count = 0
+        self._range: Optional[Tuple[int, int]] = None
+        self.redraws = 0
+        self.scrolls = 0
+
+    def update(self) -> None:
+        """Bring the plot up to date with the queue."""
+        queue = self.queue
+        end, values = queue.snapshot()
+        value_range = (queue.low, queue.high)
+        count = len(values)
+        if end == self._end and value_range == self._range and count == self._count:
+            return
+
+        added = end - self._end if self._end is not None else count
+        expected = min(queue.capacity, self._count + added)
+        if value_range != self._range or added >= count or count != expected:
+            self._redraw(values, value_range)
+        else:
+            self._append(values, added, value_range)
+        self._end, self._count, self._range = end, count, value_range
+
+    @property
+    def value_range(self) -> Tuple[int, int]:
+        """``(low, high)`` the plot was last drawn for."""
+        if self._range is None:
+            return self.queue.low, self.queue.high
+        return self._range
+
+    def draw(self, screen: Any) -> None:
+        self.update()
+        screen.blit(self.surface, self.rect)
+
+    def _points(self, values: Any, value_range: Tuple[int, int], first: int = 0) -> Any:
+        """Surface coordinates of ``values``, the first being sample
+        ``first`` of the window."""
+        points = self.queue.screen_points(*value_range, values=values)
+        points[:, :, 0] += first * ZOOM - self.rect.x
+        points[:, :, 1] -= self.rect.y
+        return points
+
+    def _draw_lines(self, points: Any) -> None:
+        for i, series in enumerate(points):
+            if len(series) >= 2:
+                pygame.draw.lines(self.surface, self.colors[i], False, series)
+
+    def _redraw(self, values: Any, value_range: Tuple[int, int]) -> None:
+        self.redraws += 1
+        self.surface.fill(self.background)
+        if len(values):
+            self._draw_lines(self._points(values, value_range))
+
+    def _append(self, values: Any, added: int, value_range: Tuple[int, int]) -> None:
+        # Samples that fell out of the window move everything left; the
+        # newest point that is already drawn ends up at ``first``.
+        dropped = self._count + added - len(values)
+        first = len(values) - 1 - added
+        if dropped:
+            self.scrolls += 1
+            self.surface.scroll(-dropped * ZOOM, 0)
+        # scroll leaves the vacated columns as they were
+        right_of = self.clip.x + first * ZOOM + 1
+        self.surface.fill(
+            self.background,
+            pygame.Rect(right_of, 0, self.clip.right - right_of, self.rect.h),
+        )
+        self._draw_lines(self._points(values[first:], value_range, first))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Record the shots of existing shot logs in the shot database.
+
+Usage:
+    python3 tools/backfill_shot_db.py                  # log/ -> config.SHOT_DB_FILE
+    python3 tools/backfill_shot_db.py log/ --db shots.sqlite3
+
+Every shot-<ts>-tick.bin / .csv with its shot-<ts>-event.csv is replayed
+through the same ShotRecorder ShotLogger uses live. Sessions already in
+the database (backfilled before, or recorded live) are skipped, so the
+tool can be rerun after copying new logs over.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from espyresso import config  # noqa: E402
+from espyresso.shot_db import ShotDB, backfill, session_of  # noqa: E402
+
+
+def main(argv: List[str]) -> None:
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument("log_dir", nargs="?", default=config.LOG_SHOT_DIR)
+    p.add_argument("--db", default=config.SHOT_DB_FILE)
+    args = p.parse_args(argv)
+    if not args.db:
+        sys.exit("no database: pass --db or set config.SHOT_DB_FILE")
+
+    db = ShotDB(args.db)
+    started = time.perf_counter()
+    sessions = shots = 0
+    for tick_path in sorted(
+        glob.glob(os.path.join(args.log_dir, "shot-*-tick.bin"))
+        + glob.glob(os.path.join(args.log_dir, "shot-*-tick.csv"))
+    ):
+        try:
+            session, _ = session_of(tick_path)
+        except ValueError:
+            print(f"skipping {tick_path}: unexpected name")
+            continue
+        if db.has_session(session):
+            continue
+        event_path = tick_path[: -len("-tick.csv")] + "-event.csv"
+        try:
+            added = backfill(db, tick_path, event_path)
+        except (OSError, ValueError) as e:
+            print(f"skipping {tick_path}: {e}")
+            continue
+        print(f"{session}: {added} shots")
+        sessions += 1
+        shots += added
+    db.close()
+    print(
+        f"{shots} shots from {sessions} sessions into {args.db} "
+        f"in {time.perf_counter() - started:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
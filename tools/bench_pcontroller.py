@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Measure the per-tick cost of the controller hot path.
+
+Usage:
+    python3 tools/bench_pcontroller.py                # 20000 ticks
+    python3 tools/bench_pcontroller.py --ticks 5000 --no-log
+    python3 tools/bench_pcontroller.py --log-format csv   # text tick log
+    python3 tools/bench_pcontroller.py --horizon 30       # receding-horizon mode
+
+Runs exactly what Temperature.control_step does every control tick:
+PController.update, ShotLogger.log_tick (plus its share of the writer
+thread's work) and the temp wave-queue append, driven with a fake clock
+and flow meter. Reports the time per tick and, under tracemalloc, the
+memory each tick leaves behind and the peak it needs while running. The
+queued tick-log rows are the only thing expected to show up as transient
+memory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from espyresso import config  # noqa: E402
+from espyresso.pcontroller import PController  # noqa: E402
+from espyresso.shot_logger import ShotLogger  # noqa: E402
+from espyresso.utils import WaveQueue  # noqa: E402
+
+# Let the first rows open files, fill caches and grow the wave queue to
+# its full length before measuring.
+WARMUP_TICKS = 500
+# The shot logger's writer thread drains once a second, i.e. every 10
+# ticks at the 10 Hz control rate; the bench drains inline at the same
+# ratio so the writing cost is counted too.
+FLUSH_EVERY = 10
+
+
+def _run(ticks: int, log: bool, log_format: str) -> None:
+    now = [0.0]
+    # Fake clock for the controller only; the timing below uses the real one.
+    clock = SimpleNamespace(now=lambda: now[0])
+    # Not a Mock: Mock keeps every call and would show up as retained memory.
+    flow = SimpleNamespace(get_flow_rate=lambda: 0.0)
+    controller = PController(
+        initial_temperature=22.0, flow=flow, clock=clock  # type: ignore[arg-type]
+    )
+    queue = WaveQueue(
+        90,
+        100,
+        X_MIN=config.TEMP_X_MIN,
+        X_MAX=config.TEMP_X_MAX,
+        Y_MIN=config.TEMP_Y_MIN,
+        Y_MAX=config.TEMP_Y_MAX,
+        target_y=config.TARGET_TEMP,
+    )
+    temps: List[float] = [22.0 + min(i * 0.05, 75.0) for i in range(ticks)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shot_log = ShotLogger(tmp, log_format) if log else None
+
+        ticks_done = [0]
+
+        def tick(temp: float) -> None:
+            now[0] += 0.1
+            controller.update(temperature=temp, boiling=True)
+            state = controller.state
+            if shot_log is not None:
+                state.pwm_override = None
+                shot_log.log_tick(state)
+                ticks_done[0] += 1
+                if ticks_done[0] % FLUSH_EVERY == 0:
+                    shot_log.flush()
+            queue.add_to_queue(state.masses())
+
+        for temp in islice(temps, WARMUP_TICKS):
+            tick(temp)
+
+        started = time.perf_counter()
+        for temp in islice(temps, WARMUP_TICKS, None):
+            tick(temp)
+        elapsed = time.perf_counter() - started
+        measured = ticks - WARMUP_TICKS
+        print(f"time      {elapsed / measured * 1e6:8.1f} µs/tick")
+
+        tracemalloc.start()
+        for temp in islice(temps, WARMUP_TICKS):
+            tick(temp)
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for temp in islice(temps, WARMUP_TICKS, None):
+            tick(temp)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"retained  {(after - before) / measured:8.1f} B/tick")
+        print(f"peak      {peak - before:8d} B above steady state")
+
+        if shot_log is not None:
+            shot_log.close()
+
+
+def main(argv: List[str]) -> None:
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument("--ticks", type=int, default=20000)
+    p.add_argument("--no-log", action="store_true", help="skip ShotLogger")
+    p.add_argument(
+        "--log-format", choices=("binary", "csv"), default=config.LOG_SHOT_FORMAT
+    )
+    p.add_argument(
+        "--horizon",
+        type=int,
+        default=config.MPC_HORIZON_STEPS,
+        help="MPC_HORIZON_STEPS (0: single-step power law)",
+    )
+    args = p.parse_args(argv)
+    if args.ticks <= WARMUP_TICKS:
+        sys.exit(f"--ticks must be more than {WARMUP_TICKS}")
+    config.MPC_HORIZON_STEPS = args.horizon
+    _run(args.ticks, log=not args.no_log, log_format=args.log_format)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
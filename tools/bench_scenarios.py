@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Score the controller on the canned scenarios and flag regressions.
+
+Usage:
+    python3 tools/bench_scenarios.py                     # every scenario
+    python3 tools/bench_scenarios.py cold_start --runs 3
+    python3 tools/bench_scenarios.py --baseline 1a2b3c4  # compare to a commit
+    python3 tools/bench_scenarios.py --no-save           # don't record this run
+
+Runs the scenarios of espyresso.benchmark on the simulated machine and
+prints their scores. Each run is appended to the history file (one JSON
+object per scenario and run, tagged with the git commit) and compared to
+the newest earlier result of the same scenario from another commit, or
+from a clean tree when this one has uncommitted changes. Exits with 1 if
+any score got worse by more than benchmark.TOLERANCES, so it can gate CI.
+
+With --runs N the CPU-time scores are the best of N; the temperature
+scores don't change between runs.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from espyresso import benchmark  # noqa: E402
+
+HISTORY_FILE = "log/bench-scenarios.jsonl"
+TIMING = ("update_us", "update_p99_us", "wall_s")
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ("git",) + args, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _revision() -> Tuple[str, bool]:
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return commit, dirty
+
+
+def _load(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path) as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue  # torn last line of an interrupted run
+    return rows
+
+
+def _baseline(
+    history: List[Dict[str, Any]],
+    scenario: str,
+    commit: str,
+    dirty: bool,
+    ref: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    for row in reversed(history):
+        if row.get("scenario") != scenario:
+            continue
+        if ref is not None:
+            if row.get("commit", "").startswith(ref):
+                return row
+        elif row.get("commit") != commit or (dirty and not row.get("dirty")):
+            return row
+    return None
+
+
+def _run(name: str, runs: int) -> Dict[str, float]:
+    result = benchmark.run_scenario(name)
+    for _ in range(runs - 1):
+        again = benchmark.run_scenario(name)
+        for key in TIMING:
+            result[key] = min(result[key], again[key])
+    return result
+
+
+def _fmt(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "-"
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def main(argv: List[str]) -> None:
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument("scenarios", nargs="*", help=", ".join(benchmark.SCENARIOS))
+    p.add_argument("--runs", type=int, default=1)
+    p.add_argument("--history", default=HISTORY_FILE)
+    p.add_argument("--baseline", help="commit to compare to (prefix)")
+    p.add_argument("--no-save", action="store_true")
+    args = p.parse_args(argv)
+    names = args.scenarios or list(benchmark.SCENARIOS)
+    unknown = set(names) - set(benchmark.SCENARIOS)
+    if unknown:
+        p.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    commit, dirty = _revision()
+    history = _load(args.history)
+    rows = []
+    failed = False
+    for name in names:
+        result = _run(name, max(args.runs, 1))
+        base = _baseline(history, name, commit, dirty, args.baseline)
+        print(f"{name} ({result['sim_s']:.0f} s simulated in {result['wall_s']:.2f} s)")
+        for key in benchmark.SCORES + ("shots",):
+            was = "" if base is None else f"  (was {_fmt(base.get(key))})"
+            print(f"  {key:14} {_fmt(result[key]):>10}{was}")
+        if base is not None:
+            regressions = benchmark.compare(result, base)
+            for line in regressions:
+                print(f"  REGRESSION vs {base['commit']}: {line}")
+            failed = failed or bool(regressions)
+        rows.append(
+            dict(
+                result,
+                scenario=name,
+                commit=commit,
+                dirty=dirty,
+                time=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            )
+        )
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+        with open(args.history, "a") as f:
+            for row in rows:
+                # NaN isn't JSON; an unreached warm-up is stored as null
+                clean = {
+                    k: None if isinstance(v, float) and math.isnan(v) else v
+                    for k, v in row.items()
+                }
+                f.write(json.dumps(clean) + "\n")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Fit the MPC thermal constants in espyresso/config.py to recorded ticks.
+
+Usage:
+    python3 tools/calibrate_mpc.py log/                       # all tick logs
+    python3 tools/calibrate_mpc.py log/shot-a-tick.bin log/shot-b-tick.csv
+    python3 tools/calibrate_mpc.py log/ --params SENSOR_XFER_COEFF MPC_SMOOTHING
+    python3 tools/calibrate_mpc.py log/ --dry-run             # print, don't write
+
+Every candidate parameter set is scored by replaying all logs through the
+controller equations (espyresso.pcontroller_batch, the same model_step the
+live PController runs) and measuring how well the model predicts the
+sensor: the RMS of raw_temp minus modeledSensorTemp *before* the
+MPC_SMOOTHING correction nudges the model towards the reading. Scoring
+after the correction would reward ever larger MPC_SMOOTHING, which just
+makes the model copy the sensor noise. The model is driven with the
+logged heaterPower_W, the power the boiler was actually given (with
+feed-forward and the horizon planner), not with what the candidate's own
+heater_step would have asked for.
+
+The search is a pattern search: each round evaluates every parameter
+scaled up and down by its current step, in parallel across all cores,
+moves to the best improvement, and halves the steps when nothing
+improves. Parameters are kept within --span of their starting value.
+
+The search starts from the current profile, if there is one. The result
+is written as a JSON profile (config.MPC_PROFILE_FILE by default) that
+the app loads on start-up.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from espyresso import config  # noqa: E402
+from espyresso.pcontroller import model_params  # noqa: E402
+from espyresso.pcontroller_batch import (  # noqa: E402
+    STATE_COLUMNS,
+    load_tick_log,
+    replay_ticks,
+)
+
+DEFAULT_PARAMS = (
+    "BOILER_WATER_XFER_COEFF_NOFLOW",
+    "ELEMENT_SHELL_XFER_COEFF",
+    "BOILER_BREWHEAD_XFER_COEFF",
+    "BOILER_BODY_XFER_COEFF",
+    "SENSOR_XFER_COEFF",
+)
+
+# Logs shorter than this (a few seconds of ticks) carry no thermal signal.
+MIN_ROWS = 50
+
+# Per-process copy of the traces, loaded once by the pool initializer so
+# each candidate only ships a small dict of parameters to the worker.
+_TRACES: List[Dict[str, "np.ndarray[Any, Any]"]] = []
+
+
+def _find_logs(paths: Sequence[str]) -> List[str]:
+    out: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            out.extend(
+                sorted(
+                    glob.glob(os.path.join(path, "shot-*-tick.bin"))
+                    + glob.glob(os.path.join(path, "shot-*-tick.csv"))
+                )
+            )
+        else:
+            out.append(path)
+    return out
+
+
+def _load(paths: Sequence[str]) -> List[Dict[str, "np.ndarray[Any, Any]"]]:
+    traces = []
+    for path in paths:
+        trace = load_tick_log(path)
+        required = ("raw_temp", "deltaTime", "flow_rate", "boiling") + STATE_COLUMNS
+        if len(trace.get("raw_temp", ())) < MIN_ROWS or not all(
+            name in trace for name in required
+        ):
+            print(f"skipping {path}: too short or missing model columns")
+            continue
+        traces.append(trace)
+    return traces
+
+
+def _init_worker(paths: Sequence[str]) -> None:
+    global _TRACES
+    # spawned workers start from the defaults
+    config.load_mpc_profile()
+    _TRACES = _load(paths)
+
+
+def score(params: Dict[str, float]) -> float:
+    """RMS one-step sensor prediction error over all loaded traces."""
+    inputs, out = replay_ticks(_TRACES, p=model_params(**params))
+    predicted = out["modeledSensorTemp"] - out["delta_to_apply"]
+    err = inputs["raw_temp"] - predicted
+    valid = inputs["mask"] & np.isfinite(err)
+    if not valid.any():
+        return math.inf
+    return float(np.sqrt(np.mean(err[valid] ** 2)))
+
+
+def _candidates(
+    best: Dict[str, float],
+    steps: Dict[str, float],
+    bounds: Dict[str, Tuple[float, float]],
+) -> List[Dict[str, float]]:
+    out = []
+    for name, step in steps.items():
+        for factor in (1.0 + step, 1.0 / (1.0 + step)):
+            lo, hi = bounds[name]
+            value = min(max(best[name] * factor, lo), hi)
+            if value != best[name]:
+                out.append(dict(best, **{name: value}))
+    return out
+
+
+def fit(
+    paths: Sequence[str],
+    names: Sequence[str],
+    *,
+    span: float,
+    initial_step: float,
+    tolerance: float,
+    max_rounds: int,
+    workers: Optional[int],
+) -> Tuple[Dict[str, float], float, float]:
+    start = {name: float(getattr(config, name)) for name in names}
+    bounds = {name: (v / span, v * span) for name, v in start.items()}
+    steps = {name: initial_step for name in names}
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(list(paths),)
+    ) as pool:
+        best = start
+        start_score = best_score = next(pool.map(score, [best]))
+        print(f"start  rmse={start_score:.4f} °C")
+        for round_no in range(1, max_rounds + 1):
+            candidates = _candidates(best, steps, bounds)
+            if not candidates:
+                break
+            scores = list(pool.map(score, candidates))
+            i = int(np.argmin(scores))
+            if scores[i] < best_score:
+                best, best_score = candidates[i], scores[i]
+            else:
+                steps = {name: step / 2.0 for name, step in steps.items()}
+            print(
+                f"round {round_no:3d} rmse={best_score:.4f} °C  "
+                f"step={max(steps.values()):.4f}"
+            )
+            if max(steps.values()) < tolerance:
+                break
+    return best, start_score, best_score
+
+
+def main(argv: List[str]) -> None:
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument(
+        "paths",
+        nargs="*",
+        default=["log/"],
+        help="*-tick.bin / *-tick.csv files or directories containing them",
+    )
+    p.add_argument("--params", nargs="+", default=list(DEFAULT_PARAMS))
+    p.add_argument(
+        "--span",
+        type=float,
+        default=3.0,
+        help="keep each parameter within [start/span, start*span]",
+    )
+    p.add_argument("--step", type=float, default=0.25, help="initial relative step")
+    p.add_argument("--tolerance", type=float, default=0.002)
+    p.add_argument("--max-rounds", type=int, default=200)
+    p.add_argument("--workers", type=int, default=None, help="default: all cores")
+    p.add_argument("--output", default=config.MPC_PROFILE_FILE)
+    p.add_argument("--dry-run", action="store_true")
+    args = p.parse_args(argv)
+    # refine the current calibration rather than the hand-measured values
+    config.load_mpc_profile()
+
+    for name in args.params:
+        model_params(**{name: 0.0})  # raises on unknown names
+
+    paths = _find_logs(args.paths)
+    if not _load(paths):
+        sys.exit("no usable tick logs")
+
+    started = time.perf_counter()
+    best, start_score, best_score = fit(
+        paths,
+        args.params,
+        span=args.span,
+        initial_step=args.step,
+        tolerance=args.tolerance,
+        max_rounds=args.max_rounds,
+        workers=args.workers,
+    )
+    print(f"\nfitted in {time.perf_counter() - started:.1f} s")
+    for name, value in best.items():
+        print(f"  {name:32s} {getattr(config, name):10.5g} -> {value:10.5g}")
+    print(f"rmse {start_score:.4f} -> {best_score:.4f} °C")
+
+    if args.dry_run:
+        return
+    profile: Dict[str, Any] = dict(best)
+    profile["_meta"] = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "logs": paths,
+        "rmse_before": start_score,
+        "rmse_after": best_score,
+    }
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
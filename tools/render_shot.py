@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Render the display from a recorded shot log, without a screen.
+
+Usage:
+    python3 tools/render_shot.py log/                          # newest log
+    python3 tools/render_shot.py log/shot-<ts>-tick.bin --out frames/
+    python3 tools/render_shot.py log/ --out frames/ --sheet shot.png
+    python3 tools/render_shot.py log/ --start 300 --seconds 60 --every 0.1
+
+Runs the real ``Display`` with ``DISPLAY_BACKEND = "headless"`` (SDL's
+dummy video driver, so no framebuffer or X is needed) and replays the tick
+and event logs of espyresso.shot_logger through it: controller ticks feed
+the temp and boiler waves and the legend, the brew, pump, boiler and scale
+events drive the timers and the brew strip, and the logged flow rate feeds
+the flow wave. Every ``--every`` seconds of log time one frame is rendered
+with ``Display._render_frame``.
+
+``--out`` writes the frames as PNGs, for diffing against a known good run
+or for a video (``ffmpeg -framerate 4 -i frames/frame-%05d.png shot.mp4``).
+``--sheet`` tiles a scaled-down frame every ``--sheet-every`` seconds into
+one summary image.
+
+The time each zone's redraw takes is recorded for every frame and reported
+at the end, so UI performance regressions show up without hardware. The
+water level isn't logged and shows as 100 %.
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from espyresso import config, metrics, tick_log  # noqa: E402
+from espyresso.display_process import TelemetryView  # noqa: E402
+from espyresso.pcontroller import ControllerState  # noqa: E402
+from espyresso.utils import WaveQueue  # noqa: E402
+
+# In _render_frame order
+ZONES = (
+    "header",
+    "brew_strip",
+    "temp_legend",
+    "temp_wave",
+    "flow_header",
+    "flow_wave",
+    "boiler_header",
+    "boiler_wave",
+)
+TEMP_LABELS = ["shell", "elem", "water", "body", "head", "model", "tp"]
+
+
+def _find_logs(arg: str) -> Tuple[str, str]:
+    """Tick log and event log for a log file or the newest in a directory."""
+    if os.path.isdir(arg):
+        ticks = sorted(
+            os.path.join(arg, name)
+            for name in os.listdir(arg)
+            if name.startswith("shot-") and name.endswith(("-tick.bin", "-tick.csv"))
+        )
+        if not ticks:
+            sys.exit(f"no shot-*-tick.bin or shot-*-tick.csv files in {arg}")
+        tick_path = ticks[-1]
+    elif arg.endswith(("-tick.bin", "-tick.csv")):
+        tick_path = arg
+    else:
+        sys.exit(f"expected a directory or a *-tick.bin / *-tick.csv file, got {arg}")
+    return tick_path, tick_path[: -len("-tick.bin")] + "-event.csv"
+
+
+def _iter_ticks(path: str) -> Iterator[Dict[str, float]]:
+    if path.endswith(".bin"):
+        yield from tick_log.iter_rows(path)
+        return
+    with open(path) as f:
+        for raw in csv.DictReader(f):
+            row: Dict[str, float] = {}
+            for k, v in raw.items():
+                try:
+                    row[k] = float(v) if v else math.nan
+                except ValueError:
+                    pass
+            yield row
+
+
+def _read_events(path: str) -> List[Tuple[float, str, Dict[str, str]]]:
+    """``(t, kind, fields)`` of every event, oldest first."""
+    events: List[Tuple[float, str, Dict[str, str]]] = []
+    if not os.path.exists(path):
+        return events
+    with open(path) as f:
+        next(f, None)  # header
+        for line in f:
+            t, _, rest = line.rstrip("\n").partition(",")
+            kind, _, details = rest.partition(",")
+            if not kind:
+                continue
+            fields = dict(item.split("=", 1) for item in details.split() if "=" in item)
+            events.append((float(t), kind, fields))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+class Replay(TelemetryView):
+    """The machine as the log saw it at ``now``, in log time."""
+
+    def __init__(self) -> None:
+        super().__init__(now=lambda: self.t)
+        self.t = 0.0
+        self.controller_state = ControllerState()
+        self.state = self.state._replace(water=100.0)
+        self.brew_ml = 0.0
+        self.brew_start = 0.0
+        self.last_tick = 0.0
+        self.waves: Dict[str, WaveQueue] = {
+            "temp": WaveQueue(
+                90,
+                100,
+                X_MIN=config.TEMP_X_MIN,
+                X_MAX=config.TEMP_X_MAX,
+                Y_MIN=config.TEMP_Y_MIN,
+                Y_MAX=config.TEMP_Y_MAX,
+                target_y=config.TARGET_TEMP,
+            ),
+            "flow": WaveQueue(
+                0,
+                3,
+                X_MIN=config.FLOW_X_MIN,
+                X_MAX=config.FLOW_X_MAX,
+                Y_MIN=config.FLOW_Y_MIN,
+                Y_MAX=config.FLOW_Y_MAX,
+                steps=5,
+            ),
+            "boiler": WaveQueue(
+                0,
+                100,
+                X_MIN=config.BOILER_X_MIN,
+                X_MAX=config.BOILER_X_MAX,
+                Y_MIN=config.BOILER_Y_MIN,
+                Y_MAX=config.BOILER_Y_MAX,
+                steps=5,
+            ),
+        }
+        self.waves["temp"].set_labels(TEMP_LABELS)
+
+    def get_started_time(self) -> float:
+        # the header counts down in perf_counter time
+        return time.perf_counter() - (self.t - self.state.started_time)
+
+    def _set(self, **values: float) -> None:
+        self.state = self.state._replace(**values)
+
+    def event(self, t: float, kind: str, fields: Dict[str, str]) -> None:
+        self.t = t
+        phase, state = fields.get("phase"), fields.get("state")
+        if kind == "boiler" and state == "on":
+            self._set(started_time=t)
+        elif kind == "pump":
+            self._set(pumping=float(state == "on"))
+        elif kind == "scale":
+            self._set(scale_g=float(fields["grams"]), scale_time=t)
+        elif kind == "setpoint":
+            self.waves["temp"].target_y = float(fields["target"])
+        elif kind in ("steam", "pulse_pump"):
+            self._set(pump_active=float(phase == "start"))
+        elif kind == "brew" and phase == "preinfuse_start":
+            self.brew_ml, self.brew_start = 0.0, t
+            self.waves["flow"].clear()
+            self._set(
+                pump_active=1.0,
+                preinfuse_started=t,
+                preinfuse_stopped=0.0,
+                brew_started=0.0,
+                brew_stopped=0.0,
+                flow_ml=0.0,
+            )
+        elif kind == "brew" and phase == "preinfuse_stop":
+            self._set(preinfuse_stopped=t, brew_started=t)
+        elif kind == "brew" and phase == "end":
+            self._set(pump_active=0.0, brew_stopped=t)
+
+    def tick(self, row: Dict[str, float]) -> None:
+        t, previous = row["t"], self.last_tick
+        self.t = self.last_tick = t
+        state = self.controller_state
+        for name in state.FIELDS:
+            if name in row:
+                setattr(state, name, row[name])
+        boiling = row.get("boiling", 0.0) >= 0.5
+        state.boiling = boiling
+        override = row.get("pwm_override", math.nan)
+        state.pwm_override = None if math.isnan(override) else override
+
+        self.waves["temp"].add_to_queue(state.masses())
+        heater = row.get("heater", 0.0)
+        if boiling and state.pwm_override is None:
+            # what Boiler.set_value puts on the wave
+            self.waves["boiler"].add_to_queue((round(heater * 100, 1),))
+
+        flow_rate = row.get("flow_rate", math.nan)
+        if flow_rate > 0:
+            self.brew_ml += flow_rate * (t - previous)
+            average = self.brew_ml / max(t - self.brew_start, 1e-3)
+            self.waves["flow"].add_to_queue((flow_rate, average))
+            self._set(flow_rate=flow_rate, flow_pulse_time=t, flow_ml=self.brew_ml)
+        self._set(boiling=float(boiling), boiler_pwm=heater if boiling else 0.0)
+
+
+def _timed(render: Callable[[Any], None], histogram: metrics.Histogram) -> Any:
+    def timed(dirty: Any) -> None:
+        started = time.perf_counter()
+        render(dirty)
+        histogram.record(time.perf_counter() - started)
+
+    return timed
+
+
+class Sheet:
+    """Scaled-down frames tiled into one summary image."""
+
+    def __init__(self, columns: int, scale: float) -> None:
+        self.columns = columns
+        self.size = (int(config.WIDTH * scale), int(config.HEIGHT * scale))
+        self.tiles: List[Any] = []
+
+    def add(self, pygame: Any, screen: Any) -> None:
+        self.tiles.append(pygame.transform.smoothscale(screen, self.size))
+
+    def save(self, pygame: Any, path: str) -> None:
+        if not self.tiles:
+            return
+        w, h = self.size
+        rows = math.ceil(len(self.tiles) / self.columns)
+        sheet = pygame.Surface((w * min(self.columns, len(self.tiles)), h * rows))
+        for i, tile in enumerate(self.tiles):
+            sheet.blit(tile, ((i % self.columns) * w, (i // self.columns) * h))
+        pygame.image.save(sheet, path)
+
+
+def render(args: argparse.Namespace) -> None:
+    config.DISPLAY_BACKEND = "headless"
+    import pygame
+
+    from espyresso.display import Display
+
+    tick_path, event_path = _find_logs(args.log)
+    events = _read_events(event_path)
+    replay = Replay()
+    remote: Any = replay
+    display = Display(
+        bluetooth_scale=remote,
+        boiler=remote,
+        buttons=remote,
+        brewing_timer=remote,
+        pump=remote,
+        ranger=remote,
+        flow=remote,
+        get_started_time=replay.get_started_time,
+        wave_queues=replay.waves,
+        controller_state=replay.controller_state,
+    )
+    for zone in ZONES:
+        name = f"_redraw_{zone}"
+        histogram = metrics.histogram(f"render_{zone}")
+        setattr(display, name, _timed(getattr(display, name), histogram))
+    frame_time = metrics.histogram("render_frame")
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    sheet = Sheet(args.sheet_columns, args.sheet_scale) if args.sheet else None
+
+    display.screen.fill(Display.BLACK)
+    frames = 0
+    next_event = 0
+    first: Optional[float] = None
+    next_frame = next_tile = 0.0
+    for row in _iter_ticks(tick_path):
+        t = row["t"]
+        if first is None:
+            first = t
+            next_frame = next_tile = t + args.start
+        if args.seconds is not None and t > first + args.start + args.seconds:
+            break
+        while next_event < len(events) and events[next_event][0] <= t:
+            replay.event(*events[next_event])
+            next_event += 1
+        replay.tick(row)
+        while t >= next_frame:
+            started = time.perf_counter()
+            display._render_frame()
+            frame_time.record(time.perf_counter() - started)
+            frames += 1
+            if args.out:
+                path = os.path.join(args.out, f"frame-{frames:05d}.png")
+                pygame.image.save(display.screen, path)
+            if sheet is not None and next_frame >= next_tile:
+                sheet.add(pygame, display.screen)
+                next_tile += args.sheet_every
+            next_frame += args.every
+
+    if sheet is not None:
+        sheet.save(pygame, args.sheet)
+    pygame.quit()
+
+    print(f"{frames} frames from {tick_path}")
+    print(f"{'zone':<14}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for zone in ZONES + ("frame",):
+        summary = metrics.histogram(f"render_{zone}").snapshot()
+        print(
+            f"{zone:<14}"
+            + "".join(
+                f"{summary[key]:>9.3f}"
+                for key in ("mean_ms", "p50_ms", "p99_ms", "max_ms")
+            )
+        )
+
+
+def main(argv: List[str]) -> None:
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument("log", help="a shot-*-tick.bin/.csv file or a log directory")
+    p.add_argument("--out", help="directory for the PNG frames")
+    p.add_argument("--every", type=float, default=0.25, help="log seconds per frame")
+    p.add_argument("--start", type=float, default=0.0, help="skip this many seconds")
+    p.add_argument("--seconds", type=float, default=None, help="stop after this many")
+    p.add_argument("--sheet", help="write a summary image of tiled frames here")
+    p.add_argument(
+        "--sheet-every", type=float, default=10.0, help="log seconds per tile"
+    )
+    p.add_argument("--sheet-columns", type=int, default=6)
+    p.add_argument("--sheet-scale", type=float, default=0.5)
+    render(p.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
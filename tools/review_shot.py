@@ -2,29 +2,56 @@
 """Summarize a captured shot log produced by espyresso.shot_logger.
 
 Usage:
+    python3 tools/review_shot.py log/shot-<ts>-tick.bin
     python3 tools/review_shot.py log/shot-<ts>-tick.csv
     python3 tools/review_shot.py log/                      # picks newest pair
+    python3 tools/review_shot.py --batch log/ > shots.csv  # every log
+    python3 tools/review_shot.py --batch log/ --format json --output shots.json
 
 Reports warm-up, overshoot, steady-state error, heater-clip windows, brew
-phases (from the event log), and per-phase MPC behaviour. Pure stdlib so it
-runs on the Pi over SSH.
+phases (from the event log), and per-phase MPC behaviour.
+
+--batch reads every log in parallel worker processes, one streaming pass
+per log, and writes a row per shot (warm-up, overshoot, in-band %, brew
+duration and droop, brew means) plus trend statistics across shots: mean,
+spread and the least-squares slope per 30 days. Reads both the
+binary and the CSV tick format. Pure stdlib so it runs on the Pi over SSH.
 """
 import argparse
 import csv
 import glob
+import json
 import math
 import os
 import sys
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from espyresso import tick_log  # noqa: E402
+from espyresso.shot_stats import (  # noqa: E402
+    Accumulator,
+    Crossings,
+    FirstTime,
+    Intervals,
+    Stats,
+    Windows,
+    run,
+)
+from espyresso.shot_db import DROOP_BASELINE_SECONDS, session_of  # noqa: E402
 
+TICK_SUFFIXES = ("-tick.bin", "-tick.csv")
 
-def _read_ticks(path: str) -> Tuple[List[str], List[Dict[str, float]]]:
-    rows: List[Dict[str, float]] = []
+
+def _iter_ticks(path: str) -> Iterator[Dict[str, float]]:
+    """Yield the tick rows one at a time; missing values become NaN."""
+    if path.endswith(".bin"):
+        yield from tick_log.iter_rows(path)
+        return
     with open(path) as f:
-        reader = csv.DictReader(f)
-        cols = reader.fieldnames or []
-        for raw in reader:
+        for raw in csv.DictReader(f):
             row: Dict[str, float] = {}
             for k, v in raw.items():
                 if v == "" or v is None:
@@ -35,8 +62,7 @@ def _read_ticks(path: str) -> Tuple[List[str], List[Dict[str, float]]]:
                 except ValueError:
                     # bool-as-int already handled; leave string fields out
                     pass
-            rows.append(row)
-    return cols, rows
+            yield row
 
 
 def _read_events(path: str) -> List[Dict[str, str]]:
@@ -57,157 +83,165 @@ def _read_events(path: str) -> List[Dict[str, str]]:
 
 def _find_pair(arg: str) -> Tuple[str, str]:
     if os.path.isdir(arg):
-        ticks = sorted(glob.glob(os.path.join(arg, "shot-*-tick.csv")))
+        ticks = sorted(
+            path
+            for suffix in TICK_SUFFIXES
+            for path in glob.glob(os.path.join(arg, f"shot-*{suffix}"))
+        )
         if not ticks:
-            sys.exit(f"no shot-*-tick.csv files in {arg}")
+            sys.exit(f"no shot-*-tick.bin or shot-*-tick.csv files in {arg}")
         tick_path = ticks[-1]
-    elif arg.endswith("-tick.csv"):
+    elif arg.endswith(TICK_SUFFIXES):
         tick_path = arg
     else:
-        sys.exit(f"expected a directory or a *-tick.csv file, got {arg}")
-    event_path = tick_path.replace("-tick.csv", "-event.csv")
+        sys.exit(f"expected a directory or a *-tick.bin / *-tick.csv file, got {arg}")
+    event_path = tick_path[: -len("-tick.csv")] + "-event.csv"
     return tick_path, event_path
 
 
-def _crossings(rows: List[Dict[str, float]], col: str, threshold: float) -> List[float]:
-    """Times at which `col` crosses `threshold` (either direction)."""
-    out: List[float] = []
-    prev: Optional[float] = None
-    for r in rows:
-        v = r.get(col)
-        if v is None or math.isnan(v):
-            continue
-        if prev is not None:
-            if (prev < threshold) != (v < threshold):
-                out.append(r["t"])
-        prev = v
-    return out
+class _Target(Accumulator):
+    """Setpoint of the log: the first logged one, 95 °C until then."""
 
+    def __init__(self) -> None:
+        self.value = math.nan
+
+    def add(self, row: Dict[str, float]) -> None:
+        if math.isnan(self.value):
+            self.value = row.get("setpoint", math.nan)
+
+    def get(self) -> float:
+        return 95.0 if math.isnan(self.value) else self.value
+
+
+class _Session:
+    """Accumulators for the whole-log numbers, fed in one pass."""
+
+    def __init__(self) -> None:
+        target = self.target = _Target()
+        self.times = Stats("t")
+        self.raw = Stats("raw_temp")
+        self.warmup = FirstTime(lambda r: r.get("raw_temp", math.nan) >= target.get())
+        warmup = self.warmup
+
+        def warm(r: Dict[str, float]) -> bool:
+            return warmup.t is not None and r["t"] > warmup.t
+
+        self.clipped_high = Intervals(lambda r: r.get("heater", 0) >= 0.999)
+        self.clipped_low = Intervals(
+            lambda r: r.get("heater", math.nan) <= 0.001
+            and r.get("raw_temp", math.nan) < target.get() - 1
+        )
+        self.in_band = Intervals(
+            lambda r: warm(r) and abs(r.get("raw_temp", math.nan) - target.get()) < 0.5
+        )
+        self.crossings = Crossings("raw_temp", target.get, where=warm)
+        self.steady_flag = Intervals(lambda r: r.get("steadystate", 0) >= 0.5)
+        self.model_error = Stats(
+            lambda r: r.get("modeledSensorTemp", math.nan)
+            - r.get("raw_temp", math.nan),
+            where=warm,
+        )
+
+    def accumulators(self) -> List[Accumulator]:
+        # target and warmup first: the others read them for the same row
+        return [
+            self.target,
+            self.warmup,
+            self.times,
+            self.raw,
+            self.clipped_high,
+            self.clipped_low,
+            self.in_band,
+            self.crossings,
+            self.steady_flag,
+            self.model_error,
+        ]
+
+    @property
+    def duration(self) -> float:
+        return self.times.last - self.times.first if self.times.count else 0.0
 
-def _intervals_where(
-    rows: List[Dict[str, float]], pred
-) -> List[Tuple[float, float]]:
-    """Return list of (start_t, end_t) intervals where pred(row) is true."""
-    out: List[Tuple[float, float]] = []
-    start: Optional[float] = None
-    last_t: float = 0.0
-    for r in rows:
-        last_t = r["t"]
-        if pred(r):
-            if start is None:
-                start = r["t"]
-        else:
-            if start is not None:
-                out.append((start, r["t"]))
-                start = None
-    if start is not None:
-        out.append((start, last_t))
-    return out
 
+def _brew_accumulators(start: float, end: float) -> Dict[str, Accumulator]:
+    def baseline(r: Dict[str, float]) -> bool:
+        return r["t"] - start <= DROOP_BASELINE_SECONDS
 
-def _stats(rows: List[Dict[str, float]], col: str) -> Tuple[float, float, float]:
-    """min, max, mean of non-NaN values."""
-    vals = [r[col] for r in rows if col in r and not math.isnan(r[col])]
-    if not vals:
-        return math.nan, math.nan, math.nan
-    return min(vals), max(vals), sum(vals) / len(vals)
+    return {
+        "raw_temp": Stats("raw_temp"),
+        "baseline": Stats("raw_temp", where=baseline),
+        "brewHeadTemp": Stats("brewHeadTemp"),
+        "waterTemp": Stats("waterTemp"),
+        "heater": Stats("heater"),
+        "flow_rate": Stats("flow_rate"),
+    }
 
 
 def summarize(tick_path: str, event_path: str) -> None:
-    cols, rows = _read_ticks(tick_path)
     events = _read_events(event_path)
-    if not rows:
+    session = _Session()
+    brews = Windows(_brew_windows(events), _brew_accumulators)
+    count = run(_iter_ticks(tick_path), session.accumulators() + [brews])
+    if not count:
         print("(empty tick log)")
         return
 
-    duration = rows[-1]["t"] - rows[0]["t"]
-    setpoint = next(
-        (r["setpoint"] for r in rows if not math.isnan(r.get("setpoint", math.nan))),
-        math.nan,
-    )
+    duration = session.duration
+    target = session.target.get()
     print(f"== file        : {tick_path}")
     print(f"== events file : {event_path}")
-    print(f"== rows        : {len(rows)}")
+    print(f"== rows        : {count}")
     print(f"== duration    : {duration:.1f} s  ({duration/60:.2f} min)")
-    print(f"== setpoint    : {setpoint:.2f} °C")
-    avg_dt = duration / max(1, len(rows) - 1)
+    print(f"== setpoint    : {session.target.value:.2f} °C")
+    avg_dt = duration / max(1, count - 1)
     print(f"== avg tick dt : {avg_dt*1000:.1f} ms  (~{1/avg_dt:.1f} Hz)")
     print()
 
     # warm-up: first time raw_temp reaches setpoint (or 95 if no setpoint).
-    target = setpoint if not math.isnan(setpoint) else 95.0
-    warmup_t: Optional[float] = None
-    for r in rows:
-        if not math.isnan(r.get("raw_temp", math.nan)) and r["raw_temp"] >= target:
-            warmup_t = r["t"] - rows[0]["t"]
-            break
+    warmup_t = session.warmup.t
     if warmup_t is not None:
-        print(f"warm-up to {target:.1f} °C : {warmup_t:.1f} s")
+        print(f"warm-up to {target:.1f} °C : {warmup_t - session.times.first:.1f} s")
     else:
         print(f"warm-up to {target:.1f} °C : never reached")
 
     # overshoot peak (raw sensor)
-    rmin, rmax, _ = _stats(rows, "raw_temp")
     print(
-        f"raw sensor range  : {rmin:.2f}–{rmax:.2f} °C   (peak overshoot vs setpoint: "
-        f"{rmax - target:+.2f} °C)"
+        f"raw sensor range  : {session.raw.min:.2f}–{session.raw.max:.2f} °C   "
+        f"(peak overshoot vs setpoint: {session.raw.max - target:+.2f} °C)"
     )
 
     # heater clipping
-    clipped_high = _intervals_where(rows, lambda r: r.get("heater", 0) >= 0.999)
-    clipped_low_below_set = _intervals_where(
-        rows,
-        lambda r: r.get("heater", math.nan) <= 0.001
-        and r.get("raw_temp", math.nan) < target - 1,
-    )
     print(
-        f"heater @ 100%     : {sum(b-a for a,b in clipped_high):.1f} s "
-        f"({len(clipped_high)} intervals)"
+        f"heater @ 100%     : {session.clipped_high.seconds:.1f} s "
+        f"({session.clipped_high.count} intervals)"
     )
     print(
         f"heater @ 0% while temp < setpoint-1 °C : "
-        f"{sum(b-a for a,b in clipped_low_below_set):.1f} s "
-        f"({len(clipped_low_below_set)} intervals)"
+        f"{session.clipped_low.seconds:.1f} s "
+        f"({session.clipped_low.count} intervals)"
     )
 
     # steady state band: ±0.5 °C around setpoint, after warm-up
-    steady_band: List[Tuple[float, float]] = []
-    if warmup_t is not None:
-        steady_band = _intervals_where(
-            rows,
-            lambda r: r["t"] - rows[0]["t"] > (warmup_t or 0)
-            and abs(r.get("raw_temp", math.nan) - target) < 0.5,
-        )
-    in_band_s = sum(b - a for a, b in steady_band)
+    in_band_s = session.in_band.seconds
     print(
         f"raw sensor within ±0.5 °C of setpoint : {in_band_s:.1f} s "
-        f"({100*in_band_s/duration:.1f}% of run)"
+        f"({100*in_band_s/duration if duration else math.nan:.1f}% of run)"
     )
+    print(f"setpoint crossings after warm-up : {session.crossings.count}")
 
     # model steady-state flag activations
-    steady_flag = _intervals_where(rows, lambda r: r.get("steadystate", 0) >= 0.5)
-    steady_flag_s = sum(b - a for a, b in steady_flag)
     print(
-        f"MPC steadystate=1 : {steady_flag_s:.1f} s "
-        f"({len(steady_flag)} activations)"
+        f"MPC steadystate=1 : {session.steady_flag.seconds:.1f} s "
+        f"({session.steady_flag.count} activations)"
     )
 
     # model vs sensor divergence (post-warmup)
-    if warmup_t is not None and "modeledSensorTemp" in cols:
-        diffs = [
-            r["modeledSensorTemp"] - r["raw_temp"]
-            for r in rows
-            if r["t"] - rows[0]["t"] > (warmup_t or 0)
-            and not math.isnan(r.get("modeledSensorTemp", math.nan))
-            and not math.isnan(r.get("raw_temp", math.nan))
-        ]
-        if diffs:
-            mn, mx = min(diffs), max(diffs)
-            mean = sum(diffs) / len(diffs)
-            print(
-                f"modeledSensor − sensor (post-warmup): "
-                f"mean {mean:+.2f}  range {mn:+.2f}…{mx:+.2f} °C"
-            )
+    err = session.model_error
+    if err.count:
+        print(
+            f"modeledSensor − sensor (post-warmup): "
+            f"mean {err.mean:+.2f}  std {err.std:.2f}  "
+            f"range {err.min:+.2f}…{err.max:+.2f} °C"
+        )
 
     # Brew phase summary from events
     if events:
@@ -217,47 +251,237 @@ def summarize(tick_path: str, event_path: str) -> None:
             print(f"  t={float(e['t']):7.2f}  {e['kind']:14s}  {e['details']}")
 
     # Per-brew dive: between brew preinfuse_start and brew end
-    brews = []
-    cur_start: Optional[float] = None
-    for e in events:
-        if e["kind"] == "brew" and "phase=preinfuse_start" in e["details"]:
-            cur_start = float(e["t"])
-        elif e["kind"] == "brew" and "phase=end" in e["details"] and cur_start is not None:
-            brews.append((cur_start, float(e["t"])))
-            cur_start = None
-
-    for i, (b0, b1) in enumerate(brews, 1):
+    for i, ((b0, b1), accs) in enumerate(zip(brews.windows, brews.results), 1):
         print(f"\n== brew #{i}: t={b0:.1f}…{b1:.1f} s ({b1-b0:.1f} s) ==")
-        seg = [r for r in rows if b0 <= r["t"] - rows[0]["t"] <= b1]
-        if not seg:
+        st: Dict[str, Any] = accs
+        if not st["raw_temp"].count:
             print("  (no tick rows inside this brew window)")
             continue
-        smin, smax, smean = _stats(seg, "raw_temp")
-        bhmin, bhmax, bhmean = _stats(seg, "brewHeadTemp")
-        wmin, wmax, wmean = _stats(seg, "waterTemp")
-        hmin, hmax, hmean = _stats(seg, "heater")
-        fmin, fmax, fmean = _stats(seg, "flow_rate")
-        print(f"  sensor    : {smin:.1f}–{smax:.1f} °C   mean {smean:.2f}")
-        print(f"  brewHead  : {bhmin:.1f}–{bhmax:.1f} °C   mean {bhmean:.2f}")
-        print(f"  waterTemp : {wmin:.1f}–{wmax:.1f} °C   mean {wmean:.2f}")
-        print(f"  heater    : {hmin:.2f}–{hmax:.2f}    mean {hmean:.2f}")
-        print(f"  flow_rate : {fmin:.2f}–{fmax:.2f}    mean {fmean:.2f}")
+        for col, label, unit in (
+            ("raw_temp", "sensor   ", " °C"),
+            ("brewHeadTemp", "brewHead ", " °C"),
+            ("waterTemp", "waterTemp", " °C"),
+        ):
+            a = st[col]
+            print(f"  {label} : {a.min:.1f}–{a.max:.1f}{unit}   mean {a.mean:.2f}")
+        for col, label in (("heater", "heater   "), ("flow_rate", "flow_rate")):
+            a = st[col]
+            print(f"  {label} : {a.min:.2f}–{a.max:.2f}    mean {a.mean:.2f}")
         # Sensor temp at brew start vs end (proxy for boiler recovery)
-        first_t = seg[0]["raw_temp"]
-        last_t = seg[-1]["raw_temp"]
-        print(f"  sensor Δ during brew : {last_t - first_t:+.2f} °C")
+        raw = st["raw_temp"]
+        print(f"  sensor Δ during brew : {raw.last - raw.first:+.2f} °C")
+        print(f"  droop                : {st['baseline'].mean - raw.min:.2f} °C")
+
+
+# ---------------------------------------------------------------- batch mode
+
+BATCH_COLUMNS = (
+    "session",
+    "started",
+    "shot",
+    "shot_t",
+    "warmup_s",
+    "overshoot",
+    "in_band_pct",
+    "brew_s",
+    "droop",
+    "brew_mean_temp",
+    "brew_mean_heater",
+    "brew_mean_flow",
+)
+TREND_COLUMNS = (
+    "warmup_s",
+    "overshoot",
+    "in_band_pct",
+    "brew_s",
+    "droop",
+    "brew_mean_temp",
+)
+
+
+def _brew_windows(events: List[Dict[str, str]]) -> List[Tuple[float, float]]:
+    out: List[Tuple[float, float]] = []
+    start: Optional[float] = None
+    for e in events:
+        if e["kind"] != "brew":
+            continue
+        if "phase=preinfuse_start" in e["details"]:
+            start = float(e["t"])
+        elif "phase=end" in e["details"] and start is not None:
+            out.append((start, float(e["t"])))
+            start = None
+    return out
+
+
+def analyze_session(paths: Tuple[str, str]) -> List[Dict[str, Any]]:
+    """One streaming pass over a tick log: a row per brew (or a single
+    row with empty brew columns if the session had none)."""
+    tick_path, event_path = paths
+    session_name, started = session_of(tick_path)
+    session = _Session()
+    brews = Windows(_brew_windows(_read_events(event_path)), _brew_accumulators)
+    run(_iter_ticks(tick_path), session.accumulators() + [brews])
+
+    duration = session.duration
+    warmup = session.warmup.t
+    session_row: Dict[str, Any] = {
+        "session": session_name,
+        "started": started,
+        "warmup_s": math.nan if warmup is None else warmup - session.times.first,
+        "overshoot": session.raw.max - session.target.get(),
+        "in_band_pct": (
+            100.0 * session.in_band.seconds / duration if duration > 0 else math.nan
+        ),
+    }
+    rows: List[Dict[str, Any]] = []
+    for i, ((b0, b1), accs) in enumerate(zip(brews.windows, brews.results), 1):
+        st: Dict[str, Any] = accs
+        rows.append(
+            dict(
+                session_row,
+                shot=i,
+                shot_t=b0,
+                brew_s=b1 - b0,
+                droop=st["baseline"].mean - st["raw_temp"].min,
+                brew_mean_temp=st["raw_temp"].mean,
+                brew_mean_heater=st["heater"].mean,
+                brew_mean_flow=st["flow_rate"].mean,
+            )
+        )
+    return rows or [session_row]
+
+
+def _trends(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """count/mean/std/min/max per column, and the least-squares slope
+    against wall-clock time, per 30 days."""
+    out: Dict[str, Dict[str, float]] = {}
+    for col in TREND_COLUMNS:
+        pts = [
+            (r["started"] + r.get("shot_t", 0.0), r[col])
+            for r in rows
+            if isinstance(r.get(col), float) and not math.isnan(r[col])
+        ]
+        if not pts:
+            continue
+        n = len(pts)
+        mx = sum(x for x, _ in pts) / n
+        my = sum(y for _, y in pts) / n
+        sxx = sum((x - mx) ** 2 for x, _ in pts)
+        sxy = sum((x - mx) * (y - my) for x, y in pts)
+        out[col] = {
+            "count": n,
+            "mean": my,
+            "std": math.sqrt(sum((y - my) ** 2 for _, y in pts) / n),
+            "min": min(y for _, y in pts),
+            "max": max(y for _, y in pts),
+            "slope_per_30d": sxy / sxx * 30 * 86400 if sxx > 0 else math.nan,
+        }
+    return out
+
+
+def _find_pairs(paths: List[str]) -> List[Tuple[str, str]]:
+    out: List[Tuple[str, str]] = []
+    for path in paths:
+        if os.path.isdir(path):
+            ticks = sorted(
+                tick
+                for suffix in TICK_SUFFIXES
+                for tick in glob.glob(os.path.join(path, f"shot-*{suffix}"))
+            )
+            out.extend(_find_pair(tick) for tick in ticks)
+        else:
+            out.append(_find_pair(path))
+    return out
+
+
+def batch(
+    paths: List[str], fmt: str, output: Optional[str], workers: Optional[int]
+) -> None:
+    pairs = _find_pairs(paths)
+    if not pairs:
+        sys.exit("no tick logs found")
+    rows: List[Dict[str, Any]] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pair, result in zip(pairs, pool.map(_analyze_or_skip, pairs)):
+            if result is None:
+                print(f"skipping {pair[0]}", file=sys.stderr)
+                continue
+            rows.extend(result)
+    rows.sort(key=lambda r: (r["started"], r.get("shot", 0)))
+    trends = _trends(rows)
+
+    out = open(output, "w", newline="") if output else sys.stdout
+    try:
+        if fmt == "json":
+            json.dump(_nan_to_none({"shots": rows, "trends": trends}), out, indent=1)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, BATCH_COLUMNS, restval="")
+            writer.writeheader()
+            for r in rows:
+                writer.writerow(
+                    {k: f"{v:.3f}" if isinstance(v, float) else v for k, v in r.items()}
+                )
+    finally:
+        if output:
+            out.close()
+
+    if fmt != "json":
+        print(
+            f"{len(rows)} rows from {len(pairs)} logs; trends across shots:",
+            file=sys.stderr,
+        )
+        for col, st in trends.items():
+            print(
+                f"  {col:15s} n={st['count']:<4d} mean={st['mean']:8.2f} "
+                f"std={st['std']:7.2f} range={st['min']:.2f}…{st['max']:.2f} "
+                f"slope={st['slope_per_30d']:+.2f}/30d",
+                file=sys.stderr,
+            )
+
+
+def _nan_to_none(v: Any) -> Any:
+    if isinstance(v, dict):
+        return {k: _nan_to_none(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_nan_to_none(x) for x in v]
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    return v
+
+
+def _analyze_or_skip(paths: Tuple[str, str]) -> Optional[List[Dict[str, Any]]]:
+    try:
+        return analyze_session(paths)
+    except (OSError, ValueError, KeyError):
+        return None
 
 
 def main(argv: List[str]) -> None:
-    p = argparse.ArgumentParser(description=__doc__)
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
     p.add_argument(
         "path",
-        nargs="?",
-        default="log/",
-        help="path to a *-tick.csv file, or a directory containing them",
+        nargs="*",
+        default=["log/"],
+        help="*-tick.bin / *-tick.csv files, or directories of them",
+    )
+    p.add_argument(
+        "--batch",
+        action="store_true",
+        help="summarize every log as one row per shot instead of the newest",
     )
+    p.add_argument("--format", choices=("csv", "json"), default="csv")
+    p.add_argument("--output", help="batch table file (default: stdout)")
+    p.add_argument("--workers", type=int, default=None, help="default: all cores")
     args = p.parse_args(argv)
-    tick, event = _find_pair(args.path)
+    if args.batch:
+        batch(args.path, args.format, args.output, args.workers)
+        return
+    if len(args.path) != 1:
+        p.error("pass one path, or --batch for several")
+    tick, event = _find_pair(args.path[0])
     summarize(tick, event)
 
 